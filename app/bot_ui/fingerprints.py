@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.services.metrics import register_cache
+
+MAX_MESSAGES = 4096
+
+MessageKey = Tuple[int, int]
+
+
+def render_fingerprint(text: str, reply_markup=None) -> int:
+    """
+    Hash of what a message shows: text + inline keyboard.
+    """
+    markup_json = reply_markup.to_json() if reply_markup is not None else None
+    return hash((text, markup_json))
+
+
+class MessageFingerprints:
+    """
+    Bounded LRU: (chat_id, message_id) -> fingerprint of the last rendered content.
+
+    Only the bot can change its own messages, so if the stored fingerprint equals
+    the new one, editing the message would be a no-op on Telegram's side.
+    """
+
+    def __init__(self, max_messages: int = MAX_MESSAGES):
+        self.max_messages = max_messages
+        self._items: "OrderedDict[MessageKey, int]" = OrderedDict()
+        self.checked = 0
+        self.skipped = 0
+
+    def get(self, key: MessageKey) -> Optional[int]:
+        fp = self._items.get(key)
+        if fp is not None:
+            self._items.move_to_end(key)
+        return fp
+
+    def remember(self, key: MessageKey, fingerprint: int) -> None:
+        self._items[key] = fingerprint
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_messages:
+            self._items.popitem(last=False)
+
+    def forget(self, key: MessageKey) -> None:
+        self._items.pop(key, None)
+
+    def is_unchanged(self, key: MessageKey, fingerprint: int) -> bool:
+        self.checked += 1
+        if self.get(key) == fingerprint:
+            self.skipped += 1
+            return True
+        return False
+
+
+message_fingerprints = MessageFingerprints()
+# hit = edit skipped because the message already shows the same content
+register_cache(
+    "edit_fingerprints",
+    lambda: (message_fingerprints.skipped, message_fingerprints.checked - message_fingerprints.skipped),
+)
+
+
+def message_key(message) -> MessageKey:
+    return message.chat.id, message.message_id
@@ -1,3 +1,5 @@
+from typing import Dict
+
 from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -7,6 +9,8 @@ from telegram import (
 
 from app.config import TASK_PROCESSES
 from app.storage import db
+from app.utils.callback_codec import encode_callback
+from app.utils.text import format_money
 
 
 def bottom_kb(chat_id: int) -> ReplyKeyboardMarkup:
@@ -26,15 +30,18 @@ def bottom_kb(chat_id: int) -> ReplyKeyboardMarkup:
     )
 
 
+def _category_button(cat_id: int, name: str, subcategories: int) -> InlineKeyboardButton:
+    icon = "📂" if subcategories else "📦"
+    return InlineKeyboardButton(f"{icon} {name}", callback_data=encode_callback("cat:open", cat_id))
+
+
 def categories_keyboard(rows):
     """
-    Inline keyboard for categories list.
+    Inline keyboard for the top-level categories list; categories with subcategories are 📂.
     """
-    kb = [[InlineKeyboardButton("➕ Додати категорію", callback_data="cat:add")]]
-    for cat_id, name in rows:
-        kb.append([
-            InlineKeyboardButton(f"📦 {name}", callback_data=f"cat:open:{cat_id}")
-        ])
+    kb = [[InlineKeyboardButton("➕ Додати категорію", callback_data=encode_callback("cat:add"))]]
+    for cat_id, name, subcategories in rows:
+        kb.append([_category_button(cat_id, name, subcategories)])
     return InlineKeyboardMarkup(kb)
 
 
@@ -44,57 +51,105 @@ def category_actions_keyboard(cat_id: int):
     """
     return InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("✏️ Редагувати", callback_data=f"cat:edit:{cat_id}"),
-            InlineKeyboardButton("🗑️ Видалити", callback_data=f"cat:del:{cat_id}"),
+            InlineKeyboardButton("✏️ Редагувати", callback_data=encode_callback("cat:edit", cat_id)),
+            InlineKeyboardButton("🗑️ Видалити", callback_data=encode_callback("cat:del", cat_id)),
+        ],
+        [
+            InlineKeyboardButton("📊 Підсумок", callback_data=encode_callback("cat:summary", cat_id)),
         ],
         [
-            InlineKeyboardButton("⬅️ Назад", callback_data=f"cat:open:{cat_id}"),
+            InlineKeyboardButton("⬅️ Назад", callback_data=encode_callback("cat:open", cat_id)),
         ]
     ])
 
 
-def products_keyboard(cat_id: int, products_rows):
+def products_keyboard(cat_id: int, products_rows, children=(), parent_id: int | None = None):
     """
-    Inline keyboard for products inside a category.
+    Inline keyboard of a category: its subcategories (drill down), then its products.
+    "Back" leads to the parent category, or to the top-level list.
     """
-    kb = [[
-        InlineKeyboardButton("⚙️ Дії з категорією", callback_data=f"cat:actions:{cat_id}"),
-        InlineKeyboardButton("➕ Додати продукт", callback_data=f"prod:add:{cat_id}")
-    ]]
+    kb = [
+        [
+            InlineKeyboardButton("⚙️ Дії з категорією", callback_data=encode_callback("cat:actions", cat_id)),
+            InlineKeyboardButton("➕ Додати продукт", callback_data=encode_callback("prod:add", cat_id)),
+        ],
+        [InlineKeyboardButton("➕ Додати підкатегорію", callback_data=encode_callback("cat:add_sub", cat_id))],
+    ]
+
+    for child_id, name, subcategories in children:
+        kb.append([_category_button(child_id, name, subcategories)])
 
     for prod_id, name, _, _ in products_rows:
-        kb.append([InlineKeyboardButton(f"🏷️ {name}", callback_data=f"prod:open:{prod_id}")])
+        kb.append([InlineKeyboardButton(f"🏷️ {name}", callback_data=encode_callback("prod:open", prod_id))])
 
-    kb.append([InlineKeyboardButton("⬅️ Назад до категорій", callback_data="nav:cats")])
+    if parent_id is None:
+        kb.append([InlineKeyboardButton("⬅️ Назад до категорій", callback_data=encode_callback("nav:cats"))])
+    else:
+        kb.append([InlineKeyboardButton("⬅️ Назад", callback_data=encode_callback("cat:open", parent_id))])
     return InlineKeyboardMarkup(kb)
 
 
-def product_view_keyboard(prod_id: int, cat_id: int, qty: float, limit_qty: float | None):
+def product_view_keyboard(
+    prod_id: int,
+    cat_id: int,
+    qty: float,
+    limit_qty: float | None,
+    stock_rows=(),
+    unit_price: float | None = None,
+    pack_size: float | None = None,
+):
     """
     Inline keyboard for a single product screen.
-    Shows product actions + qty/limit controls.
+    Shows product actions + qty/limit/price/pack controls; with several locations (stock_rows)
+    qty and limit are set per location, plus the limit of the total.
     """
     limit_text = "—" if limit_qty is None else str(limit_qty)
 
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("✏️ Редагувати", callback_data=f"prod:edit:{prod_id}"),
-            InlineKeyboardButton("🗑️ Видалити", callback_data=f"prod:del:{prod_id}"),
-        ],
-        [
-            InlineKeyboardButton(f"🔢 К-сть: {qty}", callback_data=f"prod:qty:{prod_id}"),
-            InlineKeyboardButton(f"⚠️ Мін к-сть: {limit_text}", callback_data=f"prod:limit:{prod_id}"),
-        ],
-        [InlineKeyboardButton("⬅️ Назад до категорії", callback_data=f"cat:open:{cat_id}")]
+    kb = [[
+        InlineKeyboardButton("✏️ Редагувати", callback_data=encode_callback("prod:edit", prod_id)),
+        InlineKeyboardButton("🗑️ Видалити", callback_data=encode_callback("prod:del", prod_id)),
+    ]]
+    if len(stock_rows) > 1:
+        for location_id, name, loc_qty, loc_limit in stock_rows:
+            kb.append([
+                InlineKeyboardButton(
+                    f"📍 {name}: {loc_qty or 0}", callback_data=encode_callback("stock:qty", prod_id, location_id)
+                ),
+                InlineKeyboardButton(
+                    f"⚠️ Мін: {'—' if loc_limit is None else loc_limit}",
+                    callback_data=encode_callback("stock:limit", prod_id, location_id),
+                ),
+            ])
+        kb.append([InlineKeyboardButton(
+            f"⚠️ Мін к-сть (всього): {limit_text}", callback_data=encode_callback("prod:limit", prod_id)
+        )])
+    else:
+        kb.append([
+            InlineKeyboardButton(f"🔢 К-сть: {qty}", callback_data=encode_callback("prod:qty", prod_id)),
+            InlineKeyboardButton(f"⚠️ Мін к-сть: {limit_text}", callback_data=encode_callback("prod:limit", prod_id)),
+        ])
+    price_text = "—" if unit_price is None else format_money(unit_price)
+    pack_text = "—" if pack_size is None else str(pack_size)
+    kb.append([
+        InlineKeyboardButton(f"💰 Ціна: {price_text}", callback_data=encode_callback("prod:price", prod_id)),
+        InlineKeyboardButton(f"📦 Упаковка: {pack_text}", callback_data=encode_callback("prod:pack", prod_id)),
     ])
+    kb.append([InlineKeyboardButton("📈 Історія", callback_data=encode_callback("prod:history", prod_id))])
+    kb.append([InlineKeyboardButton("⬅️ Назад до категорії", callback_data=encode_callback("cat:open", cat_id))])
+    return InlineKeyboardMarkup(kb)
 
 
-def tasks_cat_keyboard():
+def tasks_cat_keyboard(open_counts: Dict[int, int]):
+    """
+    Task process selector; processes with open tasks get a count badge: "Гарячий процес (7)".
+    """
     tasks_cat = TASK_PROCESSES.items()
     kb = []
 
     for tc_id, data in tasks_cat:
-        kb.append([InlineKeyboardButton(f"{data['name']}", callback_data=f"task_proc:open:{tc_id}")])
+        count = open_counts.get(tc_id, 0)
+        label = f"{data['name']} ({count})" if count else data['name']
+        kb.append([InlineKeyboardButton(label, callback_data=encode_callback("task_proc:open", tc_id))])
 
     return InlineKeyboardMarkup(kb)
 
@@ -104,13 +159,13 @@ def tasks_keyboard(tc_id: int, tasks_rows):
     Inline keyboard for products inside a category.
     """
     kb = [
-        [InlineKeyboardButton("➕ Додати завдання", callback_data=f"task_proc:add:{tc_id}")]
+        [InlineKeyboardButton("➕ Додати завдання", callback_data=encode_callback("task_proc:add", tc_id))]
     ]
 
     for i, (task_id, task_text, task_cat_id) in enumerate(tasks_rows, start=1):
-        kb.append([InlineKeyboardButton(f"{i}. {task_text}", callback_data=f"task:open:{task_id}")])
+        kb.append([InlineKeyboardButton(f"{i}. {task_text}", callback_data=encode_callback("task:open", task_id))])
 
-    kb.append([InlineKeyboardButton("⬅️ Назад до процесів", callback_data="nav:task_proc")])
+    kb.append([InlineKeyboardButton("⬅️ Назад до процесів", callback_data=encode_callback("nav:task_proc"))])
 
     return InlineKeyboardMarkup(kb)
 
@@ -119,15 +174,25 @@ def task_view_keyboard(task_id: int, task_cat_id: int | None):
     tasks_cat_name = TASK_PROCESSES[task_cat_id]['name']
     return InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("✏️ Редагувати", callback_data=f"task:edit:{task_id}"),
-            InlineKeyboardButton("✅ Виконано", callback_data=f"task:done:{task_id}"),
+            InlineKeyboardButton("✏️ Редагувати", callback_data=encode_callback("task:edit", task_id)),
+            InlineKeyboardButton("✅ Виконано", callback_data=encode_callback("task:done", task_id)),
         ],
-        [InlineKeyboardButton(f"⬅️ Назад до {tasks_cat_name}", callback_data=f"task_proc:open:{task_cat_id}")]
+        [InlineKeyboardButton(f"⬅️ Назад до {tasks_cat_name}", callback_data=encode_callback("task_proc:open", task_cat_id))]
     ])
 
 
+def reorder_export_keyboard(with_xlsx: bool = True):
+    """
+    Inline buttons under the reorder list: export it as a document.
+    """
+    buttons = [InlineKeyboardButton("📄 CSV", callback_data=encode_callback("reorder:csv"))]
+    if with_xlsx:
+        buttons.append(InlineKeyboardButton("📊 XLSX", callback_data=encode_callback("reorder:xlsx")))
+    return InlineKeyboardMarkup([buttons])
+
+
 def cancel_keyboard(prefix: str):
     """
     Inline cancel button used in conversation flows.
     """
-    return InlineKeyboardMarkup([[InlineKeyboardButton("❌ Скасувати", callback_data=f"{prefix}:cancel")]])
+    return InlineKeyboardMarkup([[InlineKeyboardButton("❌ Скасувати", callback_data=encode_callback(f"{prefix}:cancel"))]])
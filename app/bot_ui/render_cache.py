@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.services.metrics import register_cache
+
+MAX_ENTRIES = 2048
+
+
+class RenderCache:
+    """
+    LRU cache of rendered screens: (screen, entity_id) -> (version, rendered).
+
+    `rendered` is whatever the builder returns, usually (text, InlineKeyboardMarkup)
+    or None for "not found" screens. Telegram objects are immutable, so one rendered
+    markup can be safely shared between users.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Optional[int]], Tuple[Hashable, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, screen: str, entity_id: int | None, version: Hashable, build: Callable[[], Any]) -> Any:
+        """
+        Return cached screen for the given data version or build (and store) a fresh one.
+        """
+        key = (screen, entity_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        rendered = build()
+        self._entries[key] = (version, rendered)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return rendered
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters for reporting.
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+screen_cache = RenderCache()
+register_cache("screens", lambda: (screen_cache.hits, screen_cache.misses))
@@ -2,44 +2,251 @@ from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
 from app.config import TASK_PROCESSES
-from app.storage import db
+from app.storage import db, versions
 from app.bot_ui.keyboards import categories_keyboard, products_keyboard, product_view_keyboard, tasks_cat_keyboard, \
     tasks_keyboard, task_view_keyboard
+from app.bot_ui.render_cache import screen_cache
+from app.bot_ui.fingerprints import message_fingerprints, message_key, render_fingerprint
+from app.services.live_screens import live_screens
+from app.utils.text import format_money, split_message
 from telegram import CallbackQuery
 
 
-async def safe_edit_message(query: CallbackQuery, text: str, reply_markup=None) -> None:
+async def safe_edit_message(query: CallbackQuery, text: str, reply_markup=None, live=None) -> None:
     """
     Safely edit an inline message (CallbackQuery.message).
 
     This helper prevents the bot from crashing on Telegram's
     "Message is not modified" error when the new text/markup
-    is identical to the current one.
+    is identical to the current one. Edits that would not change
+    the message (same fingerprint as the last render) are skipped
+    locally, without a round trip to Telegram.
 
     Args:
         query: CallbackQuery that owns the message to edit.
         text: New message text.
         reply_markup: Optional inline keyboard (InlineKeyboardMarkup).
+        live: Optional (screen, entity_id) shown by the message; such messages
+            are refreshed for every viewer when the entity changes.
     """
+    key = message_key(query.message)
+    if live is None:
+        live_screens.untrack(key)
+    else:
+        live_screens.track(live, key)
+
+    fingerprint = render_fingerprint(text, reply_markup)
+    if message_fingerprints.is_unchanged(key, fingerprint):
+        return
+
     try:
         await query.edit_message_text(text, reply_markup=reply_markup)
     except BadRequest as e:
         if "Message is not modified" not in str(e):
+            message_fingerprints.forget(key)
             raise
 
+    message_fingerprints.remember(key, fingerprint)
+
+
+async def reply_screen(message, text: str, reply_markup=None, live=None):
+    """
+    Send a screen as a new message and remember its fingerprint,
+    so a later click that renders the same screen does not edit it.
+    """
+    sent = await message.reply_text(text, reply_markup=reply_markup)
+    key = message_key(sent)
+    message_fingerprints.remember(key, render_fingerprint(text, reply_markup))
+    if live is not None:
+        live_screens.track(live, key)
+    return sent
+
+
+# ---------- Screen builders (cached by data version) ----------
+
+def _build_categories():
+    rows = db.list_child_categories(None)
+    text = "Категорії:" if rows else "Категорій поки немає. Натисни «Додати категорію»."
+    return text, categories_keyboard(rows)
+
+
+def _build_category(cat_id: int):
+    loaded = db.load_category_screen(cat_id)
+    if not loaded:
+        return None
+
+    (_, name, parent_id), children, products_rows = loaded
+    text = f"📦 Категорія: {name}"
+    if not products_rows and not children:
+        text += "\n\nПродуктів поки немає."
+    return text, products_keyboard(cat_id, products_rows, children, parent_id)
+
+
+def _build_product(prod_id: int):
+    loaded = db.load_product_screen(prod_id)
+    if not loaded:
+        return None
+
+    (prod_id, cat_id, name, qty, limit_qty, below_limit, unit_price, pack_size), stock_rows = loaded
+    text = f"🏷️ Продукт: {name}"
+    if unit_price is not None:
+        text += f"\n💰 Вартість: {format_money(qty * unit_price)} ({qty} × {format_money(unit_price)})"
+    if len(stock_rows) > 1:
+        lines = [f"Всього: {qty}" + ("" if limit_qty is None else f" (мін {limit_qty})")]
+        for _, location, loc_qty, loc_limit in stock_rows:
+            lines.append(
+                f"📍 {location}: {'—' if loc_qty is None else loc_qty}"
+                + ("" if loc_limit is None else f" (мін {loc_limit})")
+            )
+        text += "\n\n" + "\n".join(lines)
+    return text, product_view_keyboard(prod_id, cat_id, qty, limit_qty, stock_rows, unit_price, pack_size)
+
+
+def _build_task_procs():
+    return "Категорії списку завдань:", tasks_cat_keyboard(db.count_open_tasks())
+
+
+def _build_tasks(tc_id: int):
+    tasks_cat = TASK_PROCESSES[tc_id]['name']
+    tasks_rows = db.list_all_tasks_by_category(tc_id)
+
+    if tasks_rows:
+        text = f"📋 Список завдань: {tasks_cat}\n\n"
+    else:
+        text = f"📦 Процес: {tasks_cat}\n\nЗавдань поки немає."
+    return text, tasks_keyboard(tc_id, tasks_rows)
+
+
+def _build_task(task_id: int):
+    task = db.get_task(task_id)
+    if not task:
+        return None
+
+    task_id, task_text, task_cat_id = task
+    return f"🏷️ Завдання:\n {task_text}", task_view_keyboard(task_id, task_cat_id)
+
+
+def _share(percent: float | None) -> str:
+    return "—" if percent is None else f"{percent:.1f}%"
+
+
+def _build_valuation():
+    categories, locations = db.stock_valuation()
+    total = sum(row[4] for row in categories)
+    products = sum(row[2] for row in categories)
+    priced = sum(row[3] for row in categories)
+
+    lines = [
+        "💰 Оцінка запасів",
+        f"Всього: {format_money(total)}",
+        f"Продуктів з ціною: {priced} з {products}",
+    ]
+    if categories:
+        lines.append("\nЗа категоріями (частка, наростаючим підсумком):")
+    for rank, (_, name, cat_products, cat_priced, value, share, running) in enumerate(categories, start=1):
+        unpriced = cat_products - cat_priced
+        lines.append(
+            f"{rank}. {name} — {format_money(value)} ({_share(share)}, Σ {_share(running)})"
+            + ("" if not unpriced else f", без ціни: {unpriced}")
+        )
+    if len(locations) > 1:
+        lines.append("\nЗа локаціями:")
+        for _, name, _, _, value, share, _ in locations:
+            lines.append(f"📍 {name} — {format_money(value)} ({_share(share)})")
+    return tuple(split_message(lines))
+
+
+def categories_screen():
+    """
+    (text, markup) of the categories list.
+    """
+    return screen_cache.get_or_build("cats", None, versions.get("cats"), _build_categories)
+
+
+def category_screen(cat_id: int):
+    """
+    (text, markup) of a single category, or None if it does not exist.
+    """
+    cat_id = int(cat_id)
+    return screen_cache.get_or_build("cat", cat_id, versions.get("cat", cat_id), lambda: _build_category(cat_id))
+
+
+def product_screen(prod_id: int):
+    """
+    (text, markup) of a single product, or None if it does not exist.
+
+    The "cats" version is part of the key because deleting a category
+    removes its products without touching their own versions; "locations"
+    because the screen shows the stock at every location.
+    """
+    prod_id = int(prod_id)
+    version = (versions.get("prod", prod_id), versions.get("cats"), versions.get("locations"))
+    return screen_cache.get_or_build("prod", prod_id, version, lambda: _build_product(prod_id))
+
+
+def task_procs_screen():
+    """
+    (text, markup) of the task process selector with open-task counts.
+    """
+    return screen_cache.get_or_build("task_procs", None, versions.get("task_procs"), _build_task_procs)
+
+
+def tasks_screen(tc_id: int):
+    """
+    (text, markup) of the open tasks list of one task process.
+    """
+    tc_id = int(tc_id)
+    return screen_cache.get_or_build("task_proc", tc_id, versions.get("task_proc", tc_id), lambda: _build_tasks(tc_id))
+
+
+def task_screen(task_id: int):
+    """
+    (text, markup) of a single task, or None if it does not exist.
+    """
+    task_id = int(task_id)
+    return screen_cache.get_or_build("task", task_id, versions.get("task", task_id), lambda: _build_task(task_id))
+
+
+def valuation_report():
+    """
+    Message chunks of the stock valuation report.
+
+    Keyed by the "catalog" version: however many managers open it, the aggregate
+    queries run once per catalogue change (in this process).
+    """
+    return screen_cache.get_or_build("valuation", None, versions.get("catalog"), _build_valuation)
+
+
+def build_live_screen(screen: str, entity_id: int | None):
+    """
+    Renderer for app.services.live_screens: (text, markup) of a shared screen or None.
+    """
+    if screen == "cats":
+        return categories_screen()
+    if screen == "cat":
+        return category_screen(entity_id)
+    if screen == "prod":
+        return product_screen(entity_id)
+    if screen == "task_proc":
+        return tasks_screen(entity_id)
+    if screen == "task_procs":
+        return task_procs_screen()
+    return None
+
+
+# ---------- Send / render ----------
 
 async def send_categories_reply(message, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Send the categories list as a new message.
 
     Behavior:
-    - Fetches categories from DB
+    - Fetches categories from DB (or render cache)
     - Builds a short screen text
     - Attaches inline keyboard with categories
     """
-    rows = db.list_categories()
-    text = "Категорії:" if rows else "Категорій поки немає. Натисни «Додати категорію»."
-    await message.reply_text(text, reply_markup=categories_keyboard(rows))
+    text, markup = categories_screen()
+    await reply_screen(message, text, markup, live=("cats", None))
 
 
 async def render_categories_edit(query, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -47,14 +254,13 @@ async def render_categories_edit(query, context: ContextTypes.DEFAULT_TYPE) -> N
     Render (update) the categories list by editing the current inline message.
 
     Behavior:
-    - Fetches categories from DB
+    - Fetches categories from DB (or render cache)
     - Builds a short screen text
     - Attaches inline keyboard with categories
     - Edits the current message safely (no crash on "Message is not modified")
     """
-    rows = db.list_categories()
-    text = "Категорії:" if rows else "Категорій поки немає. Натисни «Додати категорію»."
-    await safe_edit_message(query, text, reply_markup=categories_keyboard(rows))
+    text, markup = categories_screen()
+    await safe_edit_message(query, text, reply_markup=markup, live=("cats", None))
 
 
 async def render_category_edit(query, context: ContextTypes.DEFAULT_TYPE, cat_id: int) -> None:
@@ -63,21 +269,19 @@ async def render_category_edit(query, context: ContextTypes.DEFAULT_TYPE, cat_id
 
     Screen:
     - Title: 📦 Категорія: <name>
-    - Buttons: category actions + add product + products list + back
+    - Buttons: category actions + add product/subcategory + subcategories + products + back
 
     Behavior:
-    - Loads category by id
-    - Loads products for that category
+    - Loads category, its subcategories and products (or takes them from render cache)
     - Edits the current message with updated text and inline keyboard
     """
-    cat = db.get_category(cat_id)
-    if not cat:
+    screen = category_screen(cat_id)
+    if not screen:
         await query.message.reply_text("Категорію не знайдено.")
         return
 
-    products_rows = db.list_products_by_category(cat_id)
-    text = f"📦 Категорія: {cat[1]}" if products_rows else f"📦 Категорія: {cat[1]}\n\nПродуктів поки немає."
-    await safe_edit_message(query, text, reply_markup=products_keyboard(cat_id, products_rows))
+    text, markup = screen
+    await safe_edit_message(query, text, reply_markup=markup, live=("cat", int(cat_id)))
 
 
 async def send_category_reply(message, context: ContextTypes.DEFAULT_TYPE, cat_id: int) -> None:
@@ -86,21 +290,19 @@ async def send_category_reply(message, context: ContextTypes.DEFAULT_TYPE, cat_i
 
     Screen:
     - Title: 📦 Категорія: <name>
-    - Buttons: category actions + add product + products list + back
+    - Buttons: category actions + add product/subcategory + subcategories + products + back
 
     Behavior:
-    - Loads category by id
-    - Loads products for that category
+    - Loads category, its subcategories and products (or takes them from render cache)
     - Sends a new message with text + inline keyboard
     """
-    cat = db.get_category(cat_id)
-    if not cat:
+    screen = category_screen(cat_id)
+    if not screen:
         await message.reply_text("Категорію не знайдено.")
         return
 
-    products_rows = db.list_products_by_category(cat_id)
-    text = f"📦 Категорія: {cat[1]}" if products_rows else f"📦 Категорія: {cat[1]}\n\nПродуктів поки немає."
-    await message.reply_text(text, reply_markup=products_keyboard(cat_id, products_rows))
+    text, markup = screen
+    await reply_screen(message, text, markup, live=("cat", int(cat_id)))
 
 
 async def render_product_edit(query, context: ContextTypes.DEFAULT_TYPE, prod_id: int) -> None:
@@ -108,26 +310,20 @@ async def render_product_edit(query, context: ContextTypes.DEFAULT_TYPE, prod_id
     Render (update) a single product screen by editing the current inline message.
 
     Screen:
-    - Title: 🏷️ Продукт: <name>
-    - Buttons: edit/delete + qty/limit + back to category
+    - Title: 🏷️ Продукт: <name> (+ stock by location if there are several)
+    - Buttons: edit/delete + qty/limit (per location) + back to category
 
     Behavior:
-    - Loads product by id
+    - Loads product with its stock by id in one query (or takes it from render cache)
     - Edits the current message with text + inline keyboard
     """
-    row = db.get_product(prod_id)
-    if not row:
+    screen = product_screen(prod_id)
+    if not screen:
         await query.answer("Продукт не знайдено.", show_alert=True)
         return
 
-    prod_id, cat_id, name, qty, limit_qty, below_limit = row
-    text = f"🏷️ Продукт: {name}"
-
-    await safe_edit_message(
-        query,
-        text,
-        reply_markup=product_view_keyboard(prod_id, cat_id, qty, limit_qty),
-    )
+    text, markup = screen
+    await safe_edit_message(query, text, reply_markup=markup, live=("prod", int(prod_id)))
 
 
 async def send_product_reply(message, context: ContextTypes.DEFAULT_TYPE, prod_id: int) -> None:
@@ -135,25 +331,20 @@ async def send_product_reply(message, context: ContextTypes.DEFAULT_TYPE, prod_i
     Send a single product screen as a new message.
 
     Screen:
-    - Title: 🏷️ Продукт: <name>
-    - Buttons: edit/delete + qty/limit + back to category
+    - Title: 🏷️ Продукт: <name> (+ stock by location if there are several)
+    - Buttons: edit/delete + qty/limit (per location) + back to category
 
     Behavior:
-    - Loads product by id
+    - Loads product with its stock by id in one query (or takes it from render cache)
     - Sends a new message with text + inline keyboard
     """
-    row = db.get_product(prod_id)
-    if not row:
+    screen = product_screen(prod_id)
+    if not screen:
         await message.reply_text("Продукт не знайдено.")
         return
 
-    prod_id, cat_id, name, qty, limit_qty, below_limit = row
-    text = f"🏷️ Продукт: {name}"
-
-    await message.reply_text(
-        text,
-        reply_markup=product_view_keyboard(prod_id, cat_id, qty, limit_qty),
-    )
+    text, markup = screen
+    await reply_screen(message, text, markup, live=("prod", int(prod_id)))
 
 
 async def send_tasks_cat_reply(message, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -162,10 +353,10 @@ async def send_tasks_cat_reply(message, context: ContextTypes.DEFAULT_TYPE) -> N
 
     Behavior:
     - Builds a short screen text
-    - Attaches inline keyboard with tasks categories
+    - Attaches inline keyboard with tasks categories and their open-task counts
     """
-    text = "Категорії списку завдань:"
-    await message.reply_text(text, reply_markup=tasks_cat_keyboard())
+    text, markup = task_procs_screen()
+    await reply_screen(message, text, markup, live=("task_procs", None))
 
 
 async def render_tasks_cat_edit(query, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -175,64 +366,35 @@ async def render_tasks_cat_edit(query, context: ContextTypes.DEFAULT_TYPE) -> No
     Behavior:
     - Edits the current message with updated text and inline keyboard
     """
-    text = "Категорії списку завдань:"
-    await safe_edit_message(query, text, reply_markup=tasks_cat_keyboard())
+    text, markup = task_procs_screen()
+    await safe_edit_message(query, text, reply_markup=markup, live=("task_procs", None))
 
 
 async def send_tasks_reply(message, context: ContextTypes.DEFAULT_TYPE, tc_id) -> None:
-    tasks_cat = TASK_PROCESSES[tc_id]['name']
-    tasks_rows = db.list_all_tasks_by_category(tc_id)
-
-    if tasks_rows:
-        text = f"📋 Список завдань: {tasks_cat}\n\n"
-    else:
-        text = f"📦 Процес: {tasks_cat}\n\nЗавдань поки немає."
-
-    await message.reply_text(text, reply_markup=tasks_keyboard(tc_id, tasks_rows))
+    text, markup = tasks_screen(tc_id)
+    await reply_screen(message, text, markup, live=("task_proc", int(tc_id)))
 
 
 async def render_tasks_edit(query, context: ContextTypes.DEFAULT_TYPE, tc_id) -> None:
-    tasks_cat = TASK_PROCESSES[tc_id]['name']
-    tasks_rows = db.list_all_tasks_by_category(tc_id)
-
-    if tasks_rows:
-        text = f"📋 Список завдань: {tasks_cat}\n\n"
-    else:
-        text = f"📦 Процес: {tasks_cat}\n\nЗавдань поки немає."
-
-    await safe_edit_message(
-        query,
-        text,
-        reply_markup=tasks_keyboard(tc_id, tasks_rows)
-    )
+    text, markup = tasks_screen(tc_id)
+    await safe_edit_message(query, text, reply_markup=markup, live=("task_proc", int(tc_id)))
 
 
 async def render_task_edit(query, context: ContextTypes.DEFAULT_TYPE, task_id: int) -> None:
-    task = db.get_task(task_id)
-    if not task:
+    screen = task_screen(task_id)
+    if not screen:
         await query.answer("Завдання не знайдено.", show_alert=True)
         return
 
-    task_id, task_text, task_cat_id = task
-    text = f"🏷️ Завдання:\n {task_text}"
-
-    await safe_edit_message(
-        query,
-        text,
-        reply_markup=task_view_keyboard(task_id, task_cat_id),
-    )
+    text, markup = screen
+    await safe_edit_message(query, text, reply_markup=markup)
 
 
 async def send_task_reply(message, context: ContextTypes.DEFAULT_TYPE, task_id: int) -> None:
-    task = db.get_task(task_id)
-    if not task:
-        await message.answer("Завдання не знайдено.", show_alert=True)
+    screen = task_screen(task_id)
+    if not screen:
+        await message.reply_text("Завдання не знайдено.")
         return
 
-    task_id, task_text, task_cat_id = task
-    text = f"🏷️ Завдання:\n {task_text}"
-
-    await message.reply_text(
-        text,
-        reply_markup=task_view_keyboard(task_id, task_cat_id),
-    )
\ No newline at end of file
+    text, markup = screen
+    await reply_screen(message, text, markup)
@@ -19,6 +19,48 @@ TASK_PROCESSES = {
     }
 }
 
+# How often (seconds) changed user_data / conversation states are written to SQLite
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "5"))
+
+# How many updates are handled at the same time (updates of one chat are always handled in order)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "16"))
+
+# Bot API server, e.g. a local Bot API server or the fake one from benchmarks/ ("" = api.telegram.org)
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "")
+
+# Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 = disabled);
+# worker processes use METRICS_PORT + WORKER_INDEX
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Telegram user ids allowed to use admin commands (/profile), comma separated
+ADMIN_IDS = frozenset(int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x)
+
+# Stock history retention (days): raw changes, hourly rollups; daily rollups are kept forever
+STOCK_HISTORY_RAW_DAYS = float(os.getenv("STOCK_HISTORY_RAW_DAYS", "2"))
+STOCK_HISTORY_HOURLY_DAYS = float(os.getenv("STOCK_HISTORY_HOURLY_DAYS", "90"))
+
+# Order suggestions in the reorder list: days of consumption to cover, safety stock in days
+# of consumption (at least the product's limit), consumption averaged over this many days
+# (today included; fewer for a product with a shorter history)
+REORDER_TARGET_DAYS = float(os.getenv("REORDER_TARGET_DAYS", "14"))
+REORDER_SAFETY_DAYS = float(os.getenv("REORDER_SAFETY_DAYS", "3"))
+REORDER_CONSUMPTION_DAYS = max(1, int(os.getenv("REORDER_CONSUMPTION_DAYS", "28")))
+
+# "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+
+# Webhook mode: public base URL Telegram posts to, local path and listen address
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+
+# Worker processes, each handling a partition of chats (1 = everything in this process)
+WORKERS = max(1, int(os.getenv("WORKERS", "1")))
+# Set by the supervisor for every worker process
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+
 
 def get_bot_token() -> str:
     """
@@ -31,3 +73,18 @@ def get_bot_token() -> str:
     if not token:
         raise RuntimeError("BOT_TOKEN not found in environment variables")
     return token
+
+
+def get_webhook_secret() -> str:
+    """
+    Load WEBHOOK_SECRET (sent back by Telegram in X-Telegram-Bot-Api-Secret-Token).
+
+    Raises:
+        RuntimeError: If WEBHOOK_SECRET is missing or has characters Telegram does not allow.
+    """
+    secret = os.getenv("WEBHOOK_SECRET", "")
+    if not secret:
+        raise RuntimeError("WEBHOOK_SECRET not found in environment variables")
+    if len(secret) > 256 or not all(c.isascii() and (c.isalnum() or c in "_-") for c in secret):
+        raise RuntimeError("WEBHOOK_SECRET must be 1-256 characters: A-Z, a-z, 0-9, _ and -")
+    return secret
@@ -1,9 +1,17 @@
+import itertools
+
 from telegram import Update
 from telegram.ext import Application, ContextTypes, MessageHandler, filters
 
-from app.bot_ui.keyboards import bottom_kb
+from app.bot_ui.keyboards import bottom_kb, reorder_export_keyboard
 from app.bot_ui.screens import send_categories_reply, send_tasks_cat_reply
+from app.services.export import build_reorder_document, xlsx_available
+from app.services.reorder import reorder_suggestions
 from app.storage import db
+from app.utils.text import split_message
+
+REORDER_TITLE = "📝 Список дозамовлення:"
+MAX_REORDER_MESSAGES = 5    # a longer list is sent as its first message + the exported document
 
 
 async def bottom_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -57,24 +65,81 @@ async def bottom_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def send_reorder_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Render reorder list based on current DB state.
+
+    Rows are streamed from DB and the text is split into several messages
+    if it does not fit into Telegram's message limit. The last message
+    has buttons to export the same list as a document. A list longer than
+    MAX_REORDER_MESSAGES messages is not built in full: its first message
+    is followed by the document.
     """
     chat_id = update.effective_chat.id
-    rows = db.list_reorder_items()
 
-    if not rows:
+    # Chunks are built before sending: the DB cursor must not stay open across network awaits
+    rows = db.iter_reorder_items()
+    chunks = list(itertools.islice(
+        split_message(_reorder_lines(rows, reorder_suggestions.get())), MAX_REORDER_MESSAGES + 1
+    ))
+    rows.close()
+    if chunks == [REORDER_TITLE]:
         await update.message.reply_text("✅ Немає позицій для дозамовлення.", reply_markup=bottom_kb(chat_id))
         return
 
-    msg_lines = ["📝 Список дозамовлення:"]
+    if len(chunks) > MAX_REORDER_MESSAGES:
+        await update.message.reply_text(chunks[0])
+        await send_reorder_document(update.message, "xlsx" if xlsx_available() else "csv")
+        return
+
+    for chunk in chunks[:-1]:
+        await update.message.reply_text(chunk)
+    await update.message.reply_text(chunks[-1], reply_markup=reorder_export_keyboard(xlsx_available()))
+
+
+async def send_category_summary(message, cat_id: int) -> None:
+    """
+    Stock totals of a category with all its subcategories, followed by their reorder list.
+    """
+    cat = db.get_category(cat_id)
+    if not cat:
+        await message.reply_text("Категорію не знайдено.")
+        return
+
+    categories, products, total_qty, to_reorder = db.subtree_stock_totals(cat_id)
+    header = (
+        f"📊 {cat[1]} (разом з підкатегоріями)\n"
+        f"Підкатегорій: {categories - 1}\n"
+        f"Продуктів: {products}, загальна кількість: {round(total_qty, 6)}\n"
+        f"Дозамовити: {to_reorder}"
+    )
+    lines = list(_reorder_lines(db.iter_reorder_items(cat_id=cat_id), reorder_suggestions.get()))
+    if lines == [REORDER_TITLE]:
+        await message.reply_text(header)
+        return
+
+    for chunk in list(split_message(itertools.chain([header, ""], lines))):
+        await message.reply_text(chunk)
+
+
+def _reorder_lines(rows, suggestions):
+    yield REORDER_TITLE
     current_cat = None
 
-    for _, cat_name, _, prod_name, qty, limit_qty in rows:
+    for _, cat_name, prod_id, prod_name, qty, limit_qty, location in rows:
         if current_cat != cat_name:
             current_cat = cat_name
-            msg_lines.append(f"\n📦 {cat_name}:")
-        msg_lines.append(f" • {prod_name} — {qty} (ліміт {limit_qty})")
+            yield f"\n📦 {cat_name}:"
+        where = "" if location is None else f" 📍 {location}"
+        # Suggestions are for the product total (consumption is tracked per product)
+        order = suggestions.get(prod_id) if location is None else None
+        yield f" • {prod_name}{where} — {qty} (ліміт {limit_qty})" + ("" if order is None else f" → замовити {order}")
+
 
-    await update.message.reply_text("\n".join(msg_lines), reply_markup=bottom_kb(chat_id))
+async def send_reorder_document(message, fmt: str) -> None:
+    """
+    Send reorder list as a CSV/XLSX document (e.g. to forward it to suppliers).
+    """
+    filename, fh = build_reorder_document(fmt)
+    with fh:
+        await message.reply_document(document=fh, filename=filename, caption="📝 Список дозамовлення")
 
 
 def register_bottom_menu_handlers(app: Application) -> None:
@@ -1,7 +1,4 @@
-from dataclasses import dataclass
-from typing import Optional
-
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from telegram.ext import Application, CallbackQueryHandler, ContextTypes
 
 from app.storage import db
@@ -14,39 +11,10 @@ from app.bot_ui.screens import (
     send_category_reply, render_tasks_cat_edit, render_tasks_edit, render_task_edit, send_tasks_reply,
 )
 from app.bot_ui.keyboards import category_actions_keyboard
-
-
-# ---------- Parsing ----------
-
-@dataclass(frozen=True)
-class Callback:
-    scope: str            # nav | cat | prod
-    action: str           # open | del | del_yes | actions | cats
-    entity_id: Optional[int] = None
-
-
-def parse_callback(data: str) -> Optional[Callback]:
-    """
-    Parse callback_data in format:
-    - nav:cats
-    - cat:open:<id>
-    - cat:del:<id>
-    - cat:del_yes:<id>
-    - cat:actions:<id>
-    - prod:open:<id>
-    - prod:del:<id>
-    - prod:del_yes:<id>
-    """
-    parts = (data or "").split(":")
-    if len(parts) == 2:
-        return Callback(scope=parts[0], action=parts[1], entity_id=None)
-
-    if len(parts) == 3:
-        scope, action, raw_id = parts
-        if raw_id.isdigit():
-            return Callback(scope=scope, action=action, entity_id=int(raw_id))
-
-    return None
+from app.handlers.bottom_menu import send_category_summary, send_reorder_document
+from app.handlers.routing import Callback, router
+from app.services.stock_history import history_text
+from app.utils.callback_codec import encode_callback
 
 
 def confirm_kb(yes_cb: str, no_cb: str) -> InlineKeyboardMarkup:
@@ -59,188 +27,165 @@ def confirm_kb(yes_cb: str, no_cb: str) -> InlineKeyboardMarkup:
     ]])
 
 
-# ---------- Handlers ----------
+# ---------- Navigation ----------
 
-async def handle_nav(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
-    """
-    Handle navigation callbacks.
-    """
-    if cb.action == "cats":
-        context.user_data.pop("active_cat_id", None)
-        await render_categories_edit(q, context)
-        return
+@router.route("nav:cats", with_id=False)
+async def nav_cats(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    context.user_data.pop("active_cat_id", None)
+    await render_categories_edit(q, context)
 
-    if cb.action == "task_proc":
-        context.user_data.pop("active_task_proc_id", None)
-        await render_tasks_cat_edit(q, context)
-        return
 
+@router.route("nav:task_proc", with_id=False)
+async def nav_task_proc(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    context.user_data.pop("active_task_proc_id", None)
+    await render_tasks_cat_edit(q, context)
 
-async def handle_cat(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
-    """
-    Handle category-related callbacks.
-    """
+
+# ---------- Categories ----------
+
+@router.route("cat:open")
+async def cat_open(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    context.user_data["active_cat_id"] = cb.entity_id
+    context.user_data.pop("active_prod_id", None)
+    await render_category_edit(q, context, cb.entity_id)
+
+
+@router.route("cat:actions")
+async def cat_actions(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
     cat_id = cb.entity_id
-    if cat_id is None:
+    cat = db.get_category(cat_id)
+    if not cat:
+        await q.message.reply_text("Категорію не знайдено.")
         return
 
-    if cb.action == "open":
-        context.user_data["active_cat_id"] = cat_id
-        context.user_data.pop("active_prod_id", None)
-        await render_category_edit(q, context, cat_id)
-        return
+    await safe_edit_message(
+        q,
+        text=f"📦 Категорія: {cat[1]} (№{cat_id})\n\n"
+             f"Перемістити в іншу категорію: /move_category {cat_id} <№ категорії або 0>",
+        reply_markup=category_actions_keyboard(cat_id),
+    )
 
-    if cb.action == "actions":
-        cat = db.get_category(cat_id)
-        if not cat:
-            await q.message.reply_text("Категорію не знайдено.")
-            return
-
-        await safe_edit_message(
-            q,
-            text=f"📦 Категорія: {cat[1]}",
-            reply_markup=category_actions_keyboard(cat_id),
-        )
-        return
 
-    if cb.action == "del":
-        cat = db.get_category(cat_id)
-        if not cat:
-            await q.message.reply_text("Категорію не знайдено.")
-            return
-
-        kb = confirm_kb(
-            yes_cb=f"cat:del_yes:{cat_id}",
-            no_cb="nav:cats",
-        )
-        await q.message.reply_text(f"Точно видалити категорію «{cat[1]}»?", reply_markup=kb)
+@router.route("cat:summary")
+async def cat_summary(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    await send_category_summary(q.message, cb.entity_id)
+
+
+@router.route("cat:del")
+async def cat_del(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    cat_id = cb.entity_id
+    cat = db.get_category(cat_id)
+    if not cat:
+        await q.message.reply_text("Категорію не знайдено.")
         return
 
-    if cb.action == "del_yes":
-        db.delete_category(cat_id)
+    kb = confirm_kb(
+        yes_cb=encode_callback("cat:del_yes", cat_id),
+        no_cb=encode_callback("nav:cats"),
+    )
+    await q.message.reply_text(
+        f"Точно видалити категорію «{cat[1]}» разом з підкатегоріями та продуктами?", reply_markup=kb
+    )
 
-        # Remove inline keyboard from the old message to prevent further clicks
-        await safe_edit_message(q, text=q.message.text or " ", reply_markup=None)
 
-        await q.message.reply_text("🗑️ Категорію видалено.")
-        await send_categories_reply(q.message, context)
-        return
+@router.route("cat:del_yes")
+async def cat_del_yes(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    db.delete_category(cb.entity_id)
 
+    # Remove inline keyboard from the old message to prevent further clicks
+    await safe_edit_message(q, text=q.message.text or " ", reply_markup=None)
 
-async def handle_prod(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
-    """
-    Handle product-related callbacks.
-    """
+    await q.message.reply_text("🗑️ Категорію видалено.")
+    await send_categories_reply(q.message, context)
+
+
+# ---------- Products ----------
+
+@router.route("prod:open")
+async def prod_open(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    context.user_data["active_prod_id"] = cb.entity_id
+    await render_product_edit(q, context, cb.entity_id)
+
+
+@router.route("prod:del")
+async def prod_del(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
     prod_id = cb.entity_id
-    if prod_id is None:
+    prod = db.get_product(prod_id)
+    if not prod:
+        await q.message.reply_text("Продукт не знайдено.")
         return
 
-    if cb.action == "open":
-        context.user_data["active_prod_id"] = prod_id
-        await render_product_edit(q, context, prod_id)
-        return
+    _, cat_id, name, qty, _, _ = prod
+    context.user_data["active_cat_id"] = cat_id
 
-    if cb.action == "del":
-        prod = db.get_product(prod_id)
-        if not prod:
-            await q.message.reply_text("Продукт не знайдено.")
-            return
+    kb = confirm_kb(
+        yes_cb=encode_callback("prod:del_yes", prod_id),
+        no_cb=encode_callback("prod:open", prod_id),
+    )
+    await q.message.reply_text(f"Точно видалити продукт «{name} — {qty}»?", reply_markup=kb)
 
-        _, cat_id, name, qty, _, _ = prod
-        context.user_data["active_cat_id"] = cat_id
 
-        kb = confirm_kb(
-            yes_cb=f"prod:del_yes:{prod_id}",
-            no_cb=f"prod:open:{prod_id}",
-        )
-        await q.message.reply_text(f"Точно видалити продукт «{name} — {qty}»?", reply_markup=kb)
+@router.route("prod:del_yes")
+async def prod_del_yes(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    cat_id = db.delete_product(cb.entity_id)
+    if cat_id is None:
+        await q.message.reply_text("Продукт не знайдено.")
         return
 
-    if cb.action == "del_yes":
-        prod = db.get_product(prod_id)
-        if not prod:
-            await q.message.reply_text("Продукт не знайдено.")
-            return
+    await q.message.reply_text("🗑️ Продукт видалено.")
+    await send_category_reply(q.message, context, int(cat_id))
 
-        _, cat_id, _, _, _, _ = prod
-        db.delete_product(prod_id)
 
-        await q.message.reply_text("🗑️ Продукт видалено.")
-        await send_category_reply(q.message, context, int(cat_id))
-        return
+@router.route("prod:history")
+async def prod_history(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    text = history_text(cb.entity_id)
+    await q.message.reply_text(text or "Продукт не знайдено (можливо видалений).")
 
 
-async def handle_tasks_cat(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
-    """
-    Handle tasks category callbacks.
-    """
-    tc_id = cb.entity_id
-    if cb.action == "open":
-        context.user_data["active_tc_id"] = tc_id
-        await render_tasks_edit(q, context, tc_id)
-        return
+# ---------- Tasks ----------
 
+@router.route("task_proc:open")
+async def task_proc_open(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    context.user_data["active_tc_id"] = cb.entity_id
+    await render_tasks_edit(q, context, cb.entity_id)
 
-async def handle_tasks(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
-    """
-    Handle tasks callbacks.
-    """
-    task_id = cb.entity_id
-    if cb.action == "open":
-        context.user_data["active_task_id"] = task_id
-        await render_task_edit(q, context, task_id)
-        return
 
-    if cb.action == "done":
-        task = db.get_task(task_id)
-        if not task:
-            await q.message.reply_text("Завдання не знайдено.")
-            return
+@router.route("task:open")
+async def task_open(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    context.user_data["active_task_id"] = cb.entity_id
+    await render_task_edit(q, context, cb.entity_id)
 
-        task_id, task_text, task_cat_id = task
-        db.set_task_done(task_id, 1)
 
-        await q.message.reply_text("✅ Завдання виконано!")
-        await send_tasks_reply(q.message, context, int(task_cat_id))
+@router.route("task:done")
+async def task_done(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    task = db.get_task(cb.entity_id)
+    if not task:
+        await q.message.reply_text("Завдання не знайдено.")
         return
 
+    task_id, task_text, task_cat_id = task
+    db.set_task_done(task_id, 1)
 
-# ---------- Entry point ----------
+    await q.message.reply_text("✅ Завдання виконано!")
+    await send_tasks_reply(q.message, context, int(task_cat_id))
 
-async def callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """
-    Main callback router: parses callback_data and dispatches to specific handlers.
-    """
-    q = update.callback_query
-    await q.answer()
 
-    cb = parse_callback(q.data or "")
-    if not cb:
-        return
+# ---------- Reorder list ----------
 
-    if cb.scope == "nav":
-        await handle_nav(q, context, cb)
-        return
+@router.route("reorder:csv", with_id=False)
+async def reorder_csv(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    await send_reorder_document(q.message, "csv")
 
-    if cb.scope == "cat":
-        await handle_cat(q, context, cb)
-        return
-
-    if cb.scope == "prod":
-        await handle_prod(q, context, cb)
-        return
 
-    if cb.scope == "task_proc":
-        await handle_tasks_cat(q, context, cb)
-        return
+@router.route("reorder:xlsx", with_id=False)
+async def reorder_xlsx(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, cb: Callback) -> None:
+    await send_reorder_document(q.message, "xlsx")
 
-    if cb.scope == "task":
-        await handle_tasks(q, context, cb)
-        return
 
+# ---------- Entry point ----------
 
 def register_callback_handlers(app: Application) -> None:
     """
-    Register generic callback handler.
+    Register generic callback handler: one parse + one dict lookup per update.
     """
-    app.add_handler(CallbackQueryHandler(callbacks))
+    app.add_handler(CallbackQueryHandler(router.dispatch))
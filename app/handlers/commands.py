@@ -1,10 +1,35 @@
+import sqlite3
+from datetime import datetime
+
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
+from app.config import ADMIN_IDS, TASK_PROCESSES
+from app.services.profiler import DEFAULT_SECONDS, DEFAULT_UPDATES, MAX_SECONDS, MAX_UPDATES, update_profiler
+from app.services.recurring import format_time, parse_schedule
+from app.services.stock_history import DEFAULT_PERIOD, history_text, parse_period
 from app.storage import db
 from app.bot_ui.keyboards import bottom_kb
-from app.bot_ui.screens import send_categories_reply
+from app.bot_ui.render_cache import screen_cache
+from app.bot_ui.fingerprints import message_fingerprints
+from app.bot_ui.screens import send_categories_reply, send_category_reply, valuation_report
 from app.handlers.bottom_menu import send_reorder_list
+from app.utils.text import split_message
+
+HISTORY_USAGE = (
+    "Використання: /history <номер або назва продукту> [період]\n"
+    "Період: 24h, 7d, 4w (або 24г, 7д, 4т), за замовчуванням 7d"
+)
+
+RECURRING_ADD_USAGE = (
+    "Використання: /recurring_add <процес> <розклад> | <текст завдання>\n"
+    "Процес: 1-3 або cold / hot / delivery\n"
+    "Розклад:\n"
+    "  щодня 07:30 (daily 07:30)\n"
+    "  щотижня пн,чт 07:00 (weekly mon,thu 07:00)\n"
+    "  cron 0 7 * * 1-5\n"
+    "Приклад: /recurring_add 1 щодня 07:30 | Перевірити температуру"
+)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -25,6 +50,85 @@ async def categories_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await send_categories_reply(update.message, context)
 
 
+async def move_category_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Move a category with its subcategories: /move_category <id> <new parent id | 0 for top level>
+    """
+    args = [arg.lstrip("#№") for arg in context.args or []]
+    if len(args) != 2 or not all(arg.isdigit() for arg in args):
+        await update.message.reply_text(
+            "Використання: /move_category <№ категорії> <№ нової батьківської категорії або 0>\n"
+            "Номер категорії показано в «⚙️ Дії з категорією»."
+        )
+        return
+
+    cat_id, parent_id = int(args[0]), int(args[1]) or None
+    try:
+        moved = db.move_category(cat_id, parent_id)
+    except ValueError:
+        await update.message.reply_text("Не можна перемістити категорію в саму себе або в її підкатегорію.")
+        return
+    if not moved:
+        await update.message.reply_text("Категорію не знайдено.")
+        return
+
+    await update.message.reply_text("✅ Категорію переміщено.")
+    if parent_id is None:
+        await send_categories_reply(update.message, context)
+    else:
+        await send_category_reply(update.message, context, parent_id)
+
+
+async def locations_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    List storage locations.
+    """
+    lines = ["📍 Локації:"]
+    lines += [f"#{location_id} {name}" for location_id, name in db.list_locations()]
+    lines.append("\nДодати: /location_add <назва>\nВидалити: /location_del <номер>")
+    await update.message.reply_text("\n".join(lines))
+
+
+async def location_add_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Add a storage location: /location_add <name>
+    """
+    name = " ".join(context.args or []).strip()
+    if not name:
+        await update.message.reply_text("Використання: /location_add <назва>")
+        return
+
+    try:
+        location_id = db.add_location(name)
+    except sqlite3.IntegrityError:
+        await update.message.reply_text("Така локація вже існує.")
+        return
+    await update.message.reply_text(
+        f"✅ Додано локацію #{location_id}: {name}\n"
+        "Кількість і ліміт по локаціях задаються на екрані продукту."
+    )
+
+
+async def location_del_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Delete a storage location with its stock: /location_del <id>
+    """
+    args = context.args or []
+    if len(args) != 1 or not args[0].lstrip("#").isdigit():
+        await update.message.reply_text("Використання: /location_del <номер>")
+        return
+
+    try:
+        deleted = db.delete_location(int(args[0].lstrip("#")))
+    except ValueError:
+        await update.message.reply_text("Основну локацію видалити не можна.")
+        return
+    if deleted:
+        await update.message.reply_text("🗑️ Локацію видалено разом із залишками на ній.")
+    else:
+        await update.message.reply_text("Локацію не знайдено.")
+
+
 async def reorder_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Show reorder list (items below limit).
@@ -32,6 +136,50 @@ async def reorder_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await send_reorder_list(update, context)
 
 
+async def valuation_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Show the stock value per category and location (needs unit prices of products).
+    """
+    for chunk in valuation_report():
+        await update.message.reply_text(chunk)
+
+
+async def history_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Stock level chart of a product: /history <id or name> [24h | 7d | 4w]
+    """
+    words = list(context.args or [])
+    if not words:
+        await update.message.reply_text(HISTORY_USAGE)
+        return
+
+    period = DEFAULT_PERIOD
+    if len(words) > 1:
+        try:
+            period = parse_period(words[-1])
+            words.pop()
+        except ValueError:
+            pass
+    query = " ".join(words)
+
+    if query.isdigit():
+        prod_id = int(query)
+    else:
+        found = db.find_products(query)
+        if not found:
+            await update.message.reply_text("Продукт не знайдено.")
+            return
+        if len(found) > 1 and found[0][1].lower() != query.lower():
+            lines = ["Знайдено кілька продуктів, вкажи номер:"]
+            lines += [f"#{p_id} {name} ({cat_name})" for p_id, name, cat_name in found]
+            await update.message.reply_text("\n".join(lines))
+            return
+        prod_id = found[0][0]
+
+    text = history_text(prod_id, period)
+    await update.message.reply_text(text or "Продукт не знайдено.")
+
+
 async def subscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Subscribe current chat to notifications.
@@ -50,12 +198,151 @@ async def unsubscribe_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("🔕 Ти відписаний(а) від сповіщень.", reply_markup=bottom_kb(chat_id))
 
 
+async def cache_stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Show render cache hit rate.
+    """
+    stats = screen_cache.stats()
+    await update.message.reply_text(
+        f"Кеш екранів: {stats['entries']} записів\n"
+        f"Влучання: {stats['hits']}, промахи: {stats['misses']}\n"
+        f"Hit rate: {stats['hit_rate']:.1%}\n"
+        f"Пропущено зайвих редагувань: {message_fingerprints.skipped}"
+    )
+
+
+async def profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Admin only: profile the next N updates or T seconds.
+    Usage: /profile [updates] [seconds], /profile stop
+    """
+    if update.effective_user is None or update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("⛔ Команда доступна лише адміністраторам.")
+        return
+
+    args = context.args or []
+    if args and args[0].lower() == "stop":
+        if not update_profiler.running:
+            await update.message.reply_text("Профілювання не запущено.")
+            return
+        update_profiler.stop()
+        await update.message.reply_text("⏹ Профілювання зупинено. Звіт прийде сюди.")
+        return
+
+    try:
+        updates = int(args[0]) if len(args) > 0 else DEFAULT_UPDATES
+        seconds = float(args[1]) if len(args) > 1 else DEFAULT_SECONDS
+    except ValueError:
+        await update.message.reply_text("Використання: /profile [кількість оновлень] [секунд] або /profile stop")
+        return
+
+    updates = max(1, min(updates, MAX_UPDATES))
+    seconds = max(1.0, min(seconds, MAX_SECONDS))
+    if not update_profiler.start(context.bot, update.effective_chat.id, updates, seconds, update.update_id):
+        await update.message.reply_text("Профілювання вже запущено. Зупинити: /profile stop")
+        return
+
+    await update.message.reply_text(
+        f"🔬 Профілювання увімкнено: наступні {updates} оновлень або {seconds:.0f} с.\n"
+        "Звіт прийде сюди автоматично."
+    )
+
+
+def _parse_process(text: str) -> int | None:
+    if text.isdigit() and int(text) in TASK_PROCESSES:
+        return int(text)
+    for tc_id, data in TASK_PROCESSES.items():
+        if data["key"] == text.lower():
+            return tc_id
+    return None
+
+
+async def recurring_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    List recurring task templates.
+    """
+    templates = db.list_task_templates()
+    if not templates:
+        await update.message.reply_text("Повторюваних завдань немає.\n\n" + RECURRING_ADD_USAGE)
+        return
+
+    lines = ["🔁 Повторювані завдання:"]
+    for template_id, tc_id, text, schedule, next_run in templates:
+        lines.append(
+            f"#{template_id} [{TASK_PROCESSES[tc_id]['name']}] {schedule} → {next_run or '—'}\n    {text}"
+        )
+    lines.append("\nВидалити: /recurring_del <номер>")
+    for chunk in split_message(lines):
+        await update.message.reply_text(chunk)
+
+
+async def recurring_add_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Add a recurring task template: /recurring_add <process> <schedule> | <text>
+    """
+    raw = (update.message.text or "").partition(" ")[2]
+    head, sep, text = raw.partition("|")
+    words = head.split()
+    if not sep or not text.strip() or len(words) < 2:
+        await update.message.reply_text(RECURRING_ADD_USAGE)
+        return
+
+    tc_id = _parse_process(words[0])
+    if tc_id is None:
+        await update.message.reply_text("Невідомий процес.\n\n" + RECURRING_ADD_USAGE)
+        return
+
+    schedule_text = " ".join(words[1:])
+    try:
+        schedule = parse_schedule(schedule_text)
+    except ValueError:
+        await update.message.reply_text("Невірний розклад.\n\n" + RECURRING_ADD_USAGE)
+        return
+
+    first_run = schedule.next_after(datetime.now())
+    if first_run is None:
+        await update.message.reply_text("Цей розклад ніколи не спрацює.\n\n" + RECURRING_ADD_USAGE)
+        return
+
+    next_run = format_time(first_run)
+    template_id = db.add_task_template(update.effective_chat.id, tc_id, text, schedule_text, next_run)
+    await update.message.reply_text(
+        f"✅ Повторюване завдання #{template_id} додано.\nНаступне створення: {next_run}"
+    )
+
+
+async def recurring_del_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Delete a recurring task template: /recurring_del <id>
+    """
+    args = context.args or []
+    if len(args) != 1 or not args[0].lstrip("#").isdigit():
+        await update.message.reply_text("Використання: /recurring_del <номер>")
+        return
+
+    if db.delete_task_template(int(args[0].lstrip("#"))):
+        await update.message.reply_text("🗑️ Повторюване завдання видалено. Уже створені завдання залишились.")
+    else:
+        await update.message.reply_text("Повторюване завдання не знайдено.")
+
+
 def register_command_handlers(app: Application) -> None:
     """
     Register /commands handlers.
     """
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("categories", categories_cmd))
+    app.add_handler(CommandHandler("move_category", move_category_cmd))
     app.add_handler(CommandHandler("reorder", reorder_cmd))
+    app.add_handler(CommandHandler("valuation", valuation_cmd))
+    app.add_handler(CommandHandler("history", history_cmd))
+    app.add_handler(CommandHandler("locations", locations_cmd))
+    app.add_handler(CommandHandler("location_add", location_add_cmd))
+    app.add_handler(CommandHandler("location_del", location_del_cmd))
     app.add_handler(CommandHandler("subscribe", subscribe_cmd))
     app.add_handler(CommandHandler("unsubscribe", unsubscribe_cmd))
+    app.add_handler(CommandHandler("cache_stats", cache_stats_cmd))
+    app.add_handler(CommandHandler("profile", profile_cmd))
+    app.add_handler(CommandHandler("recurring", recurring_cmd))
+    app.add_handler(CommandHandler("recurring_add", recurring_add_cmd))
+    app.add_handler(CommandHandler("recurring_del", recurring_del_cmd))
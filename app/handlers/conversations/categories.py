@@ -13,7 +13,8 @@ from telegram.ext import (
 from app.storage import db
 from app.bot_ui.keyboards import bottom_kb, cancel_keyboard
 from app.bot_ui.screens import send_categories_reply, send_category_reply
-from app.handlers.conversations.common import on_cancel
+from app.handlers.conversations.common import MeteredConversationHandler, on_cancel
+from app.handlers.routing import callback_pattern, router
 
 CAT_ADD_NAME = 1
 CAT_EDIT_NAME = 2
@@ -23,6 +24,7 @@ async def cat_add_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Entry point for adding a category via command.
     """
+    context.user_data.pop("cat_add_parent_id", None)
     await update.message.reply_text("Введи назву нової категорії:", reply_markup=cancel_keyboard("cat"))
     return CAT_ADD_NAME
 
@@ -33,10 +35,32 @@ async def cat_add_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE
     """
     q = update.callback_query
     await q.answer()
+    context.user_data.pop("cat_add_parent_id", None)
     await q.message.reply_text("Введи назву нової категорії:", reply_markup=cancel_keyboard("cat"))
     return CAT_ADD_NAME
 
 
+async def cat_add_sub_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Entry point for adding a subcategory of the opened category.
+    """
+    q = update.callback_query
+    await q.answer()
+
+    parent_id = router.parse(q.data).entity_id
+    parent = db.get_category(parent_id)
+    if not parent:
+        await q.message.reply_text("Категорію не знайдено.")
+        return ConversationHandler.END
+
+    context.user_data["cat_add_parent_id"] = parent_id
+    await q.message.reply_text(
+        f"Введи назву нової підкатегорії в «{parent[1]}»:",
+        reply_markup=cancel_keyboard("cat"),
+    )
+    return CAT_ADD_NAME
+
+
 async def cat_add_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Persist new category name into DB.
@@ -46,15 +70,25 @@ async def cat_add_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Назва не може бути порожньою. Введи ще раз:")
         return CAT_ADD_NAME
 
+    parent_id = context.user_data.get("cat_add_parent_id")
+    if parent_id is not None and not db.get_category(parent_id):
+        context.user_data.pop("cat_add_parent_id", None)
+        await update.message.reply_text("Категорію не знайдено.")
+        return ConversationHandler.END
+
     try:
-        db.add_category(name)
+        db.add_category(name, parent_id)
     except sqlite3.IntegrityError:
         await update.message.reply_text("Така категорія вже існує. Введи іншу:", reply_markup=cancel_keyboard("cat"))
         return CAT_ADD_NAME
 
+    context.user_data.pop("cat_add_parent_id", None)
     chat_id = update.effective_chat.id
     await update.message.reply_text(f"✅ Додано категорію: {name}", reply_markup=bottom_kb(chat_id))
-    await send_categories_reply(update.message, context)
+    if parent_id is None:
+        await send_categories_reply(update.message, context)
+    else:
+        await send_category_reply(update.message, context, int(parent_id))
     return ConversationHandler.END
 
 
@@ -65,7 +99,7 @@ async def cat_edit_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
     q = update.callback_query
     await q.answer()
 
-    cat_id = int((q.data or "").split(":")[2])
+    cat_id = router.parse(q.data).entity_id
     cat = db.get_category(cat_id)
     if not cat:
         await q.message.reply_text("Категорію не знайдено.")
@@ -110,19 +144,24 @@ def register_category_conversations(app: Application) -> None:
     """
     Register ConversationHandlers for category flows.
     """
-    app.add_handler(ConversationHandler(
+    app.add_handler(MeteredConversationHandler(
         entry_points=[
             CommandHandler("add_category", cat_add_cmd),
-            CallbackQueryHandler(cat_add_from_button, pattern=r"^cat:add$"),
+            router.entry_point("cat:add", cat_add_from_button),
+            router.entry_point("cat:add_sub", cat_add_sub_from_button, with_id=True),
         ],
         states={CAT_ADD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, cat_add_name)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(cat:cancel|prod:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
         allow_reentry=True,
+        name="cat_add",
+        persistent=True,
     ))
 
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(cat_edit_from_button, pattern=r"^cat:edit:\d+$")],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("cat:edit", cat_edit_from_button, with_id=True)],
         states={CAT_EDIT_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, cat_edit_name)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(cat:cancel|prod:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
         allow_reentry=True,
+        name="cat_edit",
+        persistent=True,
     ))
@@ -4,6 +4,22 @@ from telegram.ext import ContextTypes, ConversationHandler
 from app.bot_ui.keyboards import bottom_kb
 from app.bot_ui.screens import send_categories_reply, send_category_reply, send_product_reply, send_tasks_reply, \
     send_task_reply
+from app.services.update_processor import set_handler_label
+
+
+class MeteredConversationHandler(ConversationHandler):
+    """
+    ConversationHandler that labels the messages it handles conversation:<name>:<state>
+    in the handler latency metrics, using the state PTB already looked up for them.
+    """
+
+    __slots__ = ()
+
+    async def handle_update(self, update, application, check_result, context):
+        state = check_result[0]   # state before handling; None while the update only hits an entry point
+        if state is not None and isinstance(update, Update) and update.callback_query is None:
+            set_handler_label(f"conversation:{self.name}:{state}")
+        return await super().handle_update(update, application, check_result, context)
 
 
 async def on_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
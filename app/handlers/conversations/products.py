@@ -12,9 +12,12 @@ from telegram.ext import (
 from app.storage import db
 from app.bot_ui.keyboards import bottom_kb, cancel_keyboard
 from app.bot_ui.screens import send_category_reply, send_product_reply
-from app.handlers.conversations.common import on_cancel
-from app.utils.parsing import parse_qty, parse_limit
-from app.services.notifications import maybe_notify_limit_crossed
+from app.handlers.conversations.common import MeteredConversationHandler, on_cancel
+from app.handlers.routing import callback_pattern, router
+from app.utils.callback_codec import encode_callback
+from app.utils.parsing import parse_qty, parse_qty_change, parse_limit, parse_price
+from app.utils.text import format_money
+from app.services.notifications import maybe_notify_limit_crossed, notify_stock_change, notify_stock_limit_set
 
 PROD_ADD_NAME = 10
 PROD_ADD_QTY = 11
@@ -23,6 +26,8 @@ PROD_ADD_LIMIT = 12  # optional limit during product creation
 PROD_EDIT_NAME = 20
 PROD_EDIT_QTY = 30
 PROD_EDIT_LIMIT = 40
+PROD_EDIT_PRICE = 50
+PROD_EDIT_PACK = 60
 
 
 def add_limit_keyboard() -> InlineKeyboardMarkup:
@@ -32,8 +37,8 @@ def add_limit_keyboard() -> InlineKeyboardMarkup:
     - Cancel: use existing cancel handler
     """
     return InlineKeyboardMarkup([
-        [InlineKeyboardButton("⏭ Пропустити", callback_data="prod:add_limit_skip")],
-        [InlineKeyboardButton("❌ Скасувати", callback_data="prod:cancel")],
+        [InlineKeyboardButton("⏭ Пропустити", callback_data=encode_callback("prod:add_limit_skip"))],
+        [InlineKeyboardButton("❌ Скасувати", callback_data=encode_callback("prod:cancel"))],
     ])
 
 
@@ -44,7 +49,7 @@ async def prod_add_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
     q = update.callback_query
     await q.answer()
 
-    cat_id = int((q.data or "").split(":")[2])
+    cat_id = router.parse(q.data).entity_id
     cat = db.get_category(cat_id)
     if not cat:
         await q.message.reply_text("Категорію не знайдено (можливо видалена).")
@@ -200,7 +205,7 @@ async def prod_rename_from_button(update: Update, context: ContextTypes.DEFAULT_
     q = update.callback_query
     await q.answer()
 
-    prod_id = int((q.data or "").split(":")[2])
+    prod_id = router.parse(q.data).entity_id
     prod = db.get_product(prod_id)
     if not prod:
         await q.message.reply_text("Продукт не знайдено (можливо видалений).")
@@ -255,7 +260,7 @@ async def prod_qty_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
     q = update.callback_query
     await q.answer()
 
-    prod_id = int((q.data or "").split(":")[2])
+    prod_id = router.parse(q.data).entity_id
     prod = db.get_product(prod_id)
     if not prod:
         await q.message.reply_text("Продукт не знайдено (можливо видалений).")
@@ -264,10 +269,51 @@ async def prod_qty_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
     _, cat_id, name, qty, limit_qty, _ = prod
     context.user_data["active_cat_id"] = cat_id
     context.user_data["prod_qty_id"] = prod_id
+    context.user_data.pop("prod_qty_location_id", None)
 
     limit_text = "—" if limit_qty is None else str(limit_qty)
     await q.message.reply_text(
-        f"Продукт: {name}\nПоточна кількість: {qty}\nЛіміт: {limit_text}\n\nВведи НОВУ кількість:",
+        f"Продукт: {name}\nПоточна кількість: {qty}\nЛіміт: {limit_text}\n\n"
+        "Введи НОВУ кількість (10 або =10) або зміну: +5 додати, -2.5 списати:",
+        reply_markup=cancel_keyboard("prod"),
+    )
+    return PROD_EDIT_QTY
+
+
+def _load_stock_row(prod_id: int, location_id: int):
+    """
+    (product row, stock row at the location) for the per-location flows, or None.
+    """
+    loaded = db.load_product_screen(prod_id)
+    if not loaded:
+        return None
+    product, stock_rows = loaded
+    row = next((row for row in stock_rows if row[0] == location_id), None)
+    return None if row is None else (product, row)
+
+
+async def stock_qty_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Entry point for updating product quantity at one location.
+    """
+    q = update.callback_query
+    await q.answer()
+
+    prod_id, location_id = router.parse(q.data).args
+    loaded = _load_stock_row(prod_id, location_id)
+    if not loaded:
+        await q.message.reply_text("Продукт або локацію не знайдено (можливо видалені).")
+        return ConversationHandler.END
+
+    (_, cat_id, name, *_), (_, location, qty, limit_qty) = loaded
+    context.user_data["active_cat_id"] = cat_id
+    context.user_data["prod_qty_id"] = prod_id
+    context.user_data["prod_qty_location_id"] = location_id
+
+    limit_text = "—" if limit_qty is None else str(limit_qty)
+    await q.message.reply_text(
+        f"Продукт: {name}\nЛокація: {location}\nПоточна кількість: {qty or 0}\nЛіміт: {limit_text}\n\n"
+        "Введи НОВУ кількість (10 або =10) або зміну: +5 додати, -2.5 списати:",
         reply_markup=cancel_keyboard("prod"),
     )
     return PROD_EDIT_QTY
@@ -275,7 +321,8 @@ async def prod_qty_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def prod_qty_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Persist product quantity and trigger limit-cross notification logic.
+    Persist product quantity (at the chosen location, else at the main one)
+    and trigger limit-cross notification logic.
     """
     prod_id = context.user_data.get("prod_qty_id")
     cat_id = context.user_data.get("active_cat_id")
@@ -284,17 +331,45 @@ async def prod_qty_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     try:
-        new_qty = parse_qty(update.message.text)
+        op, value = parse_qty_change(update.message.text)
     except ValueError:
-        await update.message.reply_text("Кількість має бути числом => 0. Введи ще раз:")
+        await update.message.reply_text(
+            "Введи число => 0 (10 або =10) або зміну (+5, -2.5). Введи ще раз:"
+        )
         return PROD_EDIT_QTY
 
-    db.update_product_qty(int(prod_id), new_qty)
-    await maybe_notify_limit_crossed(context, int(prod_id))
+    chosen_location = context.user_data.get("prod_qty_location_id")
+    location_id = db.MAIN_LOCATION_ID if chosen_location is None else int(chosen_location)
+
+    # Relative changes are applied under the DB write lock: concurrent changes are never lost
+    if op == "+":
+        change = db.add_stock_qty(int(prod_id), location_id, value)
+    else:
+        change = db.set_stock_qty(int(prod_id), location_id, value)
+
+    loaded = _load_stock_row(int(prod_id), location_id)
+    if change is None:
+        if not loaded:
+            context.user_data.pop("prod_qty_id", None)
+            context.user_data.pop("prod_qty_location_id", None)
+            await update.message.reply_text("Продукт або локацію не знайдено (можливо видалені).")
+            return ConversationHandler.END
+        await update.message.reply_text(
+            f"Не можна списати {-value}: в наявності лише {loaded[1][2] or 0}. Введи ще раз:"
+        )
+        return PROD_EDIT_QTY
+
+    location_name = loaded[1][1] if loaded else db.MAIN_LOCATION_NAME
+    await notify_stock_change(context, int(prod_id), change, location_name)
 
     context.user_data.pop("prod_qty_id", None)
+    context.user_data.pop("prod_qty_location_id", None)
+    old_qty, new_qty, _, _, new_total, _ = change
+    text = f"✅ Кількість оновлено: {old_qty} → {new_qty}"
+    if chosen_location is not None:
+        text += f" ({location_name}, всього {new_total})"
     chat_id = update.effective_chat.id
-    await update.message.reply_text(f"✅ Кількість оновлено: {new_qty}", reply_markup=bottom_kb(chat_id))
+    await update.message.reply_text(text, reply_markup=bottom_kb(chat_id))
     await send_product_reply(update.message, context, int(prod_id))
     return ConversationHandler.END
 
@@ -306,7 +381,7 @@ async def prod_limit_from_button(update: Update, context: ContextTypes.DEFAULT_T
     q = update.callback_query
     await q.answer()
 
-    prod_id = int((q.data or "").split(":")[2])
+    prod_id = router.parse(q.data).entity_id
     prod = db.get_product(prod_id)
     if not prod:
         await q.message.reply_text("Продукт не знайдено (можливо видалений).")
@@ -315,6 +390,7 @@ async def prod_limit_from_button(update: Update, context: ContextTypes.DEFAULT_T
     _, cat_id, name, qty, limit_qty, _ = prod
     context.user_data["active_cat_id"] = cat_id
     context.user_data["prod_limit_id"] = prod_id
+    context.user_data.pop("prod_limit_location_id", None)
 
     limit_text = "—" if limit_qty is None else str(limit_qty)
     await q.message.reply_text(
@@ -326,9 +402,38 @@ async def prod_limit_from_button(update: Update, context: ContextTypes.DEFAULT_T
     return PROD_EDIT_LIMIT
 
 
+async def stock_limit_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Entry point for updating product limit at one location.
+    """
+    q = update.callback_query
+    await q.answer()
+
+    prod_id, location_id = router.parse(q.data).args
+    loaded = _load_stock_row(prod_id, location_id)
+    if not loaded:
+        await q.message.reply_text("Продукт або локацію не знайдено (можливо видалені).")
+        return ConversationHandler.END
+
+    (_, cat_id, name, *_), (_, location, qty, limit_qty) = loaded
+    context.user_data["active_cat_id"] = cat_id
+    context.user_data["prod_limit_id"] = prod_id
+    context.user_data["prod_limit_location_id"] = location_id
+
+    limit_text = "—" if limit_qty is None else str(limit_qty)
+    await q.message.reply_text(
+        f"Продукт: {name}\nЛокація: {location}\nКількість: {qty or 0}\nПоточний ліміт: {limit_text}\n\n"
+        "Введи НОВИЙ ліміт (число > 0).\n"
+        "Щоб прибрати ліміт — введи '-' або 0:",
+        reply_markup=cancel_keyboard("prod"),
+    )
+    return PROD_EDIT_LIMIT
+
+
 async def prod_limit_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Persist product limit and trigger limit-cross notification logic.
+    Persist product limit (of the total, or of the chosen location)
+    and trigger limit-cross notification logic.
     """
     prod_id = context.user_data.get("prod_limit_id")
     cat_id = context.user_data.get("active_cat_id")
@@ -346,8 +451,21 @@ async def prod_limit_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=add_limit_keyboard(),
         )
         return PROD_EDIT_LIMIT
-    db.update_product_limit(int(prod_id), new_limit)
-    await maybe_notify_limit_crossed(context, int(prod_id))
+
+    location_id = context.user_data.pop("prod_limit_location_id", None)
+    if location_id is None:
+        change = db.update_product_limit(int(prod_id), new_limit)
+        if change is not None:
+            await maybe_notify_limit_crossed(context, int(prod_id), change)
+    else:
+        loaded = _load_stock_row(int(prod_id), int(location_id))
+        result = db.set_stock_limit(int(prod_id), int(location_id), new_limit)
+        if result is None or not loaded:
+            context.user_data.pop("prod_limit_id", None)
+            await update.message.reply_text("Продукт або локацію не знайдено (можливо видалені).")
+            return ConversationHandler.END
+        qty, old_limit, _ = result
+        await notify_stock_limit_set(context, int(prod_id), qty, old_limit, new_limit, loaded[1][1])
 
     context.user_data.pop("prod_limit_id", None)
     chat_id = update.effective_chat.id
@@ -358,41 +476,185 @@ async def prod_limit_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
+async def prod_price_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Entry point for setting the unit price of a product.
+    """
+    q = update.callback_query
+    await q.answer()
+
+    prod_id = router.parse(q.data).entity_id
+    loaded = db.load_product_screen(prod_id)
+    if not loaded:
+        await q.message.reply_text("Продукт не знайдено (можливо видалений).")
+        return ConversationHandler.END
+
+    (_, cat_id, name, qty, _, _, unit_price, _), _ = loaded
+    context.user_data["active_cat_id"] = cat_id
+    context.user_data["prod_price_id"] = prod_id
+
+    price_text = "—" if unit_price is None else format_money(unit_price)
+    await q.message.reply_text(
+        f"Продукт: {name}\nКількість: {qty}\nПоточна ціна: {price_text}\n\n"
+        "Введи ціну за одиницю (число >= 0).\n"
+        "Щоб прибрати ціну — введи '-':",
+        reply_markup=cancel_keyboard("prod"),
+    )
+    return PROD_EDIT_PRICE
+
+
+async def prod_price_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Persist the unit price of a product.
+    """
+    prod_id = context.user_data.get("prod_price_id")
+    if not prod_id:
+        await update.message.reply_text("Помилка стану. Відкрий продукт і спробуй ще раз.")
+        return ConversationHandler.END
+
+    try:
+        unit_price = parse_price(update.message.text)
+    except ValueError:
+        await update.message.reply_text(
+            "Ціна має бути числом >= 0 (наприклад 12.50).\n"
+            "Щоб прибрати ціну — введи '-'.",
+            reply_markup=cancel_keyboard("prod"),
+        )
+        return PROD_EDIT_PRICE
+
+    db.update_product_price(int(prod_id), unit_price)
+    context.user_data.pop("prod_price_id", None)
+    chat_id = update.effective_chat.id
+
+    msg = "✅ Ціну прибрано." if unit_price is None else f"✅ Ціну встановлено: {format_money(unit_price)}"
+    await update.message.reply_text(msg, reply_markup=bottom_kb(chat_id))
+    await send_product_reply(update.message, context, int(prod_id))
+    return ConversationHandler.END
+
+
+async def prod_pack_from_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Entry point for setting the pack size (order suggestions are rounded up to whole packs).
+    """
+    q = update.callback_query
+    await q.answer()
+
+    prod_id = router.parse(q.data).entity_id
+    loaded = db.load_product_screen(prod_id)
+    if not loaded:
+        await q.message.reply_text("Продукт не знайдено (можливо видалений).")
+        return ConversationHandler.END
+
+    (_, cat_id, name, _, _, _, _, pack_size), _ = loaded
+    context.user_data["active_cat_id"] = cat_id
+    context.user_data["prod_pack_id"] = prod_id
+
+    pack_text = "—" if pack_size is None else str(pack_size)
+    await q.message.reply_text(
+        f"Продукт: {name}\nПоточна упаковка: {pack_text}\n\n"
+        "Введи кількість в упаковці (число > 0): рекомендоване замовлення округлюється до цілих упаковок.\n"
+        "Щоб прибрати — введи '-' або 0:",
+        reply_markup=cancel_keyboard("prod"),
+    )
+    return PROD_EDIT_PACK
+
+
+async def prod_pack_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Persist the pack size of a product.
+    """
+    prod_id = context.user_data.get("prod_pack_id")
+    if not prod_id:
+        await update.message.reply_text("Помилка стану. Відкрий продукт і спробуй ще раз.")
+        return ConversationHandler.END
+
+    try:
+        pack_size = parse_limit(update.message.text)
+    except ValueError:
+        await update.message.reply_text(
+            "Упаковка має бути числом > 0.\n"
+            "Щоб прибрати — введи '-' або 0.",
+            reply_markup=cancel_keyboard("prod"),
+        )
+        return PROD_EDIT_PACK
+
+    db.update_product_pack(int(prod_id), pack_size)
+    context.user_data.pop("prod_pack_id", None)
+    chat_id = update.effective_chat.id
+
+    msg = "✅ Упаковку прибрано." if pack_size is None else f"✅ Упаковка: {pack_size}"
+    await update.message.reply_text(msg, reply_markup=bottom_kb(chat_id))
+    await send_product_reply(update.message, context, int(prod_id))
+    return ConversationHandler.END
+
+
 def register_product_conversations(app: Application) -> None:
     """
     Register ConversationHandlers for product flows.
     """
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(prod_add_from_button, pattern=r"^prod:add:\d+$")],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("prod:add", prod_add_from_button, with_id=True)],
         states={
             PROD_ADD_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_add_name)],
             PROD_ADD_QTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_add_qty)],
             PROD_ADD_LIMIT: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, prod_add_limit_value),
-                CallbackQueryHandler(prod_add_limit_skip, pattern=r"^prod:add_limit_skip$"),
+                CallbackQueryHandler(prod_add_limit_skip, pattern=callback_pattern("prod:add_limit_skip")),
             ],
         },
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(cat:cancel|prod:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
         allow_reentry=True,
+        name="prod_add",
+        persistent=True,
     ))
 
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(prod_rename_from_button, pattern=r"^prod:edit:\d+$")],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("prod:edit", prod_rename_from_button, with_id=True)],
         states={PROD_EDIT_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_edit_name)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(cat:cancel|prod:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
         allow_reentry=True,
+        name="prod_rename",
+        persistent=True,
     ))
 
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(prod_qty_from_button, pattern=r"^prod:qty:\d+$")],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[
+            router.entry_point("prod:qty", prod_qty_from_button, with_id=True),
+            router.entry_point("stock:qty", stock_qty_from_button, with_id=True),
+        ],
         states={PROD_EDIT_QTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_qty_value)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(cat:cancel|prod:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
         allow_reentry=True,
+        name="prod_qty",
+        persistent=True,
     ))
 
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(prod_limit_from_button, pattern=r"^prod:limit:\d+$")],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[
+            router.entry_point("prod:limit", prod_limit_from_button, with_id=True),
+            router.entry_point("stock:limit", stock_limit_from_button, with_id=True),
+        ],
         states={PROD_EDIT_LIMIT: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_limit_value)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(cat:cancel|prod:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
+        allow_reentry=True,
+        name="prod_limit",
+        persistent=True,
+    ))
+
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("prod:price", prod_price_from_button, with_id=True)],
+        states={PROD_EDIT_PRICE: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_price_value)]},
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
+        allow_reentry=True,
+        name="prod_price",
+        persistent=True,
+    ))
+
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("prod:pack", prod_pack_from_button, with_id=True)],
+        states={PROD_EDIT_PACK: [MessageHandler(filters.TEXT & ~filters.COMMAND, prod_pack_value)]},
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("cat:cancel", "prod:cancel"))],
         allow_reentry=True,
+        name="prod_pack",
+        persistent=True,
     ))
@@ -11,7 +11,8 @@ from telegram.ext import (
 from app.storage import db
 from app.bot_ui.keyboards import bottom_kb, cancel_keyboard
 from app.bot_ui.screens import send_tasks_reply, send_task_reply
-from app.handlers.conversations.common import on_cancel
+from app.handlers.conversations.common import MeteredConversationHandler, on_cancel
+from app.handlers.routing import callback_pattern, router
 
 TASK_ADD_TEXT = 50
 TASK_EDIT_TEXT = 51
@@ -21,13 +22,13 @@ async def task_add_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
     q = update.callback_query
     await q.answer()
 
-    tc_id = int(q.data.split(":")[2])
+    tc_id = router.parse(q.data).entity_id
 
     context.user_data["active_tc_id"] = tc_id
     context.user_data.pop("active_task_id", None)
 
     await q.message.reply_text(
-        "Введи текст завдання:",
+        "Введи текст завдання.\nКілька завдань — кожне з нового рядка:",
         reply_markup=cancel_keyboard("task_proc")
     )
     return TASK_ADD_TEXT
@@ -35,10 +36,10 @@ async def task_add_from_button(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def task_add_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Persist new task into DB.
+    Persist new tasks into DB: every non-empty line of the message is a task.
     """
-    text = (update.message.text or "").strip()
-    if not text:
+    lines = [line.strip() for line in (update.message.text or "").splitlines() if line.strip()]
+    if not lines:
         await update.message.reply_text("Текст завдання обов'язковий для введення. Введи ще раз:")
         return TASK_ADD_TEXT
 
@@ -50,11 +51,13 @@ async def task_add_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     chat_id = update.effective_chat.id
-    db.add_task(chat_id, text, tc_id)
+    added = db.add_tasks(chat_id, lines, tc_id)
 
     context.user_data.pop("active_tc_id", None)
 
-    await update.message.reply_text(f"✅ Завдання додано", reply_markup=bottom_kb(chat_id))
+    text = "✅ Завдання додано" if added == 1 else f"✅ Додано завдань: {added}"
+    await update.message.reply_text(text, reply_markup=bottom_kb(chat_id))
+    # One re-render of the list for the whole batch
     await send_tasks_reply(update.message, context, tc_id)
     return ConversationHandler.END
 
@@ -66,7 +69,7 @@ async def task_edit_from_button(update: Update, context: ContextTypes.DEFAULT_TY
     q = update.callback_query
     await q.answer()
 
-    task_id = int((q.data or "").split(":")[2])
+    task_id = router.parse(q.data).entity_id
     task = db.get_task(task_id)
     if not task:
         await q.message.reply_text("Завдання не знайдено.")
@@ -106,16 +109,20 @@ def register_task_conversations(app: Application) -> None:
     """
     Register ConversationHandlers for category flows.
     """
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(task_add_from_button, pattern=r"^task_proc:add:\d+$"),],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("task_proc:add", task_add_from_button, with_id=True),],
         states={TASK_ADD_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, task_add_text)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^(task_proc:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("task_proc:cancel"))],
         allow_reentry=True,
+        name="task_add",
+        persistent=True,
     ))
 
-    app.add_handler(ConversationHandler(
-        entry_points=[CallbackQueryHandler(task_edit_from_button, pattern=r"^task:edit:\d+$")],
+    app.add_handler(MeteredConversationHandler(
+        entry_points=[router.entry_point("task:edit", task_edit_from_button, with_id=True)],
         states={TASK_EDIT_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, task_edit_text)]},
-        fallbacks=[CallbackQueryHandler(on_cancel, pattern=r"^^(task_proc:cancel)$")],
+        fallbacks=[CallbackQueryHandler(on_cancel, pattern=callback_pattern("task_proc:cancel"))],
         allow_reentry=True,
+        name="task_edit",
+        persistent=True,
     ))
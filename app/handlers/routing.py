@@ -0,0 +1,197 @@
+from typing import Awaitable, Callable, Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from telegram import CallbackQuery, Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+from app.services.metrics import register_cache
+from app.utils.callback_codec import PREFIX, decode_callback, encode_callback
+
+RouteKey = Tuple[str, str]
+RouteHandler = Callable[[CallbackQuery, ContextTypes.DEFAULT_TYPE, "Callback"], Awaitable[None]]
+
+
+# ---------- Parsing ----------
+
+class Callback(NamedTuple):
+    scope: str            # nav | cat | prod | task_proc | task | reorder
+    action: str           # open | del | del_yes | actions | cats | ...
+    args: Tuple[int, ...] = ()    # all integer fields of the route
+
+    @property
+    def entity_id(self) -> Optional[int]:
+        return self.args[0] if self.args else None
+
+
+def parse_callback(data: str) -> Optional[Callback]:
+    """
+    Parse callback_data.
+
+    New buttons carry compact encoded data (see app.utils.callback_codec).
+    Buttons sent before that use the legacy text format:
+    - nav:cats
+    - cat:open:<id>
+    - cat:del:<id>
+    - cat:del_yes:<id>
+    - cat:actions:<id>
+    - prod:open:<id>
+    - prod:del:<id>
+    - prod:del_yes:<id>
+    """
+    data = data or ""
+    if data.startswith(PREFIX):
+        decoded = decode_callback(data)
+        return None if decoded is None else Callback(*decoded)
+
+    parts = data.split(":")
+    if len(parts) == 2:
+        return Callback(parts[0], parts[1])
+
+    if len(parts) == 3:
+        scope, action, raw_id = parts
+        if raw_id.isdigit():
+            return Callback(scope, action, (int(raw_id),))
+
+    return None
+
+
+def _route_key(route: str) -> RouteKey:
+    scope, action = route.split(":")
+    return scope, action
+
+
+# ---------- Registry ----------
+
+# (handler, with_id); the handler is None for conversation entry points
+RouteEntry = Tuple[Optional[RouteHandler], bool]
+
+
+class CallbackRouter:
+    """
+    Registry: (scope, action) -> handler.
+
+    Every callback update is parsed once and resolved with a single dict lookup.
+    Conversation entry points are registered here as well, so the routing table is
+    the single place that knows every button.
+
+    PTB still asks each ConversationHandler whether it takes the update, so entry point
+    patterns run once per conversation. They share match(): the last data's parse and
+    lookup is kept, and each pattern is an identity check against its own entry.
+    """
+
+    def __init__(self):
+        self._routes: Dict[RouteKey, RouteEntry] = {}
+        self._last_data: Optional[str] = None
+        self._last_match: Optional[Tuple[Callback, Optional[RouteEntry]]] = None
+
+    def _register(self, route: str, handler: Optional[RouteHandler], with_id: bool) -> RouteEntry:
+        key = _route_key(route)
+        if key in self._routes:
+            raise ValueError(f"Route already registered: {route}")
+        entry = self._routes[key] = (handler, with_id)
+        self._last_data = self._last_match = None
+        return entry
+
+    def route(self, route: str, with_id: bool = True):
+        """
+        Decorator: register `handler(q, context, cb)` for "scope:action" callbacks.
+        With `with_id=True` the callback must carry an entity id.
+        """
+
+        def decorator(handler: RouteHandler) -> RouteHandler:
+            self._register(route, handler, with_id)
+            return handler
+
+        return decorator
+
+    def match(self, data: str) -> Optional[Tuple[Callback, Optional[RouteEntry]]]:
+        """
+        (parsed callback, its registry entry or None) or None for unparsable data.
+        One parse + one dict lookup; repeated calls for the same data (every handler
+        looking at one update) return the kept result.
+        """
+        if data == self._last_data:
+            return self._last_match
+
+        cb = parse_callback(data)
+        if cb is None:
+            match = None
+        else:
+            entry = self._routes.get((cb.scope, cb.action))
+            if entry is not None and entry[1] and cb.entity_id is None:
+                entry = None
+            match = cb, entry
+
+        self._last_data, self._last_match = data, match
+        return match
+
+    def parse(self, data: str) -> Optional[Callback]:
+        """
+        parse_callback() sharing the result of match() for the current update.
+        """
+        match = self.match(data)
+        return None if match is None else match[0]
+
+    def resolve(self, data: str) -> Optional[Tuple[Callback, RouteHandler]]:
+        match = self.match(data)
+        if match is None or match[1] is None or match[1][0] is None:
+            return None
+        return match[0], match[1][0]
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Generic CallbackQueryHandler callback: answer the query and run the routed handler.
+        """
+        q = update.callback_query
+        await q.answer()
+
+        resolved = self.resolve(q.data or "")
+        if resolved is None:
+            return
+
+        cb, handler = resolved
+        await handler(q, context, cb)
+
+    def entry_point(self, route: str, callback, with_id: bool = False) -> CallbackQueryHandler:
+        """
+        Build a CallbackQueryHandler for a ConversationHandler entry point
+        and record the route in the registry.
+        """
+        entry = self._register(route, None, with_id)
+
+        def pattern(data: object) -> bool:
+            match = self.match(data) if isinstance(data, str) else None
+            return match is not None and match[1] is entry
+
+        return CallbackQueryHandler(callback, pattern=pattern)
+
+    def routes(self) -> Dict[RouteKey, str]:
+        """
+        Whole routing table: route -> "router" | "conversation".
+        """
+        return {key: "conversation" if handler is None else "router" for key, (handler, _) in self._routes.items()}
+
+
+def callback_pattern(*routes: str, with_id: bool = False) -> Callable[[object], bool]:
+    """
+    Precompiled `pattern` for CallbackQueryHandler: matches callback data whose
+    (scope, action) is one of `routes`. Replaces regexes like r"^prod:add:\\d+$".
+    Used for conversation states and fallbacks; shares the update's parse with the router.
+    """
+    keys: FrozenSet[RouteKey] = frozenset(_route_key(route) for route in routes)
+
+    def match(data: object) -> bool:
+        if not isinstance(data, str):
+            return False
+        cb = router.parse(data)
+        return (
+            cb is not None
+            and (cb.scope, cb.action) in keys
+            and (cb.entity_id is not None) == with_id
+        )
+
+    return match
+
+
+router = CallbackRouter()
+
+register_cache("encode_callback", lambda: encode_callback.cache_info()[:2])
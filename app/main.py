@@ -1,6 +1,22 @@
 from telegram.ext import Application
 
-from app.config import get_bot_token
+from app.bot_ui.screens import build_live_screen
+from app.config import (
+    BOT_API_BASE_URL,
+    BOT_MODE,
+    MAX_CONCURRENT_UPDATES,
+    METRICS_HOST,
+    METRICS_PORT,
+    PERSISTENCE_UPDATE_INTERVAL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_URL,
+    WORKER_INDEX,
+    WORKERS,
+    get_bot_token,
+    get_webhook_secret,
+)
 from app.handlers.conversations.tasks import register_task_conversations
 from app.storage import db
 from app.handlers.commands import register_command_handlers
@@ -8,16 +24,54 @@ from app.handlers.bottom_menu import register_bottom_menu_handlers
 from app.handlers.callbacks import register_callback_handlers
 from app.handlers.conversations.categories import register_category_conversations
 from app.handlers.conversations.products import register_product_conversations
+from app.services.live_screens import live_screens
+from app.services.metrics import MetricsRequest, start_metrics_server
+from app.services.recurring import recurring_tasks
+from app.services.stock_history import start_pruning
+from app.services.update_processor import ChatOrderedUpdateProcessor
+from app.storage.persistence import SQLitePersistence
+from app.webhook import run_webhook
+from app.workers import run_workers
 
 
-def main() -> None:
+async def post_init(app: Application) -> None:
     """
-    App entrypoint: initialize DB, build Telegram application, register handlers, run polling.
+    Runs once the bot is initialized: enable live updates of shared screens, metrics,
+    recurring tasks and stock history retention.
     """
-    db.init_db()
+    live_screens.bind(app.bot, build_live_screen)
+
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT + WORKER_INDEX, METRICS_HOST)
+    # One scheduler for all worker processes; a duplicate run would create nothing anyway
+    if WORKER_INDEX == 0:
+        recurring_tasks.start(app)
+        start_pruning(app)
+
+
+async def post_stop(app: Application) -> None:
+    """
+    Runs after the last update was handled: stop pushing live screens.
+    """
+    await live_screens.stop()
 
-    token = get_bot_token()
-    app = Application.builder().token(token).build()
+
+def build_application(token: str) -> Application:
+    """
+    Build the Telegram application and register all handlers.
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(MetricsRequest())
+        .persistence(SQLitePersistence(update_interval=PERSISTENCE_UPDATE_INTERVAL))
+        .concurrent_updates(ChatOrderedUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_stop(post_stop)
+    )
+    if BOT_API_BASE_URL:
+        builder = builder.base_url(BOT_API_BASE_URL)
+    app = builder.build()
 
     register_command_handlers(app)
     register_bottom_menu_handlers(app)
@@ -25,8 +79,29 @@ def main() -> None:
     register_product_conversations(app)
     register_task_conversations(app)
     register_callback_handlers(app)
+    return app
+
+
+def main() -> None:
+    """
+    App entrypoint: initialize DB, build Telegram application, register handlers,
+    run polling or the webhook server (BOT_MODE), in this process or in WORKERS processes.
+    """
+    db.init_db()
+    token = get_bot_token()
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is required when BOT_MODE=webhook")
+    secret = get_webhook_secret() if BOT_MODE == "webhook" else ""
+
+    if WORKERS > 1:
+        run_workers(token, WORKERS, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, secret, WEBHOOK_LISTEN, WEBHOOK_PORT)
+        return
 
-    app.run_polling()
+    app = build_application(token)
+    if BOT_MODE == "webhook":
+        run_webhook(app, WEBHOOK_URL, WEBHOOK_PATH, secret, WEBHOOK_LISTEN, WEBHOOK_PORT)
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import IO, Iterator, Tuple
+
+from app.services.reorder import reorder_suggestions
+from app.storage import db
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # optional dependency, only needed for .xlsx export
+    Workbook = None
+
+# Files up to this size stay in memory, bigger ones spill to a temp file
+SPOOL_MAX_BYTES = 1024 * 1024
+
+REORDER_HEADER = ("Категорія", "Продукт", "Локація", "Кількість", "Ліміт", "Замовити")
+
+
+def xlsx_available() -> bool:
+    return Workbook is not None
+
+
+def iter_reorder_export_rows() -> Iterator[Tuple]:
+    """
+    Reorder list as flat rows for a table export (streamed from DB).
+    The location is empty for rows about the product total; only those have a suggested order.
+    """
+    suggestions = reorder_suggestions.get()
+    for _, cat_name, prod_id, prod_name, qty, limit_qty, location in db.iter_reorder_items():
+        order = suggestions.get(prod_id, "") if location is None else ""
+        yield cat_name, prod_name, location or "", qty, limit_qty, order
+
+
+def write_reorder_csv(fh: IO[bytes]) -> None:
+    # utf-8-sig so that Excel opens Cyrillic text correctly
+    text = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow(REORDER_HEADER)
+    writer.writerows(iter_reorder_export_rows())
+    text.flush()
+    text.detach()
+
+
+def write_reorder_xlsx(fh: IO[bytes]) -> None:
+    if Workbook is None:
+        raise RuntimeError("openpyxl is not installed")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Дозамовлення")
+    ws.append(REORDER_HEADER)
+    for row in iter_reorder_export_rows():
+        ws.append(row)
+    wb.save(fh)
+
+
+def build_reorder_document(fmt: str) -> Tuple[str, IO[bytes]]:
+    """
+    Build reorder list document.
+
+    Args:
+        fmt: "csv" or "xlsx".
+
+    Returns:
+        (filename, file object positioned at the beginning).
+    """
+    writers = {"csv": write_reorder_csv, "xlsx": write_reorder_xlsx}
+    if fmt not in writers:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    writers[fmt](fh)
+    fh.seek(0)
+
+    filename = f"reorder_{datetime.now():%Y-%m-%d_%H-%M}.{fmt}"
+    return filename, fh
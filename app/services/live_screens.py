@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from app.bot_ui.fingerprints import message_fingerprints, render_fingerprint
+from app.storage import versions
+
+MAX_MESSAGES = 2000         # how many open screens are tracked at most
+TTL_SECONDS = 60 * 60       # screens older than this are no longer refreshed
+PUSH_INTERVAL = 2.0         # at most one edit per message per interval
+DEBOUNCE_SECONDS = 0.5      # wait a bit so a burst of writes becomes one flush
+
+logger = logging.getLogger(__name__)
+
+ScreenKey = Tuple[str, Optional[int]]
+MessageKey = Tuple[int, int]
+
+
+class LiveScreens:
+    """
+    Registry of inline messages that currently show a shared screen.
+
+    When storage bumps the version of a tracked screen (see app.storage.versions),
+    the screen is marked dirty and all messages showing it are re-rendered in a
+    batched, debounced flush. Flushes happen at most once per PUSH_INTERVAL, so a
+    burst of changes results in at most one edit per message per interval.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = MAX_MESSAGES,
+        ttl: float = TTL_SECONDS,
+        interval: float = PUSH_INTERVAL,
+        debounce: float = DEBOUNCE_SECONDS,
+    ):
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.interval = interval
+        self.debounce = debounce
+
+        self._messages: "OrderedDict[MessageKey, Tuple[ScreenKey, float]]" = OrderedDict()
+        self._by_screen: Dict[ScreenKey, Set[MessageKey]] = {}
+        self._dirty: Set[ScreenKey] = set()
+
+        self._bot = None
+        self._render: Optional[Callable[[str, Optional[int]], Optional[tuple]]] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_flush = 0.0
+        self.pushed = 0
+
+    def bind(self, bot, render: Callable[[str, Optional[int]], Optional[tuple]]) -> None:
+        """
+        Enable pushing: `render(screen, entity_id)` must return (text, markup) or None.
+        """
+        self._bot = bot
+        self._render = render
+
+    async def stop(self) -> None:
+        """
+        Disable pushing before the bot shuts down; a flush already running is finished.
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        self._bot = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    # ---------- Registry ----------
+
+    def track(self, screen: ScreenKey, message_key: MessageKey) -> None:
+        """
+        Remember that `message_key` now shows `screen`.
+        """
+        self.untrack(message_key)
+        now = time.monotonic()
+        self._messages[message_key] = (screen, now)
+        self._by_screen.setdefault(screen, set()).add(message_key)
+        self._expire(now)
+
+    def untrack(self, message_key: MessageKey) -> None:
+        entry = self._messages.pop(message_key, None)
+        if entry is None:
+            return
+        screen = entry[0]
+        keys = self._by_screen.get(screen)
+        if keys is not None:
+            keys.discard(message_key)
+            if not keys:
+                del self._by_screen[screen]
+
+    def _expire(self, now: float) -> None:
+        while self._messages:
+            message_key, (_, tracked_at) = next(iter(self._messages.items()))
+            if len(self._messages) <= self.max_messages and now - tracked_at < self.ttl:
+                break
+            self.untrack(message_key)
+
+    # ---------- Invalidation ----------
+
+    def on_version_bump(self, scope: str, entity_id: Optional[int]) -> None:
+        screen = (scope, entity_id)
+        if screen not in self._by_screen:
+            return
+        self._dirty.add(screen)
+        self._schedule()
+
+    def _schedule(self, delay: float | None = None) -> None:
+        if self._bot is None or self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if delay is None:
+            delay = max(self.debounce, self._last_flush + self.interval - time.monotonic())
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        """
+        Re-render every dirty screen once and push it to all messages showing it.
+        """
+        self._last_flush = time.monotonic()
+        self._expire(self._last_flush)
+
+        dirty, self._dirty = self._dirty, set()
+        for screen in dirty:
+            message_keys = list(self._by_screen.get(screen, ()))
+            if not message_keys:
+                continue
+
+            rendered = self._render(*screen)
+            if rendered is None:
+                # Entity is gone: stop refreshing its messages
+                for message_key in message_keys:
+                    self.untrack(message_key)
+                continue
+
+            text, markup = rendered
+            fingerprint = render_fingerprint(text, markup)
+            for message_key in message_keys:
+                if message_fingerprints.is_unchanged(message_key, fingerprint):
+                    continue
+                try:
+                    await self._bot.edit_message_text(
+                        text,
+                        chat_id=message_key[0],
+                        message_id=message_key[1],
+                        reply_markup=markup,
+                    )
+                except RetryAfter as e:
+                    retry_after = e.retry_after
+                    if hasattr(retry_after, "total_seconds"):
+                        retry_after = retry_after.total_seconds()
+                    # Put the whole batch back; already pushed messages are skipped by fingerprint
+                    self._dirty |= dirty
+                    self._schedule(delay=float(retry_after))
+                    return
+                except BadRequest as e:
+                    if "Message is not modified" not in str(e):
+                        self.untrack(message_key)
+                        message_fingerprints.forget(message_key)
+                        continue
+                except Forbidden:
+                    self.untrack(message_key)
+                    continue
+                except TelegramError as e:
+                    # Network error / timeout: retry the screen on the next flush, go on with the others
+                    logger.warning("Could not refresh live message %s: %s", message_key, e)
+                    self._dirty.add(screen)
+                    continue
+
+                message_fingerprints.remember(message_key, fingerprint)
+                self.pushed += 1
+
+        if self._dirty:
+            self._schedule()
+
+
+live_screens = LiveScreens()
+versions.subscribe(live_screens.on_version_bump)
@@ -0,0 +1,298 @@
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# Seconds: from sub-millisecond SQL up to slow Bot API calls / fan-outs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Recipients of one notification fan-out
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        # list(): the scrape runs in another thread while the bot keeps counting
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels (Prometheus semantics).
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (non-cumulative, last one = +Inf), sum]
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def time(self, *labels: str) -> "_Timer":
+        """
+        Context manager: observe the duration of the block.
+        """
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterator[str]:
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), list(counts)):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class CallbackMetric:
+    """
+    Values read at scrape time from existing stats (cache hit counters etc.).
+    `collect()` returns {label values: value}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        kind: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[LabelValues, float]],
+    ):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._collect().items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(
+        self, name: str, help_text: str, kind: str, labelnames: Sequence[str],
+        collect: Callable[[], Dict[LabelValues, float]],
+    ) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, kind, labelnames, collect))
+
+    def render(self) -> str:
+        """
+        All metrics in Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception:  # a broken collector must not break the whole scrape
+                logger.exception("Failed to collect metric %s", metric.name)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+handler_seconds = registry.histogram(
+    "bot_handler_seconds",
+    "Time to handle one update, by handler (callback scope:action, conversation:state, command, message)",
+    ("handler",),
+)
+db_query_seconds = registry.histogram(
+    "bot_db_query_seconds", "Duration of app.storage.db functions", ("query",),
+)
+db_query_errors = registry.counter(
+    "bot_db_query_errors_total", "Exceptions raised by app.storage.db functions", ("query", "error"),
+)
+bot_api_seconds = registry.histogram(
+    "bot_api_request_seconds", "Bot API request latency by method", ("method",),
+)
+bot_api_errors = registry.counter(
+    "bot_api_errors_total", "Failed Bot API requests by method and HTTP status / exception", ("method", "error"),
+)
+fanout_recipients = registry.histogram(
+    "bot_notification_fanout_recipients", "Subscribers per limit notification", (), FANOUT_BUCKETS,
+)
+fanout_seconds = registry.histogram(
+    "bot_notification_fanout_seconds", "Time to deliver one limit notification to all subscribers",
+)
+
+
+# ---------- Caches ----------
+
+_caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], Tuple[int, int]]) -> None:
+    """
+    Expose a cache's (hits, misses) counters as bot_cache_* metrics.
+    """
+    _caches[name] = stats
+
+
+def _cache_values(index: int) -> Dict[LabelValues, float]:
+    return {(name,): stats()[index] for name, stats in list(_caches.items())}
+
+
+def _cache_hit_ratio() -> Dict[LabelValues, float]:
+    ratios = {}
+    for name, stats in list(_caches.items()):
+        hits, misses = stats()
+        ratios[(name,)] = hits / (hits + misses) if hits + misses else 0.0
+    return ratios
+
+
+registry.callback("bot_cache_hits_total", "Cache hits", "counter", ("cache",), lambda: _cache_values(0))
+registry.callback("bot_cache_misses_total", "Cache misses", "counter", ("cache",), lambda: _cache_values(1))
+registry.callback("bot_cache_hit_ratio", "Cache hits / lookups since start", "gauge", ("cache",), _cache_hit_ratio)
+
+
+class MetricsRequest(HTTPXRequest):
+    """
+    PTB request backend that records latency and failures of every Bot API call.
+    """
+
+    async def do_request(self, *args, **kwargs) -> Tuple[int, bytes]:
+        url = kwargs["url"] if "url" in kwargs else args[0]
+        method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(*args, **kwargs)
+        except Exception as e:
+            bot_api_errors.inc(method, type(e).__name__)
+            raise
+        finally:
+            bot_api_seconds.observe(time.perf_counter() - start, method)
+        if code >= 400:
+            bot_api_errors.inc(method, str(code))
+        return code, payload
+
+
+# ---------- HTTP endpoint ----------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve GET /metrics from a daemon thread (the bot's event loop is not involved).
+    """
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Metrics on http://%s:%s/metrics", host, port)
+    return _server
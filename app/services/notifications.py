@@ -1,54 +1,117 @@
 from telegram.error import BadRequest, Forbidden
 from telegram.ext import ContextTypes
 
+from app.services import metrics
 from app.storage import db
 
 
-async def maybe_notify_limit_crossed(context: ContextTypes.DEFAULT_TYPE, product_id: int) -> None:
+async def maybe_notify_limit_crossed(
+    context: ContextTypes.DEFAULT_TYPE,
+    product_id: int,
+    change: db.LimitChange,
+) -> None:
     """
-    Notify all subscribers when product quantity crosses the limit threshold
-    from above to below-or-equal.
+    Notify subscribers if a new limit of the product total (db.update_product_limit)
+    puts it at or below the limit while it was not before.
+    """
+    qty, limit_qty, was_below, is_below = change
+    if was_below or not is_below:
+        return
+
+    prod = db.get_product_with_category(product_id)
+    if not prod:
+        return
+    _, _, cat_name, name, _, _, _ = prod
+    await _notify_subscribers(context, _reorder_text(cat_name, name, qty, limit_qty))
+
 
-    Uses DB flag `below_limit` to avoid repeated notifications while the item remains below the limit.
+async def notify_qty_change(
+    context: ContextTypes.DEFAULT_TYPE,
+    product_id: int,
+    old_qty: float,
+    new_qty: float,
+    limit_qty: float | None,
+) -> None:
     """
-    prod = db.get_product(product_id)
+    Notify subscribers if a change of the product total (the last three values of
+    db.StockChange) crossed the limit from above to below-or-equal.
+
+    Uses the old/new values returned by the atomic UPDATE (which also maintains `below_limit`):
+    of several concurrent deductions exactly one crosses the limit, so exactly one notifies.
+    """
+    if limit_qty is None or not (old_qty > limit_qty >= new_qty):
+        return
+
+    prod = db.get_product_with_category(product_id)
     if not prod:
         return
+    _, _, cat_name, name, _, _, _ = prod
+    await _notify_subscribers(context, _reorder_text(cat_name, name, new_qty, limit_qty))
+
+
+async def notify_stock_change(
+    context: ContextTypes.DEFAULT_TYPE,
+    product_id: int,
+    change: db.StockChange,
+    location_name: str,
+) -> None:
+    """
+    Notify subscribers about a stock change (db.set_stock_qty / db.add_stock_qty) that crossed
+    the limit of the location and/or the limit of the product total. Same crossing rule
+    as notify_qty_change, one message per crossed limit.
+    """
+    old_qty, new_qty, limit_qty, old_total, new_total, total_limit = change
+    location_crossed = limit_qty is not None and old_qty > limit_qty >= new_qty
+    if location_crossed:
+        prod = db.get_product_with_category(product_id)
+        if prod:
+            _, _, cat_name, name, _, _, _ = prod
+            await _notify_subscribers(context, _reorder_text(cat_name, name, new_qty, limit_qty, location_name))
+    await notify_qty_change(context, product_id, old_total, new_total, total_limit)
 
-    _, cat_id, name, qty, limit_qty, below_limit = prod
 
-    # No limit => ensure flag is reset
-    if limit_qty is None:
-        if below_limit:
-            db.set_below_limit(product_id, 0)
+async def notify_stock_limit_set(
+    context: ContextTypes.DEFAULT_TYPE,
+    product_id: int,
+    qty: float,
+    old_limit: float | None,
+    new_limit: float | None,
+    location_name: str,
+) -> None:
+    """
+    Notify subscribers if a new location limit puts the stock there at or below it
+    (and the old limit did not).
+    """
+    if new_limit is None or qty > new_limit or (old_limit is not None and qty <= old_limit):
         return
 
-    is_now_below = qty <= limit_qty
+    prod = db.get_product_with_category(product_id)
+    if not prod:
+        return
+    _, _, cat_name, name, _, _, _ = prod
+    await _notify_subscribers(context, _reorder_text(cat_name, name, qty, new_limit, location_name))
+
 
-    # Crossed to "below" for the first time -> notify
-    if is_now_below and not below_limit:
-        cat = db.get_category(cat_id)
-        cat_name = cat[1] if cat else "Невідома категорія"
+def _reorder_text(cat_name: str, name: str, qty: float, limit_qty: float, location_name: str | None = None) -> str:
+    location = "" if location_name is None else f"Локація: {location_name}\n"
+    return (
+        "⚠️ ПОТРІБНО ДОЗАМОВИТИ\n\n"
+        f"Категорія: {cat_name}\n"
+        f"Продукт: {name}\n"
+        f"{location}"
+        f"Кількість: {qty}\n"
+        f"Ліміт: {limit_qty}"
+    )
 
-        text = (
-            "⚠️ ПОТРІБНО ДОЗАМОВИТИ\n\n"
-            f"Категорія: {cat_name}\n"
-            f"Продукт: {name}\n"
-            f"Кількість: {qty}\n"
-            f"Ліміт: {limit_qty}"
-        )
 
-        for chat_id in db.list_subscribers():
+async def _notify_subscribers(context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
+    subscribers = db.list_subscribers()
+    metrics.fanout_recipients.observe(len(subscribers))
+    with metrics.fanout_seconds.time():
+        for chat_id in subscribers:
             try:
                 await context.application.bot.send_message(chat_id=chat_id, text=text)
             except Forbidden:
                 db.remove_subscriber(chat_id)
             except BadRequest:
                 pass
-
-        db.set_below_limit(product_id, 1)
-        return
-
-    # Came back above limit -> reset flag
-    if (not is_now_below) and below_limit:
-        db.set_below_limit(product_id, 0)
@@ -0,0 +1,155 @@
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from telegram.error import TelegramError
+
+from app.utils.text import TELEGRAM_TEXT_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Hard bounds: profiling adds overhead to every call while it runs
+MAX_UPDATES = 500
+MAX_SECONDS = 120
+DEFAULT_UPDATES = 50
+DEFAULT_SECONDS = 30
+TOP_FUNCTIONS = 20
+
+
+def _short_path(filename: str) -> str:
+    """
+    Path relative to the project or to site-packages, to keep the summary readable.
+    """
+    for marker in ("site-packages" + os.sep, os.getcwd() + os.sep):
+        index = filename.find(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return filename
+
+
+def format_top_functions(stats: pstats.Stats, limit: int = TOP_FUNCTIONS) -> List[str]:
+    """
+    Top functions by own time: "tottime cumtime calls file:line(function)".
+    """
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    lines = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in rows:
+        if filename == "~":  # built-in function
+            name = func
+        else:
+            name = f"{_short_path(filename)}:{line}({func})"
+        lines.append(f"{tottime:7.3f} {cumtime:7.3f} {ncalls:7d}  {name}")
+    return lines
+
+
+class UpdateProfiler:
+    """
+    cProfile of the bot's event loop for the next N updates or T seconds, whichever comes first.
+
+    All updates, jobs and pushes running in that window are profiled (the loop runs them
+    interleaved, so per-update profiling would mix them anyway). The profiler switches
+    itself off, then the report is sent to the chat that asked for it.
+    """
+
+    def __init__(self):
+        self._profile: Optional[cProfile.Profile] = None
+        self._bot = None
+        self._chat_id: Optional[int] = None
+        self._trigger_update_id: Optional[int] = None
+        self._updates_left = 0
+        self._handled = 0
+        self._started = 0.0
+        self._timeout: Optional[asyncio.TimerHandle] = None
+        self._report_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+
+    def start(self, bot, chat_id: int, updates: int, seconds: float, trigger_update_id: Optional[int] = None) -> bool:
+        """
+        Start profiling. Returns False if a profile is already running.
+        """
+        if self.running:
+            return False
+
+        self._bot = bot
+        self._chat_id = chat_id
+        self._trigger_update_id = trigger_update_id
+        self._updates_left = max(1, min(updates, MAX_UPDATES))
+        self._handled = 0
+        self._started = time.perf_counter()
+        self._timeout = asyncio.get_running_loop().call_later(
+            max(1.0, min(seconds, MAX_SECONDS)), self.stop
+        )
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def on_update_done(self, update_id: Optional[int]) -> None:
+        """
+        Called by the update processor after every handled update.
+        """
+        if self._profile is None or update_id == self._trigger_update_id:
+            return
+        self._handled += 1
+        self._updates_left -= 1
+        if self._updates_left <= 0:
+            self.stop()
+
+    def stop(self) -> None:
+        """
+        Switch profiling off and send the report (no-op if not running).
+        """
+        profile = self._profile
+        if profile is None:
+            return
+        profile.disable()
+        self._profile = None
+        if self._timeout is not None:
+            self._timeout.cancel()
+            self._timeout = None
+
+        elapsed = time.perf_counter() - self._started
+        summary, dump = self.build_report(profile, self._handled, elapsed)
+        # Keep a reference: the loop only holds weak references to tasks
+        self._report_task = asyncio.get_running_loop().create_task(
+            self._send_report(self._bot, self._chat_id, summary, dump)
+        )
+
+    @staticmethod
+    def build_report(profile: cProfile.Profile, handled: int, elapsed: float) -> Tuple[str, bytes]:
+        """
+        Text summary of the top functions + the raw stats in .pstats format.
+        """
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        header = [
+            f"🔬 Профіль: {handled} оновлень за {elapsed:.1f} с, "
+            f"{stats.total_calls} викликів, {stats.total_tt:.3f} с CPU в профілі",
+            "",
+            "tottime cumtime   calls  функція",
+        ]
+        text = "\n".join(header + format_top_functions(stats))
+        if len(text) > TELEGRAM_TEXT_LIMIT:
+            text = text[:TELEGRAM_TEXT_LIMIT - 1] + "…"
+        # Same format as Stats.dump_stats(): loadable with pstats / snakeviz
+        return text, marshal.dumps(stats.stats)
+
+    @staticmethod
+    async def _send_report(bot, chat_id: int, summary: str, dump: bytes) -> None:
+        filename = f"profile_{datetime.now():%Y%m%d_%H%M%S}.pstats"
+        try:
+            await bot.send_message(chat_id=chat_id, text=summary)
+            await bot.send_document(chat_id=chat_id, document=dump, filename=filename)
+        except TelegramError:
+            logger.exception("Failed to send profile report")
+
+
+update_profiler = UpdateProfiler()
@@ -0,0 +1,274 @@
+import heapq
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from app.storage import db, versions
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"     # next_run / due in the DB, local time
+MAX_CATCH_UP = 1000                 # missed occurrences walked through after downtime
+SEARCH_DAYS = 366 * 4 + 1           # "29 2 *" fires once in four years
+JOB_NAME = "recurring_tasks"
+
+DAY_NAMES = {
+    "sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6,
+    "нд": 0, "пн": 1, "вт": 2, "ср": 3, "чт": 4, "пт": 5, "сб": 6,
+}
+
+# ---------- Schedules ----------
+
+
+def _parse_field(text: str, low: int, high: int) -> FrozenSet[int]:
+    """
+    One cron field: "*", "5", "1-5", "*/15", "1-20/5", "1,3,5".
+    """
+    values = set()
+    for part in text.split(","):
+        part, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if part == "*":
+            start, stop = low, high
+        elif "-" in part:
+            start, stop = (int(x) for x in part.split("-", 1))
+        else:
+            start = stop = int(part)
+            if step_text:
+                stop = high
+        if step < 1 or start < low or stop > high or start > stop:
+            raise ValueError(f"Value out of range {low}-{high}: {text}")
+        values.update(range(start, stop + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """
+    Five-field cron schedule (minute hour day-of-month month day-of-week, Sunday = 0 or 7)
+    in the bot's local time. As in cron, a restricted day-of-month and day-of-week match
+    if either of them matches.
+    """
+
+    __slots__ = ("minutes", "hours", "days", "months", "weekdays", "_any_day", "_any_weekday")
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("Cron expression needs 5 fields")
+        minute, hour, day, month, weekday = fields
+        self.minutes = sorted(_parse_field(minute, 0, 59))
+        self.hours = sorted(_parse_field(hour, 0, 23))
+        self.days = _parse_field(day, 1, 31)
+        self.months = _parse_field(month, 1, 12)
+        self.weekdays = frozenset(d % 7 for d in _parse_field(weekday, 0, 7))
+        self._any_day = day == "*"
+        self._any_weekday = weekday == "*"
+
+    def _day_matches(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        First firing time strictly after `moment` (None if the schedule never fires).
+        """
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(SEARCH_DAYS):
+            if self._day_matches(day):
+                first_day = day == start.date()
+                for hour in self.hours:
+                    if first_day and hour < start.hour:
+                        continue
+                    for minute in self.minutes:
+                        if first_day and hour == start.hour and minute < start.minute:
+                            continue
+                        return datetime(day.year, day.month, day.day, hour, minute)
+            day += timedelta(days=1)
+        return None
+
+
+def _parse_time(text: str) -> Tuple[int, int]:
+    hour_text, sep, minute_text = text.partition(":")
+    if not sep or not hour_text.isdigit() or not minute_text.isdigit():
+        raise ValueError("Time must be HH:MM")
+    hour, minute = int(hour_text), int(minute_text)
+    if hour > 23 or minute > 59:
+        raise ValueError("Time must be HH:MM")
+    return hour, minute
+
+
+def parse_schedule(text: str) -> CronSchedule:
+    """
+    Parse a template schedule:
+        daily 07:30            (щодня 07:30)
+        weekly mon,thu 07:00   (щотижня пн,чт 07:00)
+        cron 0 7 * * 1-5
+    Raises ValueError if invalid. A valid schedule may still never fire ("cron 0 0 30 2 *"):
+    next_after() returns None then.
+    """
+    words = (text or "").strip().lower().split()
+    if not words:
+        raise ValueError("Empty schedule")
+
+    kind, args = words[0], words[1:]
+    if kind in ("daily", "щодня") and len(args) == 1:
+        hour, minute = _parse_time(args[0])
+        expression = f"{minute} {hour} * * *"
+    elif kind in ("weekly", "щотижня") and len(args) == 2:
+        try:
+            weekdays = sorted({DAY_NAMES[name] for name in args[0].split(",")})
+        except KeyError:
+            raise ValueError("Unknown day of week") from None
+        hour, minute = _parse_time(args[1])
+        expression = f"{minute} {hour} * * {','.join(map(str, weekdays))}"
+    elif kind == "cron" and len(args) == 5:
+        expression = " ".join(args)
+    else:
+        raise ValueError("Unknown schedule format")
+
+    return CronSchedule(expression)
+
+
+def format_time(moment: Optional[datetime]) -> Optional[str]:
+    return None if moment is None else moment.strftime(TIME_FORMAT)
+
+
+# ---------- Scheduler ----------
+
+class RecurringTasks:
+    """
+    Materialises recurring task templates into the tasks table.
+
+    Next firing times of all templates are kept in one min-heap, and a single
+    JobQueue job is armed for the earliest one - not one job per template. Every
+    wake-up creates the tasks of all templates due by then in one batch
+    (db.materialize_task_templates, idempotent per occurrence).
+
+    Template changes bump the "task_templates" version (also from other worker
+    processes); the heap is then reloaded from the DB before the next run.
+    """
+
+    def __init__(self):
+        # template id -> (schedule, task_cat_id, next_run)
+        self._templates: Dict[int, Tuple[CronSchedule, int, datetime]] = {}
+        self._heap: List[Tuple[datetime, int]] = []
+        self._dirty = True
+        self._app = None
+        self._job = None
+        self.created = 0
+
+    def load(self) -> None:
+        """
+        (Re)build the heap from the DB.
+        """
+        self._templates.clear()
+        self._heap = []
+        parsed: Dict[str, Optional[CronSchedule]] = {}   # many templates share a schedule
+        for template_id, task_cat_id, _, schedule_text, next_run in db.list_task_templates():
+            if next_run is None:
+                continue
+            if schedule_text not in parsed:
+                try:
+                    parsed[schedule_text] = parse_schedule(schedule_text)
+                except ValueError:
+                    parsed[schedule_text] = None
+            schedule = parsed[schedule_text]
+            if schedule is None:
+                logger.warning("Template %s has an invalid schedule %r, skipped", template_id, schedule_text)
+                continue
+            fire_at = datetime.fromisoformat(next_run)   # TIME_FORMAT is ISO 8601
+            self._templates[template_id] = (schedule, task_cat_id, fire_at)
+            self._heap.append((fire_at, template_id))
+        heapq.heapify(self._heap)
+        self._dirty = False
+
+    def next_fire(self) -> Optional[datetime]:
+        if self._dirty:
+            self.load()
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now: datetime) -> int:
+        """
+        Create the tasks of every template due by `now`. Returns the number of created tasks.
+
+        After downtime a template creates one task for its latest missed occurrence,
+        not one per missed occurrence.
+        """
+        if self._dirty:
+            self.load()
+
+        fired: List[Tuple[int, int, str, Optional[str]]] = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, template_id = heapq.heappop(self._heap)
+            entry = self._templates.get(template_id)
+            if entry is None or entry[2] != fire_at:
+                continue  # deleted, or a stale heap entry
+
+            schedule, task_cat_id, _ = entry
+            due, following = fire_at, schedule.next_after(fire_at)
+            for _ in range(MAX_CATCH_UP):
+                if following is None or following > now:
+                    break
+                due, following = following, schedule.next_after(following)
+            else:
+                following = schedule.next_after(now)
+
+            fired.append((template_id, task_cat_id, format_time(due), format_time(following)))
+            if following is None:
+                del self._templates[template_id]
+            else:
+                self._templates[template_id] = (schedule, task_cat_id, following)
+                heapq.heappush(self._heap, (following, template_id))
+
+        created = db.materialize_task_templates(fired)
+        self.created += created
+        return created
+
+    # ---------- JobQueue ----------
+
+    def start(self, app) -> None:
+        """
+        Drive the scheduler from app.job_queue (needs python-telegram-bot[job-queue]).
+        """
+        if app.job_queue is None:
+            logger.warning("Recurring tasks are disabled: pip install \"python-telegram-bot[job-queue]\"")
+            return
+        self._app = app
+        versions.subscribe(self.on_version_bump)
+        self._arm()
+
+    def on_version_bump(self, scope: str, entity_id: Optional[int]) -> None:
+        if scope == "task_templates":
+            self._dirty = True
+            self._arm(0)
+
+    def _arm(self, delay: Optional[float] = None) -> None:
+        if self._app is None:
+            return
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+        if delay is None:
+            fire_at = self.next_fire()
+            if fire_at is None:
+                return
+            delay = max(0.0, (fire_at - datetime.now()).total_seconds())
+        self._job = self._app.job_queue.run_once(self._on_timer, when=delay, name=JOB_NAME)
+
+    async def _on_timer(self, context) -> None:
+        self._job = None
+        try:
+            created = self.run_due(datetime.now())
+            if created:
+                logger.info("Recurring tasks: %d created", created)
+        finally:
+            self._arm()
+
+
+recurring_tasks = RecurringTasks()
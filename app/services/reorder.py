@@ -0,0 +1,105 @@
+import itertools
+import math
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from app.config import REORDER_CONSUMPTION_DAYS, REORDER_SAFETY_DAYS, REORDER_TARGET_DAYS
+from app.storage import db, versions
+from app.storage.db import QTY_DECIMALS, ReorderInput
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency: without it the same formula runs row by row
+    np = None
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+DAY = 86400
+
+
+def _suggest_numpy(rows: List[ReorderInput], target_days: float, safety_days: float) -> Dict[int, float]:
+    if not rows:
+        return {}
+    # fromiter over the flattened rows: about twice as fast as np.array(rows)
+    data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 6)
+    ids, qty, limit_qty, pack, consumed, days = data.reshape(-1, 6).T
+
+    daily = consumed / np.maximum(days, 1.0)
+    safety = np.maximum(limit_qty, daily * safety_days)
+    need = np.maximum(safety + daily * target_days - qty, 0.0)
+    # Whole packs; the epsilon keeps 24.0000001 / 12 from becoming 3 packs
+    packs = np.ceil(need / np.where(pack > 0, pack, 1.0) - 1e-9)
+    order = np.round(np.where(pack > 0, packs * pack, need), QTY_DECIMALS)
+
+    positive = order > 0
+    return dict(zip(ids[positive].astype(np.int64).tolist(), order[positive].tolist()))
+
+
+def _suggest_python(rows: List[ReorderInput], target_days: float, safety_days: float) -> Dict[int, float]:
+    suggestions = {}
+    for prod_id, qty, limit_qty, pack, consumed, days in rows:
+        daily = consumed / max(days, 1)
+        need = max(max(limit_qty, daily * safety_days) + daily * target_days - qty, 0.0)
+        order = round(math.ceil(need / pack - 1e-9) * pack if pack > 0 else need, QTY_DECIMALS)
+        if order > 0:
+            suggestions[prod_id] = order
+    return suggestions
+
+
+def suggest_order_quantities(
+    rows: List[ReorderInput],
+    target_days: float = REORDER_TARGET_DAYS,
+    safety_days: float = REORDER_SAFETY_DAYS,
+    vectorized: Optional[bool] = None,
+) -> Dict[int, float]:
+    """
+    Suggested order quantity per product (only products that need an order).
+
+        daily  = consumed in the window / days of history in the window
+        safety = max(limit_qty, daily * safety_days)
+        order  = safety + daily * target_days - qty, rounded up to whole packs
+
+    i.e. enough to cover `target_days` of consumption on top of the safety stock;
+    without consumption history this tops the product up to its limit.
+    NumPy computes the whole catalogue in one vectorised pass; without it the
+    formula runs row by row.
+    """
+    if vectorized is None:
+        vectorized = numpy_available()
+    suggest = _suggest_numpy if vectorized else _suggest_python
+    return suggest(rows, target_days, safety_days)
+
+
+def consumption_window(now: float) -> Tuple[int, int]:
+    """
+    (since, today): the daily rollup buckets of the last REORDER_CONSUMPTION_DAYS days,
+    today included. Buckets are UTC days, as in the stock history triggers.
+    """
+    today = int(now) // DAY * DAY
+    return today - (REORDER_CONSUMPTION_DAYS - 1) * DAY, today
+
+
+class ReorderSuggestions:
+    """
+    Suggestions for the whole catalogue, recomputed when the catalogue changes
+    ("catalog" version, also bumped by other worker processes) or the history day
+    does (the consumption window moves).
+    """
+
+    def __init__(self):
+        self._key: Optional[Hashable] = None
+        self._suggestions: Dict[int, float] = {}
+
+    def get(self) -> Dict[int, float]:
+        since, today = consumption_window(time.time())
+        key = (versions.get("catalog"), today)
+        if key != self._key:
+            self._suggestions = suggest_order_quantities(db.list_reorder_inputs(since, today))
+            self._key = key
+        return self._suggestions
+
+
+reorder_suggestions = ReorderSuggestions()
@@ -0,0 +1,146 @@
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from app.config import STOCK_HISTORY_HOURLY_DAYS, STOCK_HISTORY_RAW_DAYS
+from app.storage import db
+from app.storage.db import HistoryPoint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERIOD = timedelta(days=7)
+MAX_PERIOD = timedelta(days=3660)
+CHART_WIDTH = 24                    # sparkline characters (one per time slot)
+PRUNE_INTERVAL = 6 * 3600           # seconds between retention runs
+JOB_NAME = "stock_history_prune"
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+PERIOD_RE = re.compile(r"^(\d+)\s*([hdwгдт])$")
+PERIOD_UNITS = {"h": 3600, "г": 3600, "d": 86400, "д": 86400, "w": 7 * 86400, "т": 7 * 86400}
+RESOLUTION_NAMES = {"raw": "усі зміни", "hour": "погодинно", "day": "подобово"}
+
+
+def parse_period(text: str) -> timedelta:
+    """
+    "24h" / "24г", "7d" / "7д", "4w" / "4т". Raises ValueError if invalid.
+    """
+    m = PERIOD_RE.match((text or "").strip().lower())
+    if not m or int(m.group(1)) == 0:
+        raise ValueError("Invalid period")
+    period = timedelta(seconds=int(m.group(1)) * PERIOD_UNITS[m.group(2)])
+    if period > MAX_PERIOD:
+        raise ValueError("Period is too long")
+    return period
+
+
+def pick_resolution(period: timedelta) -> str:
+    """
+    Coarsest data that still has a few points per chart slot: raw points while they
+    are retained, hourly rollups up to their retention, daily rollups beyond.
+    """
+    if period <= timedelta(days=STOCK_HISTORY_RAW_DAYS) and period <= timedelta(hours=CHART_WIDTH):
+        return "raw"
+    if period <= timedelta(days=STOCK_HISTORY_HOURLY_DAYS) and period <= timedelta(days=CHART_WIDTH):
+        return "hour"
+    return "day"
+
+
+def chart_levels(
+    points: Sequence[HistoryPoint], since: int, until: int, width: int = CHART_WIDTH
+) -> Tuple[List[Optional[float]], Optional[float], Optional[float]]:
+    """
+    Level at the end of each of `width` equal slots of [since, until] (None before the
+    first point) + min and max over the range (None if there are no points).
+    """
+    step = (until - since) / width
+    levels: List[Optional[float]] = []
+    level = low = high = None
+    i = 0
+    for slot in range(1, width + 1):
+        slot_end = since + step * slot if slot < width else float("inf")
+        while i < len(points) and points[i][0] < slot_end:
+            ts, min_qty, max_qty, level = points[i]
+            if ts < since:
+                min_qty = max_qty = level     # bucket before the range: only its closing level counts
+            low = min_qty if low is None else min(low, min_qty)
+            high = max_qty if high is None else max(high, max_qty)
+            i += 1
+        levels.append(level)
+    return levels, low, high
+
+
+def sparkline(levels: Sequence[Optional[float]], low: float, high: float) -> str:
+    top = len(SPARK_CHARS) - 1
+    chars = []
+    for level in levels:
+        if level is None:
+            chars.append(" ")
+        elif high == low:
+            chars.append(SPARK_CHARS[top // 2])
+        else:
+            chars.append(SPARK_CHARS[round((level - low) / (high - low) * top)])
+    return "".join(chars)
+
+
+def _format_period(period: timedelta) -> str:
+    seconds = int(period.total_seconds())
+    if seconds % 86400:
+        return f"{seconds // 3600} год"
+    return f"{seconds // 86400} дн"
+
+
+def history_text(product_id: int, period: timedelta = DEFAULT_PERIOD) -> Optional[str]:
+    """
+    Sparkline of a product total over the last `period`, or None if the product does not exist.
+    """
+    prod = db.get_product(product_id)
+    if not prod:
+        return None
+
+    _, _, name, qty, limit_qty, _ = prod
+    until = int(time.time())
+    since = until - int(period.total_seconds())
+    resolution = pick_resolution(period)
+    levels, low, high = chart_levels(db.load_stock_history(product_id, resolution, since), since, until)
+
+    lines = [f"📈 {name}: {_format_period(period)}, {RESOLUTION_NAMES[resolution]}"]
+    if low is None:
+        # No points kept for the range (raw ones may be pruned): the level did not change
+        lines.append(sparkline([qty] * CHART_WIDTH, qty, qty))
+        lines.append("Змін за цей період немає.")
+    else:
+        lines.append(sparkline(levels, low, high))
+        lines.append(f"мін {low} · макс {high}")
+    lines.append(f"Зараз: {qty}" + ("" if limit_qty is None else f" (мін к-сть {limit_qty})"))
+    lines.append(f"{datetime.fromtimestamp(since):%d.%m %H:%M} — {datetime.fromtimestamp(until):%d.%m %H:%M}")
+    return "\n".join(lines)
+
+
+# ---------- Retention ----------
+
+def prune(now: Optional[float] = None) -> Tuple[int, int]:
+    """
+    Drop raw points and hourly rollups that are past their retention window.
+    """
+    now = time.time() if now is None else now
+    return db.prune_stock_history(
+        int(now - STOCK_HISTORY_RAW_DAYS * 86400), int(now - STOCK_HISTORY_HOURLY_DAYS * 86400)
+    )
+
+
+async def _prune_job(context) -> None:
+    raw, hourly = prune()
+    if raw or hourly:
+        logger.info("Stock history pruned: %d raw points, %d hourly rollups", raw, hourly)
+
+
+def start_pruning(app) -> None:
+    """
+    Run prune() periodically from app.job_queue (needs python-telegram-bot[job-queue]).
+    """
+    if app.job_queue is None:
+        logger.warning("Stock history pruning is disabled: pip install \"python-telegram-bot[job-queue]\"")
+        return
+    app.job_queue.run_repeating(_prune_job, interval=PRUNE_INTERVAL, first=60, name=JOB_NAME)
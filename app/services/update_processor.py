@@ -0,0 +1,129 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from app.handlers.routing import router
+from app.services.metrics import handler_seconds
+from app.services.profiler import update_profiler
+from app.storage import tracing
+
+# Updates waiting for their chat's turn only hold a place in this queue, not a processing slot
+MAX_QUEUED_UPDATES = 4096
+
+
+def update_chat_key(update: object) -> Optional[Hashable]:
+    """
+    Serialisation key of an update: chat id, or user id for chat-less updates.
+    None means the update can run in parallel with anything.
+    """
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return ("user", user.id)
+    return None
+
+
+# Label of the update being processed, in a list so handlers can replace it (see set_handler_label)
+_update_label: ContextVar[Optional[List[str]]] = ContextVar("update_label", default=None)
+
+
+def handler_label(update: object) -> str:
+    """
+    Metrics label of the handler an update goes to, as far as the update itself tells:
+    callback:<scope>:<action>, command:<name> or message. A conversation that handles
+    a message replaces it with conversation:<name>:<state> (set_handler_label).
+    """
+    if not isinstance(update, Update):
+        return "other"
+
+    if update.callback_query is not None:
+        # Shared with the handlers that route the same update: parsed once
+        cb = router.parse(update.callback_query.data or "")
+        return f"callback:{cb.scope}:{cb.action}" if cb else "callback:unknown"
+
+    message = update.effective_message
+    text = message.text if message is not None else None
+    if text and text.startswith("/"):
+        return "command:" + text[1:].split(maxsplit=1)[0].split("@", 1)[0]
+
+    return "message" if message is not None else "other"
+
+
+def set_handler_label(label: str) -> None:
+    """
+    Called by the handler that took the update: the latency and SQL statements of
+    the update are recorded under `label`. No-op outside ChatOrderedUpdateProcessor.
+    """
+    holder = _update_label.get()
+    if holder is not None:
+        holder[0] = label
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process updates concurrently, but strictly one at a time and in arrival order per chat.
+
+    A slow handler in one chat (e.g. a notification fan-out) no longer blocks other chats,
+    while ConversationHandler state and user_data of one chat are never touched by two
+    updates at once. At most `max_concurrent` handlers run at the same time.
+    """
+
+    __slots__ = ("max_concurrent", "_slots", "_chat_locks")
+
+    def __init__(self, max_concurrent: int):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be a positive integer")
+        super().__init__(max_concurrent_updates=max(MAX_QUEUED_UPDATES, max_concurrent))
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # chat key -> [lock, number of updates holding or waiting for it]
+        self._chat_locks: Dict[Hashable, List[Any]] = {}
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]) -> None:
+        async with self._slots:
+            # Each update runs in its own task, so the label and the SQL count are per update
+            label = [handler_label(update)]
+            token = _update_label.set(label)
+            start = time.perf_counter()
+            try:
+                if tracing.SQL_TRACE:
+                    with tracing.count_queries() as log:
+                        await coroutine
+                    tracing.check_update_statements(label[0], log)
+                else:
+                    await coroutine
+            finally:
+                handler_seconds.observe(time.perf_counter() - start, label[0])
+                _update_label.reset(token)
+                update_profiler.on_update_done(getattr(update, "update_id", None))
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_chat_key(update)
+        if key is None:
+            await self._run(update, coroutine)
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order -> per-chat arrival order is kept
+            async with entry[0]:
+                await self._run(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
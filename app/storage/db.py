@@ -1,9 +1,14 @@
 import sqlite3
-from typing import Optional, List, Tuple
+from typing import Dict, Iterator, Optional, List, Tuple
 import os
 from pathlib import Path
 
+from app.storage import tracing, versions
+from app.storage.tracing import timed_query
+
 DB_PATH = os.getenv("DB_PATH", "data/bot.db")
+# How long a write waits for another process's write lock before "database is locked"
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 db_file = Path(DB_PATH)
 if db_file.parent and str(db_file.parent) not in (".", ""):
     db_file.parent.mkdir(parents=True, exist_ok=True)
@@ -12,9 +17,15 @@ if db_file.parent and str(db_file.parent) not in (".", ""):
 def connect() -> sqlite3.Connection:
     """
     Create a SQLite connection with foreign keys enabled.
+
+    The database is in WAL mode (see init_db), so readers never wait for writers;
+    concurrent writers of several worker processes wait up to BUSY_TIMEOUT_MS.
+    synchronous=NORMAL is durable in WAL mode except for the last commits on power loss.
     """
-    con = sqlite3.connect(DB_PATH)
+    con = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000)
     con.execute("PRAGMA foreign_keys = ON;")
+    con.execute("PRAGMA synchronous = NORMAL;")
+    tracing.install(con)
     return con
 
 
@@ -23,10 +34,14 @@ def init_db() -> None:
     Create tables if they do not exist and apply simple migrations for older DB versions.
     """
     with connect() as con:
+        # Persistent setting of the DB file: one writer + concurrent readers across processes
+        con.execute("PRAGMA journal_mode = WAL;")
+
         con.execute("""
             CREATE TABLE IF NOT EXISTS categories (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
+                name TEXT NOT NULL UNIQUE,
+                parent_id INTEGER DEFAULT NULL REFERENCES categories(id) ON DELETE CASCADE
             )
         """)
 
@@ -62,36 +77,292 @@ def init_db() -> None:
             )
         """)
 
+        # Open tasks of a process: list_all_tasks_by_category and count_open_tasks
+        con.execute("CREATE INDEX IF NOT EXISTS idx_tasks_cat_done ON tasks(task_cat_id, is_done)")
+
+        # Recurring task templates; schedule is the user's text ("daily 07:30", "cron 0 7 * * 1-5"),
+        # next_run the next local time a task is created (NULL: never again)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS task_templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                task_cat_id INTEGER NOT NULL CHECK(task_cat_id IN (1, 2, 3)),
+                text TEXT NOT NULL,
+                schedule TEXT NOT NULL,
+                next_run TEXT,
+                created TEXT NOT NULL DEFAULT (datetime('now'))
+            )
+        """)
+
         # Simple migrations for older DBs
+        cat_cols = [row[1] for row in con.execute("PRAGMA table_info(categories)").fetchall()]
+        if "parent_id" not in cat_cols:
+            con.execute(
+                "ALTER TABLE categories ADD COLUMN parent_id INTEGER DEFAULT NULL "
+                "REFERENCES categories(id) ON DELETE CASCADE"
+            )
+        con.execute("CREATE INDEX IF NOT EXISTS idx_categories_parent ON categories(parent_id)")
+        _init_category_tree(con)
+
         cols = [row[1] for row in con.execute("PRAGMA table_info(products)").fetchall()]
         if "limit_qty" not in cols:
             con.execute("ALTER TABLE products ADD COLUMN limit_qty REAL DEFAULT NULL")
         if "below_limit" not in cols:
             con.execute("ALTER TABLE products ADD COLUMN below_limit INTEGER NOT NULL DEFAULT 0")
+        if "unit_price" not in cols:
+            con.execute("ALTER TABLE products ADD COLUMN unit_price REAL DEFAULT NULL")
+        if "pack_size" not in cols:
+            con.execute("ALTER TABLE products ADD COLUMN pack_size REAL DEFAULT NULL")
+        _init_stock(con)
+        _init_stock_history(con)
+
+        task_cols = [row[1] for row in con.execute("PRAGMA table_info(tasks)").fetchall()]
+        if "template_id" not in task_cols:
+            con.execute("ALTER TABLE tasks ADD COLUMN template_id INTEGER DEFAULT NULL")
+        if "due" not in task_cols:
+            con.execute("ALTER TABLE tasks ADD COLUMN due TEXT DEFAULT NULL")
+        # One task per template occurrence: materialisation is idempotent (INSERT OR IGNORE)
+        con.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_template_due ON tasks(template_id, due) "
+            "WHERE template_id IS NOT NULL"
+        )
 
         con.commit()
 
 
+def _init_category_tree(con: sqlite3.Connection) -> None:
+    """
+    Closure table of the category hierarchy: one row per (ancestor, descendant) pair,
+    including (id, id, 0) for every category. "Everything under X" is then a single
+    indexed join on ancestor_id instead of a recursive walk.
+
+    Triggers keep it in sync with categories.parent_id on insert and move (any writer,
+    bulk inserts included); deleted categories drop their rows by ON DELETE CASCADE.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS category_tree (
+            ancestor_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+            descendant_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_category_tree_descendant ON category_tree(descendant_id, depth)")
+
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_categories_tree_insert AFTER INSERT ON categories
+        BEGIN
+            INSERT INTO category_tree(ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, NEW.id, depth + 1 FROM category_tree WHERE descendant_id = NEW.parent_id
+            UNION ALL
+            SELECT NEW.id, NEW.id, 0;
+        END
+    """)
+    # A category cannot be moved under itself or one of its descendants
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_categories_tree_cycle BEFORE UPDATE OF parent_id ON categories
+        WHEN NEW.parent_id IN (SELECT descendant_id FROM category_tree WHERE ancestor_id = OLD.id)
+        BEGIN
+            SELECT RAISE(ABORT, 'category cannot be moved into its own subtree');
+        END
+    """)
+    # Move: detach the subtree from its old ancestors, attach it to the new parent's ancestors
+    con.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_categories_tree_move AFTER UPDATE OF parent_id ON categories
+        WHEN NEW.parent_id IS NOT OLD.parent_id
+        BEGIN
+            DELETE FROM category_tree
+            WHERE descendant_id IN (SELECT descendant_id FROM category_tree WHERE ancestor_id = NEW.id)
+              AND ancestor_id IN (SELECT ancestor_id FROM category_tree
+                                  WHERE descendant_id = NEW.id AND ancestor_id != NEW.id);
+            INSERT INTO category_tree(ancestor_id, descendant_id, depth)
+            SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1
+            FROM category_tree up, category_tree down
+            WHERE up.descendant_id = NEW.parent_id AND down.ancestor_id = NEW.id;
+        END
+    """)
+
+    # Categories created before the hierarchy existed are all top-level
+    con.execute("INSERT OR IGNORE INTO category_tree(ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM categories")
+
+
+# Every product has a stock row here: created with the product, its initial quantity goes there
+MAIN_LOCATION_ID = 1
+MAIN_LOCATION_NAME = "Основний склад"
+
+
+def _init_stock(con: sqlite3.Connection) -> None:
+    """
+    Stock per (product, location) with optional per-location limits.
+
+    products.qty is the total over all locations, kept up to date by triggers: an update
+    of a stock row adds its delta to the total, inserts and deletes (rare) re-sum the
+    product's few rows. Reads never sum. products.below_limit follows the total.
+    """
+    stock_exists = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='stock'").fetchone()
+
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    con.execute("INSERT OR IGNORE INTO locations(id, name) VALUES (?, ?)", (MAIN_LOCATION_ID, MAIN_LOCATION_NAME))
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS stock (
+            product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            location_id INTEGER NOT NULL REFERENCES locations(id) ON DELETE CASCADE,
+            qty REAL NOT NULL DEFAULT 0,
+            limit_qty REAL DEFAULT NULL,
+            PRIMARY KEY (product_id, location_id)
+        ) WITHOUT ROWID
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_stock_location ON stock(location_id)")
+    # Per-location part of the reorder list: only stock rows that have a limit
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stock_limited ON stock(location_id, product_id) WHERE limit_qty IS NOT NULL"
+    )
+
+    if not stock_exists:
+        # Older DBs: the whole quantity is at the main location (before the triggers exist)
+        con.execute(
+            "INSERT INTO stock(product_id, location_id, qty) SELECT id, ?, qty FROM products",
+            (MAIN_LOCATION_ID,),
+        )
+
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_products_main_stock AFTER INSERT ON products
+        BEGIN
+            INSERT INTO stock(product_id, location_id, qty) VALUES (NEW.id, {MAIN_LOCATION_ID}, NEW.qty);
+        END
+    """)
+    con.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stock_update AFTER UPDATE OF qty ON stock
+        WHEN NEW.qty IS NOT OLD.qty
+        BEGIN
+            UPDATE products
+            SET qty = round(qty + NEW.qty - OLD.qty, {QTY_DECIMALS}),
+                below_limit = (limit_qty IS NOT NULL AND round(qty + NEW.qty - OLD.qty, {QTY_DECIMALS}) <= limit_qty)
+            WHERE id = NEW.product_id;
+        END
+    """)
+    for event, row in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stock_{event.lower()} AFTER {event} ON stock
+            BEGIN
+                UPDATE products
+                SET qty = (SELECT round(COALESCE(SUM(qty), 0), {QTY_DECIMALS}) FROM stock
+                           WHERE product_id = {row}.product_id)
+                WHERE id = {row}.product_id;
+                UPDATE products SET below_limit = (limit_qty IS NOT NULL AND qty <= limit_qty)
+                WHERE id = {row}.product_id;
+            END
+        """)
+
+
+# Stock history: epoch seconds (UTC) of the change; hourly / daily buckets are UTC-aligned
+_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+HISTORY_RESOLUTIONS = {"raw": 0, "hour": 3600, "day": 86400}   # bucket size, seconds
+
+
+def _init_stock_history(con: sqlite3.Connection) -> None:
+    """
+    History of product totals (products.qty), written by triggers on every change:
+    a raw point (pruned after a retention window, see prune_stock_history) plus
+    hourly and daily rollups (min / max / last level in the bucket, and out_qty: the sum
+    of decreases, i.e. consumption) updated in place.
+    A bucket's min/max include the level it started from, so charts need no raw points.
+    """
+    history_exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='stock_history'"
+    ).fetchone()
+
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS stock_history (
+            id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            ts INTEGER NOT NULL,
+            qty REAL NOT NULL
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_stock_history_product ON stock_history(product_id, ts)")
+    for resolution in ("hour", "day"):
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS stock_history_{resolution} (
+                product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+                bucket INTEGER NOT NULL,
+                min_qty REAL NOT NULL,
+                max_qty REAL NOT NULL,
+                last_qty REAL NOT NULL,
+                out_qty REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (product_id, bucket)
+            ) WITHOUT ROWID
+        """)
+        rollup_cols = [row[1] for row in con.execute(f"PRAGMA table_info(stock_history_{resolution})").fetchall()]
+        if "out_qty" not in rollup_cols:
+            con.execute(f"ALTER TABLE stock_history_{resolution} ADD COLUMN out_qty REAL NOT NULL DEFAULT 0")
+            # Triggers of older DBs do not fill it
+            con.execute("DROP TRIGGER IF EXISTS trg_products_history_insert")
+            con.execute("DROP TRIGGER IF EXISTS trg_products_history_update")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_stock_history_hour_bucket ON stock_history_hour(bucket)")
+
+    if not history_exists:
+        # Older DBs: history starts with the current level of every product
+        con.execute(f"INSERT INTO stock_history(product_id, ts, qty) SELECT id, {_NOW}, qty FROM products")
+        for resolution, size in (("hour", 3600), ("day", 86400)):
+            con.execute(f"""
+                INSERT INTO stock_history_{resolution}(product_id, bucket, min_qty, max_qty, last_qty)
+                SELECT id, {_NOW} / {size} * {size}, qty, qty, qty FROM products
+            """)
+
+    for event, old_qty in (("INSERT", "NEW.qty"), ("UPDATE", "OLD.qty")):
+        when = "" if event == "INSERT" else "WHEN NEW.qty IS NOT OLD.qty"
+        rollups = "".join(
+            f"""
+                INSERT INTO stock_history_{resolution}(product_id, bucket, min_qty, max_qty, last_qty, out_qty)
+                VALUES (NEW.id, {_NOW} / {size} * {size}, MIN({old_qty}, NEW.qty), MAX({old_qty}, NEW.qty), NEW.qty,
+                        MAX({old_qty} - NEW.qty, 0))
+                ON CONFLICT(product_id, bucket) DO UPDATE SET
+                    min_qty = MIN(min_qty, excluded.min_qty),
+                    max_qty = MAX(max_qty, excluded.max_qty),
+                    last_qty = excluded.last_qty,
+                    out_qty = out_qty + excluded.out_qty;"""
+            for resolution, size in (("hour", 3600), ("day", 86400))
+        )
+        con.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_products_history_{event.lower()}
+            AFTER {event}{" OF qty" if event == "UPDATE" else ""} ON products
+            {when}
+            BEGIN
+                INSERT INTO stock_history(product_id, ts, qty) VALUES (NEW.id, {_NOW}, NEW.qty);{rollups}
+            END
+        """)
+
+
 # ===== Subscribers =====
 
+@timed_query
 def add_subscriber(chat_id: int) -> None:
     with connect() as con:
         con.execute("INSERT OR IGNORE INTO subscribers(chat_id) VALUES (?)", (int(chat_id),))
         con.commit()
 
 
+@timed_query
 def remove_subscriber(chat_id: int) -> None:
     with connect() as con:
         con.execute("DELETE FROM subscribers WHERE chat_id=?", (int(chat_id),))
         con.commit()
 
 
+@timed_query
 def is_subscriber(chat_id: int) -> bool:
     with connect() as con:
         cur = con.execute("SELECT 1 FROM subscribers WHERE chat_id=? LIMIT 1", (int(chat_id),))
         return cur.fetchone() is not None
 
 
+@timed_query
 def list_subscribers() -> List[int]:
     with connect() as con:
         cur = con.execute("SELECT chat_id FROM subscribers")
@@ -100,38 +371,172 @@ def list_subscribers() -> List[int]:
 
 # ===== Categories =====
 
-def add_category(name: str) -> None:
+def _bump_categories(con: sqlite3.Connection, cat_ids) -> None:
+    """
+    Bump the "cat" version of the given categories and of their parents: a category screen
+    lists its subcategories with a 📂 mark if they have subcategories themselves.
+    The top-level list ("cats" version) is bumped by every category change anyway.
+    """
+    ids = {int(cat_id) for cat_id in cat_ids if cat_id is not None}
+    if not ids:
+        return
+    parents = con.execute(
+        f"SELECT parent_id FROM categories WHERE parent_id IS NOT NULL AND id IN ({','.join('?' * len(ids))})",
+        tuple(ids),
+    ).fetchall()
+    for cat_id in ids | {row[0] for row in parents}:
+        versions.bump("cat", cat_id)
+
+
+@timed_query
+def add_category(name: str, parent_id: int | None = None) -> int:
+    """
+    Add a category (top-level if parent_id is None). Returns its id.
+    Raises sqlite3.IntegrityError if the name is taken or the parent does not exist.
+    """
     with connect() as con:
-        con.execute("INSERT INTO categories(name) VALUES (?)", (name.strip(),))
+        cur = con.execute(
+            "INSERT INTO categories(name, parent_id) VALUES (?, ?)",
+            (name.strip(), None if parent_id is None else int(parent_id)),
+        )
         con.commit()
+        versions.bump("cats")
+        _bump_categories(con, [parent_id])
+    return cur.lastrowid
 
 
+@timed_query
 def list_categories() -> List[Tuple[int, str]]:
     with connect() as con:
         cur = con.execute("SELECT id, name FROM categories ORDER BY id ASC")
         return cur.fetchall()
 
 
+@timed_query
+def list_child_categories(parent_id: int | None = None) -> List[Tuple[int, str, int]]:
+    """
+    Direct subcategories of a category (top-level ones for None):
+    [(cat_id, name, subcategories_count), ...]
+    """
+    with connect() as con:
+        cur = con.execute(
+            """
+            SELECT c.id, c.name, (SELECT COUNT(*) FROM categories s WHERE s.parent_id = c.id)
+            FROM categories c
+            WHERE c.parent_id IS ?
+            ORDER BY c.id ASC
+            """,
+            (None if parent_id is None else int(parent_id),),
+        )
+        return cur.fetchall()
+
+
+@timed_query
 def get_category(cat_id: int) -> Optional[Tuple[int, str]]:
     with connect() as con:
         cur = con.execute("SELECT id, name FROM categories WHERE id=?", (int(cat_id),))
         return cur.fetchone()
 
 
+@timed_query
 def update_category(cat_id: int, new_name: str) -> None:
     with connect() as con:
         con.execute("UPDATE categories SET name=? WHERE id=?", (new_name.strip(), int(cat_id)))
         con.commit()
+        versions.bump("cats")
+        _bump_categories(con, [cat_id])
+
+
+@timed_query
+def move_category(cat_id: int, new_parent_id: int | None) -> bool:
+    """
+    Move a category with its whole subtree under another category (None: to the top level).
+    The closure table is updated by a trigger in the same transaction.
+
+    Returns False if the category or the new parent does not exist.
+    Raises ValueError if the new parent is the category itself or one of its descendants.
+    """
+    parent = None if new_parent_id is None else int(new_parent_id)
+    with connect() as con:
+        con.execute("BEGIN IMMEDIATE")
+        old = con.execute("SELECT parent_id FROM categories WHERE id=?", (int(cat_id),)).fetchone()
+        if not old or (parent is not None and not con.execute(
+            "SELECT 1 FROM categories WHERE id=?", (parent,)
+        ).fetchone()):
+            con.rollback()
+            return False
+        try:
+            con.execute("UPDATE categories SET parent_id=? WHERE id=?", (parent, int(cat_id)))
+        except sqlite3.IntegrityError:
+            con.rollback()
+            raise ValueError("Category cannot be moved into its own subtree") from None
+        con.commit()
+        versions.bump("cats")
+        _bump_categories(con, [cat_id, old[0], parent])
+    return True
 
 
+@timed_query
 def delete_category(cat_id: int) -> None:
+    """
+    Delete a category with all its subcategories and their products.
+    """
+    with connect() as con:
+        con.execute("BEGIN IMMEDIATE")
+        subtree = [row[0] for row in con.execute(
+            "SELECT descendant_id FROM category_tree WHERE ancestor_id=?", (int(cat_id),)
+        )]
+        row = con.execute("DELETE FROM categories WHERE id=? RETURNING parent_id", (int(cat_id),)).fetchone()
+        con.commit()
+        # Subcategories, products and closure rows are removed by ON DELETE CASCADE; product
+        # screens include the "cats" version in their cache key, so they are invalidated too.
+        versions.bump("cats")
+        for deleted_id in subtree or [cat_id]:
+            versions.bump("cat", deleted_id)
+        _bump_categories(con, [row[0] if row else None])
+
+
+# ===== Locations =====
+# Changes bump the "locations" version: product screens show a stock breakdown by location.
+
+@timed_query
+def add_location(name: str) -> int:
+    """
+    Add a storage location. Returns its id; raises sqlite3.IntegrityError if the name is taken.
+    """
+    with connect() as con:
+        cur = con.execute("INSERT INTO locations(name) VALUES (?)", (name.strip(),))
+        con.commit()
+    versions.bump("locations")
+    return cur.lastrowid
+
+
+@timed_query
+def list_locations() -> List[Tuple[int, str]]:
+    with connect() as con:
+        return con.execute("SELECT id, name FROM locations ORDER BY id ASC").fetchall()
+
+
+@timed_query
+def delete_location(location_id: int) -> bool:
+    """
+    Delete a location with its stock (product totals are re-summed by a trigger).
+    Returns False if it does not exist; raises ValueError for the main location.
+    """
+    if int(location_id) == MAIN_LOCATION_ID:
+        raise ValueError("The main location cannot be deleted")
     with connect() as con:
-        con.execute("DELETE FROM categories WHERE id=?", (int(cat_id),))
+        cur = con.execute("DELETE FROM locations WHERE id=?", (int(location_id),))
         con.commit()
+    if not cur.rowcount:
+        return False
+    versions.bump("locations")
+    return True
 
 
 # ===== Products =====
 
+@timed_query
 def add_product(category_id: int, name: str, qty: float, limit_qty: float | None = None) -> None:
     clean_name = name.strip()
     qty_f = float(qty)
@@ -148,8 +553,10 @@ def add_product(category_id: int, name: str, qty: float, limit_qty: float | None
             (int(category_id), clean_name, qty_f, limit_f, below_limit),
         )
         con.commit()
+    versions.bump("cat", category_id)
 
 
+@timed_query
 def list_products_by_category(category_id: int) -> List[Tuple[int, str, float, float | None]]:
     with connect() as con:
         cur = con.execute(
@@ -159,6 +566,7 @@ def list_products_by_category(category_id: int) -> List[Tuple[int, str, float, f
         return cur.fetchall()
 
 
+@timed_query
 def get_product(product_id: int) -> Optional[Tuple[int, int, str, float, float | None, int]]:
     with connect() as con:
         cur = con.execute(
@@ -168,63 +576,573 @@ def get_product(product_id: int) -> Optional[Tuple[int, int, str, float, float |
         return cur.fetchone()
 
 
+@timed_query
 def update_product_name(product_id: int, new_name: str) -> None:
     with connect() as con:
-        con.execute("UPDATE products SET name=? WHERE id=?", (new_name.strip(), int(product_id)))
+        row = con.execute(
+            "UPDATE products SET name=? WHERE id=? RETURNING category_id",
+            (new_name.strip(), int(product_id)),
+        ).fetchone()
+        con.commit()
+    versions.bump("prod", product_id)
+    if row:
+        # Product names are shown on the category screen
+        versions.bump("cat", row[0])
+
+
+# Rounding of quantities changed by a delta: keeps 0.1 + 0.2 from drifting and makes
+# old = new - delta exact for inputs with up to this many decimals
+QTY_DECIMALS = 6
+
+# (old_qty, new_qty, limit_qty) at the location + (old_total, new_total, total_limit) of the product
+StockChange = Tuple[float, float, float | None, float, float, float | None]
+
+
+@timed_query
+def set_stock_qty(product_id: int, location_id: int, new_qty: float) -> Optional[StockChange]:
+    """
+    Set the quantity of a product at a location (the stock row is created if missing).
+    Returns the StockChange, or None if the product or the location does not exist.
+
+    The old value is read under the write lock (BEGIN IMMEDIATE), so concurrent changes
+    cannot interleave; the product total is updated by a trigger in the same transaction.
+    """
+    qty_f = float(new_qty)
+    with connect() as con:
+        con.execute("BEGIN IMMEDIATE")
+        old = con.execute(
+            "SELECT qty FROM stock WHERE product_id=? AND location_id=?", (int(product_id), int(location_id))
+        ).fetchone()
+        try:
+            row = con.execute(
+                """INSERT INTO stock(product_id, location_id, qty) VALUES (?1, ?2, ?3)
+                   ON CONFLICT(product_id, location_id) DO UPDATE SET qty=?3
+                   RETURNING qty, limit_qty""",
+                (int(product_id), int(location_id), qty_f),
+            ).fetchone()
+        except sqlite3.IntegrityError:   # unknown product or location
+            con.rollback()
+            return None
+        total = con.execute("SELECT qty, limit_qty FROM products WHERE id=?", (int(product_id),)).fetchone()
+        con.commit()
+    versions.bump("prod", product_id)
+    return _stock_change(0.0 if old is None else old[0], row, total)
+
+
+@timed_query
+def add_stock_qty(product_id: int, location_id: int, delta: float) -> Optional[StockChange]:
+    """
+    Add `delta` (negative: subtract) to the quantity of a product at a location, so
+    concurrent changes by several people never overwrite each other.
+
+    Returns the StockChange, or None if the product or the location does not exist
+    or the quantity would become negative (nothing is changed then).
+    """
+    delta_f = float(delta)
+    with connect() as con:
+        con.execute("BEGIN IMMEDIATE")
+        row = con.execute(
+            """UPDATE stock SET qty=round(qty + ?1, ?4)
+               WHERE product_id=?2 AND location_id=?3 AND round(qty + ?1, ?4) >= 0
+               RETURNING qty, limit_qty""",
+            (delta_f, int(product_id), int(location_id), QTY_DECIMALS),
+        ).fetchone()
+        if row is None and delta_f >= 0:
+            # Not negative, so the row is missing: first stock of the product at this location
+            try:
+                row = con.execute(
+                    "INSERT INTO stock(product_id, location_id, qty) VALUES (?, ?, round(?, ?)) RETURNING qty, limit_qty",
+                    (int(product_id), int(location_id), delta_f, QTY_DECIMALS),
+                ).fetchone()
+            except sqlite3.IntegrityError:   # unknown product or location
+                row = None
+        if row is None:
+            con.rollback()
+            return None
+        total = con.execute("SELECT qty, limit_qty FROM products WHERE id=?", (int(product_id),)).fetchone()
+        con.commit()
+    versions.bump("prod", product_id)
+    return _stock_change(round(float(row[0]) - delta_f, QTY_DECIMALS), row, total)
+
+
+def _stock_change(old_qty: float, row: Tuple[float, float | None], total: Tuple[float, float | None]) -> StockChange:
+    new_qty, limit_qty = _real_row(row)
+    new_total, total_limit = _real_row(total)
+    old_total = round(new_total - (new_qty - old_qty), QTY_DECIMALS)
+    return float(old_qty), new_qty, limit_qty, old_total, new_total, total_limit
+
+
+def _real_row(row: Tuple[float, float | None]) -> Tuple[float, float | None]:
+    # RETURNING gives whole REAL values as int (5 instead of 5.0), unlike SELECT
+    qty, limit_qty = row
+    return float(qty), None if limit_qty is None else float(limit_qty)
+
+
+@timed_query
+def set_stock_limit(
+    product_id: int, location_id: int, new_limit_qty: float | None
+) -> Optional[Tuple[float, float | None, float | None]]:
+    """
+    Set the limit of a product at a location (the stock row is created if missing).
+    Returns (qty, old_limit, new_limit), or None if the product or the location does not exist.
+    """
+    limit_f = None if new_limit_qty is None else float(new_limit_qty)
+    with connect() as con:
+        con.execute("BEGIN IMMEDIATE")
+        old = con.execute(
+            "SELECT limit_qty FROM stock WHERE product_id=? AND location_id=?", (int(product_id), int(location_id))
+        ).fetchone()
+        try:
+            row = con.execute(
+                """INSERT INTO stock(product_id, location_id, limit_qty) VALUES (?1, ?2, ?3)
+                   ON CONFLICT(product_id, location_id) DO UPDATE SET limit_qty=?3
+                   RETURNING qty, limit_qty""",
+                (int(product_id), int(location_id), limit_f),
+            ).fetchone()
+        except sqlite3.IntegrityError:
+            con.rollback()
+            return None
         con.commit()
+    versions.bump("prod", product_id)
+    qty, new_limit = _real_row(row)
+    return qty, None if old is None or old[0] is None else float(old[0]), new_limit
+
 
+LimitChange = Tuple[float, float | None, bool, bool]   # (qty, limit_qty, was_below, is_below)
 
-def update_product_qty(product_id: int, new_qty: float) -> None:
+
+@timed_query
+def update_product_limit(product_id: int, new_limit_qty: float | None) -> Optional[LimitChange]:
+    """
+    Set the limit of the product total; below_limit is recomputed by the same UPDATE.
+    Returns (qty, limit_qty, was_below, is_below), or None if the product does not exist.
+
+    RETURNING only sees new values, so the old flag is read first under the write lock
+    (BEGIN IMMEDIATE): of several concurrent changes exactly one sees the crossing.
+    """
+    limit_f = None if new_limit_qty is None else float(new_limit_qty)
     with connect() as con:
-        con.execute("UPDATE products SET qty=? WHERE id=?", (float(new_qty), int(product_id)))
+        con.execute("BEGIN IMMEDIATE")
+        old = con.execute("SELECT below_limit FROM products WHERE id=?", (int(product_id),)).fetchone()
+        row = con.execute(
+            """UPDATE products SET limit_qty=?2, below_limit=(?2 IS NOT NULL AND qty <= ?2)
+               WHERE id=?1
+               RETURNING qty, limit_qty, below_limit""",
+            (int(product_id), limit_f),
+        ).fetchone()
         con.commit()
+    if row is None:
+        return None
+    versions.bump("prod", product_id)
+    qty, limit_qty = _real_row(row[:2])
+    return qty, limit_qty, bool(old[0]), bool(row[2])
 
 
-def update_product_limit(product_id: int, new_limit_qty: float | None) -> None:
+@timed_query
+def update_product_price(product_id: int, unit_price: float | None) -> None:
+    """
+    Set the unit price of a product (None: no price, the product is left out of the valuation).
+    """
     with connect() as con:
         con.execute(
-            "UPDATE products SET limit_qty=? WHERE id=?",
-            (None if new_limit_qty is None else float(new_limit_qty), int(product_id)),
+            "UPDATE products SET unit_price=? WHERE id=?",
+            (None if unit_price is None else float(unit_price), int(product_id)),
         )
         con.commit()
+    versions.bump("prod", product_id)
 
 
-def set_below_limit(product_id: int, below: int) -> None:
+@timed_query
+def update_product_pack(product_id: int, pack_size: float | None) -> None:
+    """
+    Set the pack size suggested order quantities are rounded up to (None: no rounding).
+    """
     with connect() as con:
         con.execute(
-            "UPDATE products SET below_limit=? WHERE id=?",
-            (1 if below else 0, int(product_id)),
+            "UPDATE products SET pack_size=? WHERE id=?",
+            (None if pack_size is None else float(pack_size), int(product_id)),
         )
         con.commit()
+    versions.bump("prod", product_id)
 
 
-def delete_product(product_id: int) -> None:
+@timed_query
+def delete_product(product_id: int) -> Optional[int]:
+    """
+    Delete a product. Returns its category id, or None if it did not exist.
+    """
     with connect() as con:
-        con.execute("DELETE FROM products WHERE id=?", (int(product_id),))
+        row = con.execute(
+            "DELETE FROM products WHERE id=? RETURNING category_id",
+            (int(product_id),),
+        ).fetchone()
         con.commit()
+    versions.bump("prod", product_id)
+    if not row:
+        return None
+    versions.bump("cat", row[0])
+    return int(row[0])
+
+
+# ===== Screen loaders =====
+# One JOINed statement per screen: a single SELECT is atomic in SQLite,
+# so the screen never mixes data from before and after a concurrent write.
+
+CategoryScreen = Tuple[
+    Tuple[int, str, int | None],                    # (cat_id, name, parent_id)
+    List[Tuple[int, str, int]],                     # subcategories: (cat_id, name, subcategories_count)
+    List[Tuple[int, str, float, float | None]],     # products: (prod_id, name, qty, limit_qty)
+]
+
+
+@timed_query
+def load_category_screen(cat_id: int) -> Optional[CategoryScreen]:
+    """
+    Load a category with its direct subcategories and products:
+    ((cat_id, name, parent_id), [subcategories], [products]) or None if category is missing.
+    """
+    with connect() as con:
+        rows = con.execute(
+            """
+            SELECT 0, c.id, c.name, c.parent_id, NULL FROM categories c WHERE c.id = ?1
+            UNION ALL
+            SELECT 1, s.id, s.name, (SELECT COUNT(*) FROM categories g WHERE g.parent_id = s.id), NULL
+            FROM categories s WHERE s.parent_id = ?1
+            UNION ALL
+            SELECT 2, p.id, p.name, p.qty, p.limit_qty FROM products p WHERE p.category_id = ?1
+            ORDER BY 1, 2
+            """,
+            (int(cat_id),),
+        ).fetchall()
+
+    if not rows or rows[0][0] != 0:
+        return None
+
+    cat = tuple(rows[0][1:4])
+    children = [(c_id, name, count) for kind, c_id, name, count, _ in rows if kind == 1]
+    products = [(p_id, name, qty, limit_qty) for kind, p_id, name, qty, limit_qty in rows if kind == 2]
+    return cat, children, products
+
+
+@timed_query
+def subtree_stock_totals(cat_id: int) -> Tuple[int, int, float, int]:
+    """
+    Totals of a category and everything under it, in one indexed join over the closure table:
+    (categories, products, total_qty, products_to_reorder)
+    """
+    with connect() as con:
+        row = con.execute(
+            """
+            SELECT COUNT(DISTINCT t.descendant_id),
+                   COUNT(p.id),
+                   COALESCE(SUM(p.qty), 0.0),
+                   COALESCE(SUM(p.limit_qty IS NOT NULL AND p.qty <= p.limit_qty), 0)
+            FROM category_tree t
+            LEFT JOIN products p ON p.category_id = t.descendant_id
+            WHERE t.ancestor_id = ?
+            """,
+            (int(cat_id),),
+        ).fetchone()
+    return row[0], row[1], float(row[2]), row[3]
+
+
+StockRow = Tuple[int, str, float | None, float | None]   # (location_id, location_name, qty, limit_qty)
+
+
+@timed_query
+def load_product_screen(
+    product_id: int,
+) -> Optional[Tuple[Tuple[int, int, str, float, float | None, int, float | None, float | None], List[StockRow]]]:
+    """
+    Load a product (the get_product row + unit_price, pack_size) with its stock at every location
+    (qty/limit None where it has no stock row): (product, [stock rows]) or None.
+    """
+    with connect() as con:
+        rows = con.execute(
+            """
+            SELECT 0, id, category_id, name, qty, limit_qty, below_limit, unit_price, pack_size
+            FROM products WHERE id = ?1
+            UNION ALL
+            SELECT 1, l.id, NULL, l.name, s.qty, s.limit_qty, NULL, NULL, NULL
+            FROM locations l
+            LEFT JOIN stock s ON s.location_id = l.id AND s.product_id = ?1
+            WHERE EXISTS (SELECT 1 FROM products WHERE id = ?1)
+            ORDER BY 1, 2
+            """,
+            (int(product_id),),
+        ).fetchall()
+
+    if not rows or rows[0][0] != 0:
+        return None
+    product = rows[0][1:]
+    stock = [(loc_id, name, qty, limit_qty) for _, loc_id, _, name, qty, limit_qty, *_ in rows[1:]]
+    return product, stock
+
+
+@timed_query
+def get_product_with_category(product_id: int) -> Optional[Tuple[int, int, str, str, float, float | None, int]]:
+    """
+    Load a product together with its category name:
+    (prod_id, cat_id, cat_name, name, qty, limit_qty, below_limit)
+    """
+    with connect() as con:
+        cur = con.execute(
+            """
+            SELECT p.id, p.category_id, c.name, p.name, p.qty, p.limit_qty, p.below_limit
+            FROM products p
+            JOIN categories c ON c.id = p.category_id
+            WHERE p.id=?
+            """,
+            (int(product_id),),
+        )
+        return cur.fetchone()
 
 
 # ===== Reorder list =====
 
-def list_reorder_items() -> List[Tuple[int, str, int, str, float, float]]:
+# Products at or below their total limit (location NULL), then per-location stock
+# at or below the location limit; a product may appear in both.
+_REORDER_TEMPLATE = """
+    SELECT c.id, c.name, p.id, p.name, p.qty, p.limit_qty, NULL
+    FROM {products}
+    JOIN categories c ON c.id = p.category_id
+    WHERE p.limit_qty IS NOT NULL
+      AND p.qty <= p.limit_qty
+    UNION ALL
+    SELECT c.id, c.name, p.id, p.name, s.qty, s.limit_qty, l.name
+    FROM {products}
+    JOIN categories c ON c.id = p.category_id
+    JOIN stock s ON s.product_id = p.id
+    JOIN locations l ON l.id = s.location_id
+    WHERE s.limit_qty IS NOT NULL
+      AND s.qty <= s.limit_qty
+    ORDER BY 2 ASC, 4 ASC, 7 ASC
+"""
+
+REORDER_SQL = _REORDER_TEMPLATE.format(products="products p")
+
+# Same rows for one category and everything under it
+REORDER_SUBTREE_SQL = _REORDER_TEMPLATE.format(
+    products="category_tree t JOIN products p ON p.category_id = t.descendant_id AND t.ancestor_id = ?1"
+)
+
+
+ReorderItem = Tuple[int, str, int, str, float, float, Optional[str]]
+
+
+def _reorder_query(cat_id: int | None) -> Tuple[str, tuple]:
+    return (REORDER_SQL, ()) if cat_id is None else (REORDER_SUBTREE_SQL, (int(cat_id),))
+
+
+@timed_query
+def list_reorder_items(cat_id: int | None = None) -> List[ReorderItem]:
+    """
+    Return items that should be reordered (only under `cat_id`, if given):
+    (cat_id, cat_name, prod_id, prod_name, qty, limit_qty, location_name)
+    location_name is None for the product total, else qty/limit_qty are of that location.
+    """
+    with connect() as con:
+        cur = con.execute(*_reorder_query(cat_id))
+        return cur.fetchall()
+
+
+@timed_query
+def iter_reorder_items(batch_size: int = 500, cat_id: int | None = None) -> Iterator[ReorderItem]:
+    """
+    Same rows as list_reorder_items(), but fetched lazily in batches,
+    so memory does not grow with the catalogue size.
+    """
+    with connect() as con:
+        cur = con.execute(*_reorder_query(cat_id))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+# ===== Stock history =====
+
+HistoryPoint = Tuple[int, float, float, float]   # (ts, min_qty, max_qty, last_qty)
+
+
+@timed_query
+def load_stock_history(product_id: int, resolution: str, since: int) -> List[HistoryPoint]:
     """
-    Return items that should be reordered:
-    (cat_id, cat_name, prod_id, prod_name, qty, limit_qty)
+    History of a product total from `since` (epoch seconds) on, oldest first, at the
+    given resolution ("raw", "hour" or "day"; raw points have min = max = last).
+    Starts with the last point before `since`, if any: the level the range starts from.
+    """
+    if resolution == "raw":
+        columns, table, ts = "ts, qty, qty, qty, id", "stock_history", "ts"
+    elif resolution in HISTORY_RESOLUTIONS:
+        columns, table, ts = "bucket, min_qty, max_qty, last_qty, 0", f"stock_history_{resolution}", "bucket"
+    else:
+        raise ValueError(f"Unknown resolution: {resolution}")
+
+    with connect() as con:
+        rows = con.execute(
+            f"""
+            SELECT * FROM (
+                SELECT {columns} FROM {table}
+                WHERE product_id = ?1 AND {ts} < ?2
+                ORDER BY {ts} DESC, 5 DESC LIMIT 1
+            )
+            UNION ALL
+            SELECT {columns} FROM {table}
+            WHERE product_id = ?1 AND {ts} >= ?2
+            ORDER BY 1, 5
+            """,
+            (int(product_id), int(since)),
+        ).fetchall()
+    return [row[:4] for row in rows]
+
+
+@timed_query
+def prune_stock_history(raw_before: int, hourly_before: int) -> Tuple[int, int]:
+    """
+    Delete raw points older than `raw_before` and hourly rollups older than `hourly_before`
+    (epoch seconds); daily rollups are kept. Returns the numbers of deleted rows.
+
+    Raw ids grow with time, so the old points are a prefix of the rowid order:
+    no index on ts is needed.
     """
     with connect() as con:
-        cur = con.execute("""
-            SELECT c.id, c.name, p.id, p.name, p.qty, p.limit_qty
+        raw = con.execute(
+            """
+            DELETE FROM stock_history
+            WHERE id < COALESCE(
+                (SELECT id FROM stock_history WHERE ts >= ?1 ORDER BY id LIMIT 1),
+                (SELECT MAX(id) + 1 FROM stock_history)
+            )
+            """,
+            (int(raw_before),),
+        ).rowcount
+        hourly = con.execute("DELETE FROM stock_history_hour WHERE bucket < ?", (int(hourly_before),)).rowcount
+        con.commit()
+    return raw, hourly
+
+
+@timed_query
+def find_products(query: str, limit: int = 10) -> List[Tuple[int, str, str]]:
+    """
+    Products whose name contains `query`: (prod_id, name, cat_name), shortest names first.
+    """
+    with connect() as con:
+        cur = con.execute(
+            """
+            SELECT p.id, p.name, c.name
             FROM products p
             JOIN categories c ON c.id = p.category_id
-            WHERE p.limit_qty IS NOT NULL
-              AND p.qty <= p.limit_qty
-            ORDER BY c.name ASC, p.name ASC
-        """)
+            WHERE p.name LIKE '%' || ? || '%'
+            ORDER BY length(p.name), p.name
+            LIMIT ?
+            """,
+            (query.strip(), int(limit)),
+        )
+        return cur.fetchall()
+
+
+# ===== Valuation =====
+
+# Stock value (qty * unit_price) of every top-level category with everything under it,
+# then of every location. Products without a price count as 0 (and are counted apart).
+# The window columns give each row's share of the overall value and, for categories,
+# the running share in descending order of value (top categories making up N% of the stock).
+VALUATION_SQL = """
+    WITH own AS (
+        SELECT category_id, COUNT(*) AS products, COUNT(unit_price) AS priced,
+               TOTAL(qty * unit_price) AS value
+        FROM products NOT INDEXED   -- one sequential scan + sort beats walking the (category_id, name) index
+        GROUP BY category_id
+    ),
+    roots AS (
+        SELECT c.id, c.name,
+               COALESCE(SUM(o.products), 0) AS products,
+               COALESCE(SUM(o.priced), 0) AS priced,
+               TOTAL(o.value) AS value
+        FROM categories c
+        JOIN category_tree t ON t.ancestor_id = c.id
+        LEFT JOIN own o ON o.category_id = t.descendant_id
+        WHERE c.parent_id IS NULL
+        GROUP BY c.id
+    ),
+    places AS (
+        SELECT l.id, l.name, COUNT(s.product_id) AS products, COUNT(p.unit_price) AS priced,
+               TOTAL(s.qty * p.unit_price) AS value
+        FROM locations l
+        LEFT JOIN stock s ON s.location_id = l.id
+        LEFT JOIN products p ON p.id = s.product_id
+        GROUP BY l.id
+    )
+    SELECT 0, id, name, products, priced, value,
+           100.0 * value / NULLIF(SUM(value) OVER (), 0),
+           100.0 * SUM(value) OVER (ORDER BY value DESC, id ROWS UNBOUNDED PRECEDING)
+                 / NULLIF(SUM(value) OVER (), 0)
+    FROM roots
+    UNION ALL
+    SELECT 1, id, name, products, priced, value,
+           100.0 * value / NULLIF(SUM(value) OVER (), 0),
+           NULL
+    FROM places
+    ORDER BY 1, 6 DESC, 2
+"""
+
+# (id, name, products, priced_products, value, share_percent, running_share_percent)
+# Shares are None while the overall value is 0; running share is None for locations.
+ValuationRow = Tuple[int, str, int, int, float, float | None, float | None]
+
+
+@timed_query
+def stock_valuation() -> Tuple[List[ValuationRow], List[ValuationRow]]:
+    """
+    Inventory value per top-level category (subcategories included) and per location,
+    both sorted by value: ([category rows], [location rows]).
+    The overall value is the sum over either list.
+    """
+    with connect() as con:
+        rows = con.execute(VALUATION_SQL).fetchall()
+    categories = [row[1:] for row in rows if row[0] == 0]
+    locations = [row[1:] for row in rows if row[0] == 1]
+    return categories, locations
+
+
+# (prod_id, qty, limit_qty or 0, pack_size or 0, consumed since the given day, days of history in the window)
+ReorderInput = Tuple[int, float, float, float, float, int]
+
+
+@timed_query
+def list_reorder_inputs(since: int, today: int) -> List[ReorderInput]:
+    """
+    Inputs of the order suggestions (app.services.reorder) for every product, in one query:
+    consumption is the sum of decreases in the daily rollups from the day bucket `since`
+    through the day bucket `today` (epoch seconds), and the days it covers: the whole window,
+    or fewer days for a product whose history (its first daily bucket) starts inside it.
+    NULL limits / pack sizes come as 0, so the rows load straight into a float array.
+
+    The per-product subqueries are primary key seeks (the window range, the first bucket),
+    so the cost does not grow with the (never pruned) daily history.
+    """
+    day = HISTORY_RESOLUTIONS["day"]
+    with connect() as con:
+        cur = con.execute(
+            f"""
+            SELECT p.id, p.qty, COALESCE(p.limit_qty, 0), COALESCE(p.pack_size, 0),
+                   (SELECT TOTAL(d.out_qty) FROM stock_history_day d
+                    WHERE d.product_id = p.id AND d.bucket >= ?1),
+                   (?2 - MAX(?1, COALESCE(
+                       (SELECT MIN(d.bucket) FROM stock_history_day d WHERE d.product_id = p.id), ?1
+                   ))) / {day} + 1
+            FROM products p
+            """,
+            (int(since), int(today)),
+        )
         return cur.fetchall()
 
 
 # ===== Tasks =====
 
+@timed_query
 def add_task(user_id: int, text: str, task_cat_id: int) -> int:
     """
     Create a task. Returns new task id.
@@ -239,9 +1157,70 @@ def add_task(user_id: int, text: str, task_cat_id: int) -> int:
             (int(user_id), text, int(task_cat_id)),
         )
         con.commit()
-        return int(cur.lastrowid)
+    versions.bump("task_proc", task_cat_id)
+    _adjust_open_tasks(task_cat_id, 1)
+    return int(cur.lastrowid)
 
 
+@timed_query
+def add_tasks(user_id: int, texts: List[str], task_cat_id: int) -> int:
+    """
+    Create several tasks in one transaction (one executemany, one version bump).
+    Empty texts are skipped. Returns the number of created tasks.
+    """
+    rows = [(int(user_id), text.strip(), int(task_cat_id)) for text in texts if text.strip()]
+    if not rows:
+        return 0
+
+    with connect() as con:
+        con.executemany("INSERT INTO tasks(user_id, text, task_cat_id) VALUES (?, ?, ?)", rows)
+        con.commit()
+    versions.bump("task_proc", task_cat_id)
+    _adjust_open_tasks(task_cat_id, len(rows))
+    return len(rows)
+
+
+# Open tasks per process as of versions.get("task_procs"): (version, {task_cat_id: count}).
+# Writers of this process adjust it in place; a write of another worker process
+# bumps the version remotely, and the next read recounts.
+_open_tasks: Optional[Tuple[int, Dict[int, int]]] = None
+
+
+def _adjust_open_tasks(task_cat_id: int, delta: int) -> None:
+    global _open_tasks
+    fresh = _open_tasks is not None and _open_tasks[0] == versions.get("task_procs")
+    versions.bump("task_procs")
+    if fresh:
+        counts = _open_tasks[1]
+        counts[int(task_cat_id)] = counts.get(int(task_cat_id), 0) + delta
+        _open_tasks = (versions.get("task_procs"), counts)
+
+
+@timed_query
+def _select_open_tasks() -> Dict[int, int]:
+    with connect() as con:
+        rows = con.execute(
+            "SELECT task_cat_id, COUNT(*) FROM tasks WHERE is_done=0 GROUP BY task_cat_id"
+        ).fetchall()
+    return dict(rows)
+
+
+def count_open_tasks() -> Dict[int, int]:
+    """
+    Open (not done) tasks per task process: {task_cat_id: count}.
+
+    One GROUP BY over the (task_cat_id, is_done) index, cached and kept up to date
+    by add_task / add_tasks / set_task_done, so usually no SQL runs at all.
+    Only the query is timed: cache hits are not recorded as queries.
+    """
+    global _open_tasks
+    version = versions.get("task_procs")
+    if _open_tasks is None or _open_tasks[0] != version:
+        _open_tasks = (version, _select_open_tasks())
+    return dict(_open_tasks[1])
+
+
+@timed_query
 def list_all_tasks_by_category(task_cat_id: int, include_done: bool = False) -> List[Tuple[int, str]]:
     """
     List tasks for a category. If include_done=False -> only not done.
@@ -270,6 +1249,7 @@ def list_all_tasks_by_category(task_cat_id: int, include_done: bool = False) ->
         return [(task_id, text, task_cat_id) for (task_id, text, task_cat_id) in cur.fetchall()]
 
 
+@timed_query
 def get_task(task_id: int) -> Optional[tuple[int, str, int]]:
     """
     Get one task by id.
@@ -286,6 +1266,7 @@ def get_task(task_id: int) -> Optional[tuple[int, str, int]]:
         return cur.fetchone()
 
 
+@timed_query
 def update_task(task_id: int, new_text: str) -> None:
     """
     Update task text.
@@ -295,17 +1276,110 @@ def update_task(task_id: int, new_text: str) -> None:
         raise ValueError("Task text is empty")
 
     with connect() as con:
-        con.execute("UPDATE tasks SET text=? WHERE id=?", (new_text, int(task_id)))
+        row = con.execute(
+            "UPDATE tasks SET text=? WHERE id=? RETURNING task_cat_id",
+            (new_text, int(task_id)),
+        ).fetchone()
         con.commit()
+    versions.bump("task", task_id)
+    if row:
+        versions.bump("task_proc", row[0])
 
 
+@timed_query
 def set_task_done(task_id: int, is_done: bool) -> None:
     """
     Set done status explicitly.
     """
+    done = 1 if is_done else 0
     with connect() as con:
-        con.execute(
-            "UPDATE tasks SET is_done=? WHERE id=?",
-            (1 if is_done else 0, int(task_id)),
+        # Only a real change returns a row: the open-task counts move by exactly one
+        row = con.execute(
+            "UPDATE tasks SET is_done=? WHERE id=? AND is_done!=? RETURNING task_cat_id",
+            (done, int(task_id), done),
+        ).fetchone()
+        con.commit()
+    versions.bump("task", task_id)
+    if row:
+        versions.bump("task_proc", row[0])
+        _adjust_open_tasks(row[0], -1 if done else 1)
+
+
+# ===== Recurring task templates =====
+
+@timed_query
+def add_task_template(user_id: int, task_cat_id: int, text: str, schedule: str, next_run: str) -> int:
+    """
+    Create a recurring task template. Returns its id.
+    """
+    text = text.strip()
+    if not text:
+        raise ValueError("Task text is empty")
+
+    with connect() as con:
+        cur = con.execute(
+            "INSERT INTO task_templates(user_id, task_cat_id, text, schedule, next_run) VALUES (?, ?, ?, ?, ?)",
+            (int(user_id), int(task_cat_id), text, schedule.strip(), next_run),
         )
         con.commit()
+    versions.bump("task_templates")
+    return int(cur.lastrowid)
+
+
+@timed_query
+def list_task_templates() -> List[Tuple[int, int, str, str, Optional[str]]]:
+    """
+    All templates: (id, task_cat_id, text, schedule, next_run), ordered by process and id.
+    """
+    with connect() as con:
+        return con.execute(
+            "SELECT id, task_cat_id, text, schedule, next_run FROM task_templates ORDER BY task_cat_id, id"
+        ).fetchall()
+
+
+@timed_query
+def delete_task_template(template_id: int) -> bool:
+    """
+    Delete a template (tasks it already created stay). Returns False if it did not exist.
+    """
+    with connect() as con:
+        cur = con.execute("DELETE FROM task_templates WHERE id=?", (int(template_id),))
+        con.commit()
+    versions.bump("task_templates")
+    return cur.rowcount > 0
+
+
+@timed_query
+def materialize_task_templates(fired: List[Tuple[int, int, str, Optional[str]]]) -> int:
+    """
+    Create the tasks of fired templates in one transaction.
+
+    `fired`: (template_id, task_cat_id, due, next_run). A task is inserted once per
+    (template_id, due) - running the same batch twice, or from two processes, creates
+    nothing new - and next_run of every template is moved forward.
+    Returns the number of created tasks.
+    """
+    if not fired:
+        return 0
+
+    with connect() as con:
+        cur = con.executemany(
+            """
+            INSERT OR IGNORE INTO tasks(user_id, text, task_cat_id, template_id, due)
+            SELECT user_id, text, task_cat_id, id, ?2 FROM task_templates WHERE id=?1
+            """,
+            [(int(template_id), due) for template_id, _, due, _ in fired],
+        )
+        created = cur.rowcount
+        con.executemany(
+            "UPDATE task_templates SET next_run=? WHERE id=?",
+            [(next_run, int(template_id)) for template_id, _, _, next_run in fired],
+        )
+        con.commit()
+
+    if created:
+        for task_cat_id in {task_cat_id for _, task_cat_id, _, _ in fired}:
+            versions.bump("task_proc", task_cat_id)
+        # Counts are not adjusted in place (ignored duplicates): the next read recounts
+        versions.bump("task_procs")
+    return created
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from app.storage import db
+
+logger = logging.getLogger(__name__)
+
+ConversationKey = Tuple[int | str, ...]
+# user id -> (JSON of every changed key, removed keys)
+UserPatches = Dict[int, Tuple[Dict[str, str], List[str]]]
+# (user patches, dropped users, conversation states, ended conversations): rows of one write
+Batch = Tuple[UserPatches, list, list, list]
+
+UPSERT_USER_SQL = (
+    "INSERT INTO persist_user_data(user_id, data) VALUES (?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET data=excluded.data"
+)
+DELETE_USER_SQL = "DELETE FROM persist_user_data WHERE user_id=?"
+UPSERT_CONVERSATION_SQL = (
+    "INSERT INTO persist_conversations(name, conv_key, state) VALUES (?, ?, ?) "
+    "ON CONFLICT(name, conv_key) DO UPDATE SET state=excluded.state"
+)
+DELETE_CONVERSATION_SQL = "DELETE FROM persist_conversations WHERE name=? AND conv_key=?"
+
+
+def init_persistence_tables() -> None:
+    """
+    Create tables for conversation states and user_data.
+    """
+    with db.connect() as con:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS persist_user_data (
+                user_id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL
+            )
+        """)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS persist_conversations (
+                name TEXT NOT NULL,
+                conv_key TEXT NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (name, conv_key)
+            )
+        """)
+        con.commit()
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Persist `context.user_data` and ConversationHandler states in the bot SQLite DB.
+
+    - PTB reports only changed entries, every `update_interval` seconds.
+      They are buffered and written in one transaction per run (write-behind), in a
+      thread with its own connection: the event loop waits neither for the write nor
+      for another worker's write lock. Batches are written in the order they were taken.
+    - user_data is loaded lazily: the first time PTB refreshes a user's data
+      (right before handling that user's update), not all users at startup.
+    - chat_data, bot_data and callback_data are not used by the bot and are not stored.
+    - With several workers, a user who talks to the bot in chats owned by different workers
+      has a user_data copy in each of them. A worker writes only the keys it changed,
+      merged into the stored row under the write lock, so no worker drops another one's keys.
+    """
+
+    def __init__(self, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded_users: Set[int] = set()
+        self._stored: Dict[int, Dict[str, str]] = {}   # user id -> JSON of each key as last read / written here
+        self._dirty_users: Dict[int, Optional[Dict[str, Any]]] = {}   # None = drop
+        self._dirty_conversations: Dict[Tuple[str, str], Optional[object]] = {}   # None = conversation ended
+        self._flush_scheduled = False
+        self._writing: Optional[asyncio.Future] = None   # last batch handed to a thread
+        init_persistence_tables()
+
+    # ---------- Write-behind ----------
+
+    def _schedule_flush(self) -> None:
+        """
+        PTB calls update_* for all changed entries in one go; write them
+        together once the current persistence run is done.
+        """
+        if self._flush_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            batch = self._take_pending()
+            if batch is not None:
+                self._write_batch(*batch)
+            return
+        self._flush_scheduled = True
+        loop.call_soon(self._start_write)
+
+    def _start_write(self) -> None:
+        self._flush_scheduled = False
+        batch = self._take_pending()
+        if batch is not None:
+            self._writing = asyncio.ensure_future(self._write_in_thread(self._writing, batch))
+
+    async def _write_in_thread(self, previous: Optional[asyncio.Future], batch: Batch) -> None:
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await asyncio.to_thread(self._write_batch, *batch)
+        except Exception:
+            logger.exception("Failed to write %d user_data / %d conversation changes",
+                             len(batch[0]) + len(batch[1]), len(batch[2]) + len(batch[3]))
+
+    async def _drain(self) -> None:
+        """
+        Write everything buffered and wait until the writes in flight are done.
+        """
+        self._start_write()
+        writing = self._writing
+        if writing is not None:
+            await asyncio.gather(writing, return_exceptions=True)
+            if self._writing is writing:
+                self._writing = None
+
+    def _take_pending(self) -> Optional[Batch]:
+        """
+        Serialise the buffered changes (on the event loop: user_data dicts are changed there).
+        """
+        users, self._dirty_users = self._dirty_users, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        if not users and not conversations:
+            return None
+
+        patches: UserPatches = {}
+        for user_id, data in users.items():
+            if data is None:
+                self._stored.pop(user_id, None)
+                continue
+            current = {key: json.dumps(value) for key, value in data.items()}
+            base = self._stored.get(user_id, {})
+            changed = {key: value for key, value in current.items() if base.get(key) != value}
+            removed = [key for key in base if key not in current]
+            self._stored[user_id] = current
+            if changed or removed:
+                patches[user_id] = (changed, removed)
+
+        return (
+            patches,
+            [(user_id,) for user_id, data in users.items() if data is None],
+            [(name, key, json.dumps(state)) for (name, key), state in conversations.items() if state is not None],
+            [(name, key) for (name, key), state in conversations.items() if state is None],
+        )
+
+    @staticmethod
+    def _write_batch(patches: UserPatches, dropped: list, conversations: list, ended: list) -> None:
+        """
+        One transaction: user_data patches are applied to the stored rows read under the write lock.
+        """
+        with db.connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            upserts = []
+            if patches:
+                stored = dict(con.execute(
+                    "SELECT user_id, data FROM persist_user_data WHERE user_id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(patches)),),
+                ))
+                for user_id, (changed, removed) in patches.items():
+                    data = json.loads(stored.get(user_id, "{}"))
+                    for key in removed:
+                        data.pop(key, None)
+                    data.update((key, json.loads(value)) for key, value in changed.items())
+                    upserts.append((user_id, json.dumps(data)))
+
+            for sql, rows in (
+                (UPSERT_USER_SQL, upserts),
+                (DELETE_USER_SQL, dropped),
+                (UPSERT_CONVERSATION_SQL, conversations),
+                (DELETE_CONVERSATION_SQL, ended),
+            ):
+                if rows:
+                    con.executemany(sql, rows)
+            con.commit()
+
+    # ---------- user_data ----------
+
+    async def get_user_data(self) -> Dict[int, Dict[str, Any]]:
+        # Loaded lazily in refresh_user_data()
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[str, Any]) -> None:
+        if user_id in self._loaded_users:
+            return
+        self._loaded_users.add(user_id)
+
+        with db.connect() as con:
+            row = con.execute("SELECT data FROM persist_user_data WHERE user_id=?", (int(user_id),)).fetchone()
+        if row:
+            stored = json.loads(row[0])
+            self._stored[user_id] = {key: json.dumps(value) for key, value in stored.items()}
+            # Keys set in memory before the first refresh win over the stored ones
+            for key, value in stored.items():
+                user_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id: int, data: Dict[str, Any]) -> None:
+        self._dirty_users[user_id] = data
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    # ---------- Conversations ----------
+
+    async def get_conversations(self, name: str) -> Dict[ConversationKey, object]:
+        await self._drain()
+        with db.connect() as con:
+            rows = con.execute(
+                "SELECT conv_key, state FROM persist_conversations WHERE name=?", (name,)
+            ).fetchall()
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        self._dirty_conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    # ---------- Not stored ----------
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """
+        Called by PTB on shutdown: write everything that is still buffered.
+        """
+        await self._drain()
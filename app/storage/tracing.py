@@ -0,0 +1,208 @@
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+from app.services.metrics import db_query_errors, db_query_seconds, registry
+
+# Opt-in: SQL_TRACE=1 traces every statement (slow-query log, statements per update)
+SQL_TRACE = os.getenv("SQL_TRACE", "0").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_MS", "100"))
+MAX_STATEMENTS_PER_UPDATE = int(os.getenv("SQL_MAX_STATEMENTS_PER_UPDATE", "20"))
+
+MAX_LOGGED_STATEMENTS = 200     # per update / per db call; the count goes on past it
+_SKIPPED_PREFIXES = ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA")
+_READ_PREFIXES = ("SELECT", "WITH")
+
+logger = logging.getLogger("app.storage.sql")
+
+statements_per_update = registry.histogram(
+    "bot_db_statements_per_update", "SQL statements run while handling one update (SQL_TRACE=1)",
+    ("handler",), (0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+full_scans = registry.counter(
+    "bot_db_full_scans_total", "Slow db calls whose query plan has a full table scan (SQL_TRACE=1)", ("query",),
+)
+
+
+class QueryLog:
+    """
+    SQL statements run inside a count_queries() block (BEGIN/COMMIT/PRAGMA are not counted).
+
+    SQLite reports every trigger program and trigger sub-statement with the SQL of the
+    statement that fired it, so a write repeated back to back is counted once.
+    The price: executemany() of identical rows counts once too. Reads are never merged.
+    """
+
+    __slots__ = ("count", "statements", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+        self.last: Optional[str] = None
+
+    def add(self, sql: str) -> None:
+        if sql == self.last and not sql.lstrip()[:6].upper().startswith(_READ_PREFIXES):
+            return
+        self.last = sql
+        self.count += 1
+        if len(self.statements) < MAX_LOGGED_STATEMENTS:
+            self.statements.append(sql)
+
+
+_update_log: ContextVar[Optional[QueryLog]] = ContextVar("sql_update_log", default=None)
+_call_log: ContextVar[Optional[QueryLog]] = ContextVar("sql_call_log", default=None)
+
+
+def _on_statement(sql: str) -> None:
+    if sql.startswith(_SKIPPED_PREFIXES):
+        return
+    for log in (_update_log.get(), _call_log.get()):
+        if log is not None:
+            log.add(sql)
+
+
+def install(con: sqlite3.Connection) -> None:
+    """
+    Called by db.connect(): trace statements of this connection if tracing is on
+    or a count_queries() block is active.
+    """
+    if SQL_TRACE or _update_log.get() is not None:
+        con.set_trace_callback(_on_statement)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """
+    Count SQL statements run inside the block, also without SQL_TRACE.
+
+        with count_queries() as log:
+            render_category(...)
+        assert log.count <= 2   # no N+1 queries
+    """
+    log = QueryLog()
+    token = _update_log.set(log)
+    try:
+        yield log
+    finally:
+        _update_log.reset(token)
+
+
+def check_update_statements(label: str, log: QueryLog) -> None:
+    """
+    Record statements of one handled update; warn when there are suspiciously many.
+    """
+    statements_per_update.observe(log.count, label)
+    if log.count > MAX_STATEMENTS_PER_UPDATE:
+        distinct = len(set(log.statements))
+        logger.warning(
+            "%s ran %d SQL statements (%d distinct), possible N+1 queries. First ones:\n  %s",
+            label, log.count, distinct, "\n  ".join(s[:200] for s in log.statements[:10]),
+        )
+
+
+# ---------- Slow-query log ----------
+
+def is_full_scan(detail: str) -> bool:
+    """
+    EXPLAIN QUERY PLAN detail of a full table scan ("SCAN products"),
+    as opposed to index scans / searches ("SCAN p USING INDEX ...", "SEARCH ...").
+    """
+    return detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail
+
+
+@lru_cache(maxsize=256)
+def explain_query_plan(sql: str) -> Tuple[str, ...]:
+    """
+    EXPLAIN QUERY PLAN details of an (expanded) statement, on a separate connection.
+    """
+    from app.storage import db
+
+    con = sqlite3.connect(db.DB_PATH)
+    try:
+        return tuple(row[3] for row in con.execute("EXPLAIN QUERY PLAN " + sql))
+    except sqlite3.Error as e:
+        return (f"plan unavailable: {e}",)
+    finally:
+        con.close()
+
+
+def log_slow_call(name: str, elapsed: float, log: QueryLog) -> None:
+    lines = [f"Slow db call {name}: {elapsed * 1000:.1f} ms, {log.count} statement(s)"]
+    has_scan = False
+    for sql in dict.fromkeys(log.statements):
+        plan = explain_query_plan(sql)
+        scan = any(is_full_scan(detail) for detail in plan)
+        has_scan = has_scan or scan
+        lines.append(("  [FULL SCAN] " if scan else "  ") + " ".join(sql.split())[:500])
+        lines.extend(f"      {detail}" for detail in plan)
+    if has_scan:
+        full_scans.inc(name)
+    logger.warning("\n".join(lines))
+
+
+# ---------- Decorator ----------
+
+def _finish(name: str, start: float, log: Optional[QueryLog]) -> None:
+    elapsed = time.perf_counter() - start
+    db_query_seconds.observe(elapsed, name)
+    if log is not None and elapsed * 1000 >= SLOW_QUERY_MS:
+        log_slow_call(name, elapsed, log)
+
+
+def timed_query(func):
+    """
+    Wrap a db function: latency/error metrics, and with SQL_TRACE=1 the slow-query log
+    with the statements it ran (whole iteration for generators).
+    """
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            log = QueryLog() if SQL_TRACE else None
+            gen = func(*args, **kwargs)
+            try:
+                while True:
+                    # The caller's context may differ between items: set/reset around each step
+                    token = _call_log.set(log) if log is not None else None
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        return
+                    finally:
+                        if token is not None:
+                            _call_log.reset(token)
+                    yield item
+            except Exception as e:
+                db_query_errors.inc(name, type(e).__name__)
+                raise
+            finally:
+                gen.close()
+                _finish(name, start, log)
+
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        log = QueryLog() if SQL_TRACE else None
+        token = _call_log.set(log) if log is not None else None
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            db_query_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            if token is not None:
+                _call_log.reset(token)
+            _finish(name, start, log)
+
+    return wrapper
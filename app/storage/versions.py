@@ -0,0 +1,59 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Scopes used by the storage layer:
+# - cats       categories list (entity_id=None)
+# - cat        single category screen (name + products in it)
+# - prod       single product screen
+# - task_proc  tasks list of one task process
+# - task_procs task process selector with open-task counts (entity_id=None)
+# - task       single task screen
+# - locations  storage locations (entity_id=None), part of every product screen
+# - catalog    derived (entity_id=None): bumped together with cats / cat / prod / locations,
+#              i.e. on any change of the catalogue or its stock
+VersionKey = Tuple[str, Optional[int]]
+
+_versions: Dict[VersionKey, int] = {}
+_listeners: List[Callable[[str, Optional[int]], None]] = []
+_write_listeners: List[Callable[[str, Optional[int]], None]] = []
+
+CATALOG_SCOPES = frozenset(("cats", "cat", "prod", "locations"))
+CATALOG_KEY: VersionKey = ("catalog", None)
+
+
+def get(scope: str, entity_id: int | None = None) -> int:
+    """
+    Current data version of an entity (0 if it was never written in this process).
+    """
+    return _versions.get((scope, entity_id), 0)
+
+
+def bump(scope: str, entity_id: int | None = None, remote: bool = False) -> None:
+    """
+    Mark entity data as changed. Called by storage functions after a successful write,
+    and with remote=True for writes made by another worker process (app.workers).
+    """
+    key = (scope, None if entity_id is None else int(entity_id))
+    _versions[key] = _versions.get(key, 0) + 1
+    if key[0] in CATALOG_SCOPES:
+        _versions[CATALOG_KEY] = _versions.get(CATALOG_KEY, 0) + 1
+    for listener in _listeners:
+        listener(*key)
+    if not remote:
+        for listener in _write_listeners:
+            listener(*key)
+
+
+def subscribe(listener: Callable[[str, Optional[int]], None]) -> None:
+    """
+    Call `listener(scope, entity_id)` after every bump.
+    Listeners must be cheap and must not raise: they run inside storage calls.
+    """
+    _listeners.append(listener)
+
+
+def subscribe_writes(listener: Callable[[str, Optional[int]], None]) -> None:
+    """
+    Like subscribe(), but only for writes made by this process (remote bumps are skipped),
+    so a worker can broadcast its own writes without echoing the ones it received.
+    """
+    _write_listeners.append(listener)
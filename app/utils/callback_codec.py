@@ -0,0 +1,132 @@
+import base64
+import binascii
+import struct
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# Encoded callback_data: PREFIX + unpadded base64url(version byte, route id byte, packed fields)
+# Legacy buttons ("scope:action[:id]") never start with PREFIX and are still parsed
+# by app.handlers.routing, so keyboards sent before the switch keep working.
+CODEC_VERSION = 1
+PREFIX = "~"
+MAX_CALLBACK_BYTES = 64  # Telegram limit for callback_data
+
+# Route id -> (route, struct format of its fields). Ids are part of the wire format:
+# append new routes at the end, never renumber or reuse an id.
+# Field formats: I - entity id (uint32), H - small counter/offset, B - enum/flag.
+ROUTES: Dict[int, Tuple[str, str]] = {
+    1: ("nav:cats", ""),
+    2: ("nav:task_proc", ""),
+    3: ("cat:add", ""),
+    4: ("cat:open", "I"),
+    5: ("cat:actions", "I"),
+    6: ("cat:edit", "I"),
+    7: ("cat:del", "I"),
+    8: ("cat:del_yes", "I"),
+    9: ("cat:cancel", ""),
+    10: ("prod:add", "I"),
+    11: ("prod:open", "I"),
+    12: ("prod:edit", "I"),
+    13: ("prod:del", "I"),
+    14: ("prod:del_yes", "I"),
+    15: ("prod:qty", "I"),
+    16: ("prod:limit", "I"),
+    17: ("prod:add_limit_skip", ""),
+    18: ("prod:cancel", ""),
+    19: ("task_proc:open", "I"),
+    20: ("task_proc:add", "I"),
+    21: ("task_proc:cancel", ""),
+    22: ("task:open", "I"),
+    23: ("task:edit", "I"),
+    24: ("task:done", "I"),
+    25: ("reorder:csv", ""),
+    26: ("reorder:xlsx", ""),
+    27: ("cat:add_sub", "I"),
+    28: ("cat:summary", "I"),
+    29: ("stock:qty", "II"),       # product id, location id
+    30: ("stock:limit", "II"),     # product id, location id
+    31: ("prod:price", "I"),
+    32: ("prod:history", "I"),
+    33: ("prod:pack", "I"),
+}
+
+_HEADER = ">BB"
+_BY_ROUTE: Dict[str, Tuple[int, struct.Struct]] = {
+    route: (route_id, struct.Struct(_HEADER + fields)) for route_id, (route, fields) in ROUTES.items()
+}
+
+_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+# base64url -> standard base64 for a2b_base64; "+" and "/" are not base64url, they become
+# "-" and "_" and fail strict decoding
+_FROM_URLSAFE = bytes.maketrans(b"-_+/", b"+/-_")
+_PADDING = (b"", b"===", b"==", b"=")   # by length % 4 of the unpadded data
+
+# scope, action, struct of the route fields, exact length of the encoded data,
+# allowed last characters (None: no unused bits)
+DecodeEntry = Tuple[str, str, struct.Struct, int, Optional[FrozenSet[str]]]
+
+
+def _decode_entry(route: str, fields: str) -> DecodeEntry:
+    """
+    The last character carries (-8 * size) % 6 unused bits, encode_callback() leaves them zero.
+    """
+    scope, action = route.split(":")
+    size = struct.calcsize(_HEADER + fields)
+    unused_bits = (-8 * size) % 6
+    last_chars = frozenset(_ALPHABET[::1 << unused_bits]) if unused_bits else None
+    return scope, action, struct.Struct(">" + fields), len(PREFIX) + (8 * size + 5) // 6, last_chars
+
+
+# Indexed by route id (the second header byte)
+_DECODE: List[Optional[DecodeEntry]] = [None] * 256
+for _route_id, (_route, _fields) in ROUTES.items():
+    _DECODE[_route_id] = _decode_entry(_route, _fields)
+
+
+
+@lru_cache(maxsize=8192)
+def encode_callback(route: str, *values: int) -> str:
+    """
+    Encode "scope:action" + integer fields into compact callback_data.
+
+    Raises:
+        ValueError: unknown route, wrong number/range of fields
+            or result longer than Telegram's 64-byte limit.
+    """
+    try:
+        route_id, packer = _BY_ROUTE[route]
+    except KeyError:
+        raise ValueError(f"Unknown callback route: {route}") from None
+
+    try:
+        raw = packer.pack(CODEC_VERSION, route_id, *values)
+    except struct.error as e:
+        raise ValueError(f"Bad fields for route {route}: {e}") from None
+
+    data = PREFIX + base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+    if len(data) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"Callback data too long for route {route}")
+    return data
+
+
+def decode_callback(data: str) -> Optional[Tuple[str, str, Tuple[int, ...]]]:
+    """
+    Decode callback_data produced by encode_callback().
+    Returns (scope, action, fields) or None for anything malformed / of another version:
+    only the exact string encode_callback() produces for the decoded fields is accepted
+    (strict base64 without padding, exact length, zero unused bits in the last character).
+    """
+    if not data.startswith(PREFIX):
+        return None
+    try:
+        encoded = data.encode("ascii")[len(PREFIX):]
+        b64 = encoded.translate(_FROM_URLSAFE) + _PADDING[len(encoded) & 3]
+        raw = binascii.a2b_base64(b64, strict_mode=True)
+        scope, action, fields, length, last_chars = _DECODE[raw[1]]
+    except (binascii.Error, UnicodeEncodeError, IndexError, TypeError):
+        # IndexError: fewer than 2 bytes, TypeError: unknown route id
+        return None
+    if (len(data) != length or len(raw) != 2 + fields.size or raw[0] != CODEC_VERSION
+            or (last_chars is not None and data[-1] not in last_chars)):
+        return None
+    return scope, action, fields.unpack_from(raw, 2)
@@ -1,6 +1,8 @@
 import re
+from typing import Tuple
 
 NUMBER_RE = re.compile(r"^\d+([.,]\d+)?$")
+QTY_CHANGE_RE = re.compile(r"^([+\-=]?)\s*(\d+(?:[.,]\d+)?)$")
 
 
 def parse_qty(text: str) -> float:
@@ -18,6 +20,39 @@ def parse_qty(text: str) -> float:
     return qty
 
 
+def parse_qty_change(text: str) -> Tuple[str, float]:
+    """
+    Parse quantity input of the edit-quantity step:
+    "10" or "=10" sets the quantity, "+5" adds, "-2.5" subtracts.
+    Returns ("=", qty) or ("+", signed delta).
+    Raises ValueError if invalid.
+    """
+    raw = (text or "").strip().replace("−", "-").replace(",", ".")
+    m = QTY_CHANGE_RE.match(raw)
+    if not m:
+        raise ValueError("Invalid quantity change format")
+    sign, number = m.group(1), float(m.group(2))
+    if sign == "+":
+        return "+", number
+    if sign == "-":
+        return "+", -number
+    return "=", number
+
+
+def parse_price(text: str) -> float | None:
+    """
+    Parse a unit price (0 is a valid price).
+    Returns None if user wants to remove the price ("-").
+    Raises ValueError for invalid input.
+    """
+    raw = (text or "").strip()
+    if raw == "-":
+        return None
+    if not NUMBER_RE.match(raw):
+        raise ValueError("Invalid number format")
+    return float(raw.replace(",", "."))
+
+
 def parse_limit(text: str) -> float | None:
     """
     Parse limit quantity.
@@ -0,0 +1,39 @@
+from typing import Iterable, Iterator
+
+TELEGRAM_TEXT_LIMIT = 4096
+
+
+def format_money(value: float) -> str:
+    """
+    12345.5 -> "12 345.50"
+    """
+    return f"{value:,.2f}".replace(",", " ")
+
+
+def split_message(lines: Iterable[str], limit: int = TELEGRAM_TEXT_LIMIT) -> Iterator[str]:
+    """
+    Join lines with "\\n" into chunks that fit into one Telegram message.
+    Splits on line boundaries; a single line longer than `limit` is cut into pieces.
+    """
+    chunk: list[str] = []
+    size = 0
+
+    for line in lines:
+        while len(line) > limit:
+            if chunk:
+                yield "\n".join(chunk)
+                chunk, size = [], 0
+            yield line[:limit]
+            line = line[limit:]
+
+        extra = len(line) + (1 if chunk else 0)
+        if chunk and size + extra > limit:
+            yield "\n".join(chunk)
+            chunk, size = [], 0
+            extra = len(line)
+
+        chunk.append(line)
+        size += extra
+
+    if chunk:
+        yield "\n".join(chunk)
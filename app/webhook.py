@@ -0,0 +1,202 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from typing import List, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+try:
+    from aiohttp import web
+except ImportError:  # optional dependency, only needed for BOT_MODE=webhook
+    web = None
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+HEALTH_PATH = "/healthz"
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def webhook_available() -> bool:
+    return web is not None
+
+
+class WebhookServer:
+    """
+    Embedded aiohttp server that receives updates from Telegram.
+
+    - POST <path>: validates the secret token header, hands the update over with
+      deliver() and answers 200 right away (handling runs in the background).
+    - GET /healthz: 200 while the bot is running, 503 otherwise.
+
+    Subclasses decide where updates go: AppWebhookServer feeds one Application,
+    app.workers.PartitionedWebhookServer routes them to worker processes.
+    """
+
+    def __init__(self, path: str, secret: str):
+        if web is None:
+            raise RuntimeError("Webhook mode requires aiohttp: pip install aiohttp")
+        self.path = path
+        self._secret = secret.encode()
+        self.accepting = False
+        self.received = 0
+        self.rejected = 0
+
+        self.web_app = web.Application(client_max_size=MAX_BODY_BYTES)
+        self.web_app.router.add_post(path, self.handle_update)
+        self.web_app.router.add_get(HEALTH_PATH, self.handle_health)
+
+    async def handle_update(self, request: "web.Request") -> "web.Response":
+        token = request.headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(token, self._secret):
+            self.rejected += 1
+            return web.Response(status=403)
+
+        if not self.accepting:
+            # Shutting down: Telegram retries the update later
+            return web.Response(status=503)
+
+        try:
+            data = await request.json(loads=json.loads)
+            update = Update.de_json(data, self.bot)
+        except (ValueError, TypeError, KeyError):
+            return web.Response(status=400)
+
+        self.received += 1
+        await self.deliver(update, data)
+        return web.Response()
+
+    async def handle_health(self, request: "web.Request") -> "web.Response":
+        healthy = self.accepting and self.healthy()
+        return web.json_response(
+            {
+                "status": "ok" if healthy else "stopping",
+                "pending_updates": self.pending(),
+                "received": self.received,
+                "rejected": self.rejected,
+            },
+            status=200 if healthy else 503,
+        )
+
+    @property
+    def bot(self):
+        """
+        Bot the received updates are bound to (None: plain data, e.g. for another process).
+        """
+        return None
+
+    async def deliver(self, update: Update, data: dict) -> None:
+        raise NotImplementedError
+
+    def healthy(self) -> bool:
+        return True
+
+    def pending(self) -> int:
+        return 0
+
+
+class AppWebhookServer(WebhookServer):
+    """
+    Webhook server of a single-process bot: updates go straight into app.update_queue.
+    """
+
+    def __init__(self, app: Application, path: str, secret: str):
+        super().__init__(path, secret)
+        self.app = app
+
+    @property
+    def bot(self):
+        return self.app.bot
+
+    async def deliver(self, update: Update, data: dict) -> None:
+        await self.app.update_queue.put(update)
+
+    def healthy(self) -> bool:
+        return self.app.running
+
+    def pending(self) -> int:
+        return self.app.update_queue.qsize()
+
+
+def add_stop_signals(stop_event: asyncio.Event) -> List[int]:
+    """
+    Set `stop_event` on SIGINT/SIGTERM. Returns the signals to remove_stop_signals() later.
+    """
+    loop = asyncio.get_running_loop()
+    signals = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            signals.append(sig)
+        except (NotImplementedError, RuntimeError):  # Windows / not the main thread
+            pass
+    return signals
+
+
+def remove_stop_signals(signals: List[int]) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in signals:
+        loop.remove_signal_handler(sig)
+
+
+async def serve_webhook(
+    app: Application,
+    url: str,
+    path: str,
+    secret: str,
+    listen: str,
+    port: int,
+    stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Run the bot in webhook mode until SIGINT/SIGTERM (or until `stop_event` is set).
+
+    Graceful shutdown: stop accepting updates (Telegram keeps and re-sends them),
+    finish the updates already queued, then shut the application down.
+    The webhook stays registered, so nothing is lost during a restart.
+    """
+    server = AppWebhookServer(app, path, secret)
+    stop_event = stop_event or asyncio.Event()
+    signals = add_stop_signals(stop_event)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+
+    runner = web.AppRunner(server.web_app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, listen, port)
+    try:
+        await app.start()
+        await site.start()
+        server.accepting = True
+
+        await app.bot.set_webhook(
+            url=url.rstrip("/") + path,
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        logger.info("Webhook server listening on %s:%s%s", listen, port, path)
+
+        await stop_event.wait()
+    finally:
+        server.accepting = False
+        await runner.cleanup()
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        remove_stop_signals(signals)
+
+
+def run_webhook(app: Application, url: str, path: str, secret: str, listen: str, port: int) -> None:
+    """
+    Blocking entrypoint, the webhook counterpart of app.run_polling().
+    """
+    asyncio.run(serve_webhook(app, url, path, secret, listen, port))
@@ -0,0 +1,326 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from typing import List, Optional
+
+from telegram import Bot, Update
+from telegram.error import NetworkError, RetryAfter, TelegramError
+
+from app.config import BOT_API_BASE_URL
+from app.services.update_processor import update_chat_key
+from app.storage import versions
+from app.webhook import WebhookServer, add_stop_signals, remove_stop_signals, web
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30           # getUpdates long polling, seconds
+POLL_ERROR_DELAY = 3.0      # pause after a network error of getUpdates
+RESTART_DELAY = 1.0         # how often dead workers are looked for (and restarted)
+STOP_TIMEOUT = 30.0         # time the workers get to finish queued updates on shutdown
+INBOX_POLL = 1.0            # how often a worker checks that the supervisor is still alive
+
+# Messages in a worker inbox:
+#   ("update", <update dict>)        handle the update
+#   ("bump", scope, entity_id)       another worker wrote data: versions.bump(..., remote=True)
+#   ("stop",)                        finish queued updates and exit
+UPDATE = "update"
+BUMP = "bump"
+STOP = "stop"
+
+
+def partition(update: Update, workers: int) -> int:
+    """
+    Index of the worker that owns the update's chat (chat-less updates: by user, neither: worker 0).
+    All updates of one chat go to one worker, so per-chat ordering and conversation state stay local.
+    """
+    key = update_chat_key(update)
+    if key is None:
+        return 0
+    if isinstance(key, tuple):  # ("user", user_id)
+        key = key[1]
+    return int(key) % workers
+
+
+# ---------- Worker process ----------
+
+def _worker_main(index: int, inboxes: list) -> None:
+    # Ctrl+C / SIGTERM of the process group: the supervisor sends "stop" and waits for us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_run_worker(index, inboxes))
+
+
+def _read_inbox(inbox) -> tuple:
+    """
+    Blocking read (runs in an executor thread); ("stop",) if the supervisor died.
+    """
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            return inbox.get(timeout=INBOX_POLL)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                logger.error("Supervisor is gone, stopping")
+                return (STOP,)
+
+
+async def _run_worker(index: int, inboxes: list) -> None:
+    # Imported here: only worker processes build the application and its handlers
+    from app.config import get_bot_token
+    from app.main import build_application
+
+    inbox = inboxes[index]
+    peers = [q for i, q in enumerate(inboxes) if i != index]
+
+    def broadcast(scope: str, entity_id: Optional[int]) -> None:
+        # Runs inside storage calls: Queue.put only hands the message to a feeder thread
+        for peer in peers:
+            peer.put((BUMP, scope, entity_id))
+
+    versions.subscribe_writes(broadcast)
+
+    app = build_application(get_bot_token())
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    logger.info("Worker %d started (pid %d)", index, os.getpid())
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            message = await loop.run_in_executor(None, _read_inbox, inbox)
+            kind = message[0]
+            if kind == UPDATE:
+                await app.update_queue.put(Update.de_json(message[1], app.bot))
+            elif kind == BUMP:
+                versions.bump(message[1], message[2], remote=True)
+            elif kind == STOP:
+                break
+    finally:
+        # stop() waits for the updates already in update_queue
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        logger.info("Worker %d stopped", index)
+
+
+# ---------- Supervisor ----------
+
+class Supervisor:
+    """
+    Runs N worker processes, each with its own Application and an inbox queue,
+    routes updates to them by chat and restarts workers that died.
+
+    Workers share the SQLite database (WAL mode) and broadcast their writes to each
+    other as version bumps, so screen caches and live screens of every process stay fresh.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # spawn: workers must not inherit the supervisor's event loop, sockets and threads
+        self._ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [self._ctx.Queue() for _ in range(workers)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.restarts = 0
+        self.dispatched = 0
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        # Read by app.config in the child (metrics port offset)
+        os.environ["WORKER_INDEX"] = str(index)
+        try:
+            process = self._ctx.Process(
+                target=_worker_main, args=(index, self.inboxes), name=f"bot-worker-{index}",
+            )
+            process.start()
+        finally:
+            os.environ.pop("WORKER_INDEX", None)
+        self.processes[index] = process
+
+    def dispatch(self, update: Update, data: dict) -> None:
+        """
+        Send an update (its JSON dict) to the worker that owns its chat.
+        """
+        self.inboxes[partition(update, self.workers)].put((UPDATE, data))
+        self.dispatched += 1
+
+    def alive(self) -> bool:
+        return all(process is not None and process.is_alive() for process in self.processes)
+
+    def pending(self) -> int:
+        try:
+            return sum(inbox.qsize() for inbox in self.inboxes)
+        except NotImplementedError:  # macOS
+            return 0
+
+    async def watch(self) -> None:
+        """
+        Restart workers that exited. Updates waiting in their inbox are kept;
+        the ones the worker had already taken are lost (Telegram will not re-send them).
+        """
+        while True:
+            await asyncio.sleep(RESTART_DELAY)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error("Worker %d exited with code %s, restarting", index, process.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    async def stop(self) -> None:
+        """
+        Ask every worker to finish its queued updates and exit; kill the ones that do not.
+        """
+        for inbox in self.inboxes:
+            inbox.put((STOP,))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STOP_TIMEOUT
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, max(0.0, deadline - loop.time()))
+            if process.is_alive():
+                logger.warning("Worker %d did not stop in time, terminating", index)
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+
+
+class PartitionedWebhookServer(WebhookServer):
+    """
+    Webhook front of the supervisor: updates are routed to the worker processes.
+    """
+
+    def __init__(self, supervisor: Supervisor, path: str, secret: str):
+        super().__init__(path, secret)
+        self.supervisor = supervisor
+
+    async def deliver(self, update: Update, data: dict) -> None:
+        self.supervisor.dispatch(update, data)
+
+    def healthy(self) -> bool:
+        return self.supervisor.alive()
+
+    def pending(self) -> int:
+        return self.supervisor.pending()
+
+
+class PollingDistributor:
+    """
+    getUpdates loop of the supervisor, the polling counterpart of PartitionedWebhookServer.
+    """
+
+    def __init__(self, bot: Bot, supervisor: Supervisor):
+        self.bot = bot
+        self.supervisor = supervisor
+        self.offset: Optional[int] = None
+
+    async def run(self) -> None:
+        await self.bot.delete_webhook()
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=self.offset, timeout=POLL_TIMEOUT, allowed_updates=Update.ALL_TYPES,
+                )
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if hasattr(retry_after, "total_seconds"):
+                    retry_after = retry_after.total_seconds()
+                await asyncio.sleep(float(retry_after))
+                continue
+            except NetworkError:
+                logger.warning("getUpdates failed, retrying in %.0f s", POLL_ERROR_DELAY, exc_info=True)
+                await asyncio.sleep(POLL_ERROR_DELAY)
+                continue
+
+            for update in updates:
+                self.supervisor.dispatch(update, update.to_dict())
+                self.offset = update.update_id + 1
+
+    async def confirm(self) -> None:
+        """
+        Tell Telegram the dispatched updates were received, so they are not sent again after a restart.
+        """
+        if self.offset is not None:
+            await self.bot.get_updates(offset=self.offset, timeout=0, limit=1)
+
+
+async def serve_workers(
+    token: str,
+    workers: int,
+    mode: str,
+    url: str,
+    path: str,
+    secret: str,
+    listen: str,
+    port: int,
+    stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Run the supervisor with `workers` processes until SIGINT/SIGTERM (or until `stop_event` is set).
+    Updates come from a webhook (mode="webhook") or from getUpdates polling.
+    """
+    supervisor = Supervisor(workers)
+    supervisor.start()
+    stop_event = stop_event or asyncio.Event()
+    signals = add_stop_signals(stop_event)
+    watcher = asyncio.create_task(supervisor.watch())
+
+    bot = Bot(token, base_url=BOT_API_BASE_URL) if BOT_API_BASE_URL else Bot(token)
+    server: Optional[PartitionedWebhookServer] = None
+    runner = None
+    distributor: Optional[PollingDistributor] = None
+    polling: Optional[asyncio.Task] = None
+    try:
+        await bot.initialize()
+        if mode == "webhook":
+            server = PartitionedWebhookServer(supervisor, path, secret)
+            runner = web.AppRunner(server.web_app, handle_signals=False)
+            await runner.setup()
+            await web.TCPSite(runner, listen, port).start()
+            server.accepting = True
+            await bot.set_webhook(url=url.rstrip("/") + path, secret_token=secret, allowed_updates=Update.ALL_TYPES)
+            logger.info("Webhook server listening on %s:%s%s, %d workers", listen, port, path, workers)
+        else:
+            distributor = PollingDistributor(bot, supervisor)
+            polling = asyncio.create_task(distributor.run())
+            logger.info("Polling with %d workers", workers)
+
+        waiter = asyncio.create_task(stop_event.wait())
+        await asyncio.wait({waiter, polling} if polling else {waiter}, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if polling is not None and polling.done():
+            polling.result()  # the distributor crashed: raise its error
+    finally:
+        if server is not None:
+            server.accepting = False
+        if runner is not None:
+            await runner.cleanup()
+        if polling is not None:
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+            try:
+                await distributor.confirm()
+            except TelegramError:
+                logger.warning("Could not confirm the last polled updates", exc_info=True)
+        watcher.cancel()
+        await supervisor.stop()
+        await bot.shutdown()
+        remove_stop_signals(signals)
+
+
+def run_workers(
+    token: str, workers: int, mode: str, url: str, path: str, secret: str, listen: str, port: int
+) -> None:
+    """
+    Blocking entrypoint of the multi-process mode (WORKERS > 1).
+    """
+    asyncio.run(serve_workers(token, workers, mode, url, path, secret, listen, port))
@@ -0,0 +1,57 @@
+"""
+Compact callback_data codec: encode/parse timing against the legacy
+f-string / split(":") format. Parsing is never cached, every update parses its
+button data once; encode_callback is lru-cached for keyboards that re-render the
+same buttons, so encode is timed both cold and cached.
+
+The round-trip / malformed input fuzz lives in tests/test_callback_codec.py.
+
+Run:
+    python -m benchmarks.bench_callback_codec
+"""
+import random
+import time
+from functools import partial
+
+from app.handlers.routing import parse_callback
+from app.utils.callback_codec import encode_callback
+
+BENCH_ROUNDS = 200_000
+REPEATS = 5
+
+
+def _best(fn, items) -> float:
+    """
+    Best of REPEATS passes, ns per item.
+    """
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e9
+
+
+def bench(rounds: int = BENCH_ROUNDS) -> None:
+    rnd = random.Random(2)
+    ids = [rnd.randint(1, 100_000) for _ in range(rounds)]
+
+    legacy = [f"prod:del_yes:{i}" for i in ids]
+    compact = [encode_callback("prod:del_yes", i) for i in ids]
+
+    legacy_encode = _best(lambda i: f"prod:del_yes:{i}", ids)
+    legacy_parse = _best(parse_callback, legacy)
+    compact_parse = _best(parse_callback, compact)
+
+    compact_encode = _best(partial(encode_callback.__wrapped__, "prod:del_yes"), ids)
+    hot = ids[:1000]
+    compact_encode_cached = _best(lambda i: encode_callback("prod:del_yes", i), hot * (rounds // len(hot)))
+
+    print(f"legacy  encode {legacy_encode:7.0f} ns  parse {legacy_parse:7.0f} ns  size {len(legacy[0])} B")
+    print(f"compact encode {compact_encode:7.0f} ns  parse {compact_parse:7.0f} ns  size {len(compact[0])} B")
+    print(f"compact encode, cached {compact_encode_cached:7.0f} ns")
+
+
+if __name__ == "__main__":
+    bench()
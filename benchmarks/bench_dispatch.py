@@ -0,0 +1,69 @@
+"""
+Callback dispatch overhead per update as the number of routes grows.
+
+Compares:
+- regex: every route is a compiled regex checked in order (how PTB matches
+  ConversationHandler entry points with string patterns), then split(":")
+- router: app.handlers.routing.CallbackRouter (one parse + one dict lookup)
+
+Run:
+    python -m benchmarks.bench_dispatch
+"""
+import random
+import re
+import time
+
+from app.handlers.routing import CallbackRouter
+
+UPDATES = 50_000
+ROUTE_COUNTS = (10, 50, 200, 1000)
+
+
+async def _noop(q, context, cb):
+    return None
+
+
+def _routes(n: int):
+    return [(f"s{i % 25}", f"a{i}") for i in range(n)]
+
+
+def _updates(routes, count: int):
+    rnd = random.Random(42)
+    return [f"{scope}:{action}:{rnd.randint(1, 200)}" for scope, action in (rnd.choice(routes) for _ in range(count))]
+
+
+def bench_regex(routes, updates) -> float:
+    patterns = [(re.compile(rf"^{scope}:{action}:\d+$"), (scope, action)) for scope, action in routes]
+    start = time.perf_counter()
+    for data in updates:
+        for pattern, _ in patterns:
+            if pattern.match(data):
+                scope, action, raw_id = data.split(":")
+                int(raw_id)
+                break
+    return time.perf_counter() - start
+
+
+def bench_router(routes, updates) -> float:
+    router = CallbackRouter()
+    for scope, action in routes:
+        router.route(f"{scope}:{action}")(_noop)
+
+    start = time.perf_counter()
+    for data in updates:
+        router.resolve(data)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'routes':>7} {'regex us/upd':>13} {'router us/upd':>14}")
+    for n in ROUTE_COUNTS:
+        routes = _routes(n)
+        updates = _updates(routes, UPDATES)
+        regex = bench_regex(routes, updates) / UPDATES * 1e6
+        router = bench_router(routes, updates) / UPDATES * 1e6
+        print(f"{n:>7} {regex:>13.2f} {router:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
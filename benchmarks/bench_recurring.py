@@ -0,0 +1,97 @@
+"""
+Recurring task scheduler (app.services.recurring) with thousands of templates.
+
+A synthetic clock walks through a week in steps; every step runs one scheduler
+wake-up (run_due). The script times loading the heap and the wake-ups.
+Occurrence counts and idempotency are covered by tests/test_recurring.py.
+
+Run:
+    python -m benchmarks.bench_recurring
+    python -m benchmarks.bench_recurring --templates 20000 --step-minutes 30
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Must be set before app.storage.db is imported (it creates the DB directory on import)
+_TMP = tempfile.mkdtemp(prefix="bench-recurring-")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP, "recurring.db"))
+
+from app.services.recurring import RecurringTasks, format_time, parse_schedule  # noqa: E402
+from app.storage import db  # noqa: E402
+
+START = datetime(2026, 1, 5, 0, 0)     # a Monday
+DAYS = 7
+
+
+def random_schedule(rnd: random.Random) -> str:
+    kind = rnd.random()
+    if kind < 0.5:
+        return f"daily {rnd.randint(0, 23):02d}:{rnd.choice((0, 15, 30, 45)):02d}"
+    if kind < 0.8:
+        days = ",".join(rnd.sample(["mon", "tue", "wed", "thu", "fri", "sat", "sun"], rnd.randint(1, 3)))
+        return f"weekly {days} {rnd.randint(6, 20):02d}:00"
+    if kind < 0.9:
+        return f"cron 0 */{rnd.choice((6, 8, 12))} * * *"
+    return "cron 30 8 * * 1-5"
+
+
+def seed(templates: int, seed_value: int) -> None:
+    """
+    Bulk-insert templates.
+    """
+    rnd = random.Random(seed_value)
+    rows = []
+    for n in range(templates):
+        schedule_text = random_schedule(rnd)
+        next_run = parse_schedule(schedule_text).next_after(START)
+        rows.append((1, rnd.randint(1, 3), f"Шаблон {n}", schedule_text, format_time(next_run)))
+
+    con = sqlite3.connect(db.DB_PATH)
+    con.executemany(
+        "INSERT INTO task_templates(user_id, task_cat_id, text, schedule, next_run) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    con.commit()
+    con.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", type=int, default=5000)
+    parser.add_argument("--step-minutes", type=int, default=60, help="simulated time between wake-ups")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    db.init_db()
+    start = time.perf_counter()
+    seed(args.templates, args.seed)
+    print(f"{args.templates} templates seeded in {time.perf_counter() - start:.2f} s")
+
+    scheduler = RecurringTasks()
+    start = time.perf_counter()
+    scheduler.load()
+    print(f"heap loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    durations, created = [], 0
+    now, end = START, START + timedelta(days=DAYS)
+    step = timedelta(minutes=args.step_minutes)
+    while now < end:
+        now += step
+        t0 = time.perf_counter()
+        created += scheduler.run_due(now)
+        durations.append((time.perf_counter() - t0) * 1000)
+
+    durations.sort()
+    print(f"{len(durations)} wake-ups: p50 {statistics.median(durations):.2f} ms  "
+          f"p95 {durations[int(len(durations) * 0.95)]:.2f} ms  max {durations[-1]:.2f} ms")
+    print(f"created {created} tasks")
+
+
+if __name__ == "__main__":
+    main()
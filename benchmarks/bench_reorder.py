@@ -0,0 +1,130 @@
+"""
+Order suggestions (app.services.reorder) for the whole catalogue.
+
+Builds a synthetic DB of N products (default 100 000) with limits, pack sizes and
+REORDER_CONSUMPTION_DAYS of daily consumption rollups for a part of them, then times:
+- db.list_reorder_inputs: the one query loading every product with its consumption
+- the vectorised NumPy pass and the row-by-row fallback over the same rows
+
+and checks that both give the same suggestions. Exits with status 1 if they differ,
+or if query + NumPy pass take longer than --budget seconds.
+
+Run:
+    python -m benchmarks.bench_reorder
+    python -m benchmarks.bench_reorder --products 1000000 --budget 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# Must be set before app.storage.db is imported (it creates the DB directory on import)
+_TMP = tempfile.mkdtemp(prefix="bench-reorder-")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP, "reorder.db"))
+
+from app.config import REORDER_CONSUMPTION_DAYS  # noqa: E402
+from app.services.reorder import consumption_window, numpy_available, suggest_order_quantities  # noqa: E402
+from app.storage import db  # noqa: E402
+
+BATCH = 50_000
+RUNS = 5
+
+
+def seed(products: int, consuming: float, seed_value: int) -> int:
+    """
+    Bulk-insert products and their daily rollups; returns the number of rollup rows.
+    """
+    rnd = random.Random(seed_value)
+    today = int(time.time()) // 86400 * 86400
+    con = sqlite3.connect(db.DB_PATH)
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("INSERT INTO categories(id, name) VALUES (1, 'Категорія')")
+
+    def product_rows(start: int, stop: int):
+        for pid in range(start, stop):
+            yield (pid, 1, f"Продукт {pid}", round(rnd.uniform(0, 200), 1),
+                   rnd.choice((None, 5.0, 10.0, 20.0)), rnd.choice((None, None, 6.0, 12.0, 24.0)))
+
+    for start in range(1, products + 1, BATCH):
+        con.executemany(
+            "INSERT INTO products(id, category_id, name, qty, limit_qty, pack_size) VALUES (?, ?, ?, ?, ?, ?)",
+            product_rows(start, min(start + BATCH, products + 1)),
+        )
+
+    def rollup_rows():
+        for pid in range(1, products + 1):
+            if rnd.random() >= consuming:
+                continue
+            rate = rnd.uniform(0.5, 20)
+            for day in range(REORDER_CONSUMPTION_DAYS):
+                out_qty = round(rnd.uniform(0, 2 * rate), 1)
+                yield pid, today - day * 86400, 0.0, 0.0, 0.0, out_qty
+
+    # INSERT OR REPLACE: the product insert trigger already wrote today's bucket
+    cur = con.executemany(
+        "INSERT OR REPLACE INTO stock_history_day(product_id, bucket, min_qty, max_qty, last_qty, out_qty) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rollup_rows(),
+    )
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+    return cur.rowcount
+
+
+def timed(fn, runs: int = RUNS):
+    samples, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--consuming", type=float, default=0.3, help="share of products with consumption history")
+    parser.add_argument("--budget", type=float, default=1.0, help="max seconds for query + NumPy pass")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    db.init_db()
+    start = time.perf_counter()
+    rollups = seed(args.products, args.consuming, args.seed)
+    print(f"{args.products} products, {rollups} daily rollups seeded in {time.perf_counter() - start:.1f} s")
+
+    since, today = consumption_window(time.time())
+    rows, query_s = timed(lambda: db.list_reorder_inputs(since, today))
+    print(f"list_reorder_inputs     {query_s * 1000:8.1f} ms  ({len(rows)} rows)")
+
+    python_result, python_s = timed(lambda: suggest_order_quantities(rows, vectorized=False))
+    print(f"row by row              {python_s * 1000:8.1f} ms  ({len(python_result)} suggestions)")
+
+    failures = []
+    if numpy_available():
+        numpy_result, numpy_s = timed(lambda: suggest_order_quantities(rows, vectorized=True))
+        print(f"NumPy (vectorised)      {numpy_s * 1000:8.1f} ms  (x{python_s / numpy_s:.1f} vs row by row)")
+        print(f"query + NumPy           {(query_s + numpy_s) * 1000:8.1f} ms")
+        if numpy_result != python_result:
+            differ = sum(1 for pid in python_result.keys() | numpy_result.keys()
+                         if python_result.get(pid) != numpy_result.get(pid))
+            failures.append(f"NumPy and row-by-row suggestions differ for {differ} product(s)")
+        if query_s + numpy_s > args.budget:
+            failures.append(f"query + NumPy took {query_s + numpy_s:.2f} s, budget {args.budget:.2f} s")
+    else:
+        print("NumPy is not installed: only the row-by-row fallback was timed")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Storage-layer benchmark: times the public functions of app.storage.db on
+synthetic databases of different sizes.
+
+Datasets (products / categories / tasks):
+    1k    -     1 000 /    20 /   5 000
+    100k  -   100 000 /   500 / 100 000
+    1m    - 1 000 000 / 2 000 / 300 000
+About 10% of the products are below their limit, about 80% have a unit price,
+about half of the tasks are done.
+Categories form a tree: the first 5% are top-level, every other one is nested under
+a random earlier category. Every product has stock at the main location (created by
+a trigger), every 10th one also at a second location, with a limit there.
+
+Results are written as JSON; with --baseline the run is compared against an
+earlier result file and exits with status 1 if any function got slower than
+--threshold times its baseline median.
+
+Run:
+    python -m benchmarks.bench_storage --sizes 1k,100k --output storage.json
+    python -m benchmarks.bench_storage --sizes 1k,100k --baseline storage.json --threshold 1.3
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+# Must be set before app.storage.db is imported (it creates the DB directory on import)
+_TMP = tempfile.mkdtemp(prefix="bench-storage-")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP, "unused.db"))
+
+from app.services.reorder import consumption_window  # noqa: E402
+from app.storage import db  # noqa: E402
+
+DATASETS: Dict[str, Tuple[int, int, int]] = {
+    "1k": (1_000, 20, 5_000),
+    "100k": (100_000, 500, 100_000),
+    "1m": (1_000_000, 2_000, 300_000),
+}
+
+MIN_SECONDS = 0.2          # time budget per function
+MIN_RUNS = 3
+MAX_RUNS = 2_000
+ABS_FLOOR_MS = 0.05        # differences below this are noise, never a regression
+BATCH = 50_000
+
+
+def build_dataset(path: str, products: int, categories: int, tasks: int, seed: int = 1) -> None:
+    """
+    Create a DB with the app schema and fill it with bulk inserts.
+    """
+    rnd = random.Random(seed)
+    db.DB_PATH = path
+    db.init_db()
+
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA synchronous = OFF")
+    # The closure table (category_tree) is filled by the insert trigger
+    top_level = max(1, categories // 20)
+    con.executemany(
+        "INSERT INTO categories(id, name, parent_id) VALUES (?, ?, ?)",
+        ((c, f"Категорія {c}", None if c <= top_level else rnd.randint(1, c - 1)) for c in range(1, categories + 1)),
+    )
+
+    def product_rows(start: int, stop: int):
+        for pid in range(start, stop):
+            limit_qty = rnd.choice((None, 5.0, 10.0, 20.0))
+            below = limit_qty is not None and rnd.random() < 0.1
+            qty = rnd.uniform(0, limit_qty) if below else rnd.uniform(limit_qty or 0, 100 + (limit_qty or 0))
+            unit_price = None if rnd.random() < 0.2 else round(rnd.uniform(1, 500), 2)
+            yield pid, rnd.randint(1, categories), f"Продукт {pid}", round(qty, 1), limit_qty, int(below), unit_price
+
+    for start in range(1, products + 1, BATCH):
+        con.executemany(
+            "INSERT INTO products(id, category_id, name, qty, limit_qty, below_limit, unit_price) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            product_rows(start, min(start + BATCH, products + 1)),
+        )
+
+    con.execute("INSERT INTO locations(id, name) VALUES (2, 'Бар')")
+    con.executemany(
+        "INSERT INTO stock(product_id, location_id, qty, limit_qty) VALUES (?, 2, ?, 2.0)",
+        ((p, round(rnd.uniform(0, 10), 1)) for p in range(1, products + 1, 10)),
+    )
+
+    con.executemany(
+        "INSERT INTO tasks(user_id, text, is_done, task_cat_id) VALUES (?, ?, ?, ?)",
+        ((rnd.randint(1, 50), f"Завдання {t}", int(rnd.random() < 0.5), rnd.randint(1, 3)) for t in range(tasks)),
+    )
+    con.executemany("INSERT INTO subscribers(chat_id) VALUES (?)", ((c,) for c in range(1, 101)))
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+def cases(products: int, categories: int, tasks: int, seed: int = 2) -> List[Tuple[str, Callable[[], object]]]:
+    """
+    (name, call) per public db function. Writes only touch rows created by the benchmark
+    or change values in place, so repeated runs keep the dataset shape.
+    """
+    rnd = random.Random(seed)
+    pid = lambda: rnd.randint(1, products)      # noqa: E731
+    cid = lambda: rnd.randint(1, categories)    # noqa: E731
+    tid = lambda: rnd.randint(1, tasks)         # noqa: E731
+    counter = iter(range(10 ** 9))
+
+    def add_and_delete_product():
+        cat = cid()
+        name = f"bench {next(counter)}"
+        db.add_product(cat, name, 1.0, 2.0)
+        with db.connect() as con:
+            new_id = con.execute("SELECT id FROM products WHERE category_id=? AND name=?", (cat, name)).fetchone()[0]
+        db.delete_product(new_id)
+
+    def add_and_delete_category():
+        db.delete_category(db.add_category(f"bench cat {next(counter)}", cid()))
+
+    def move_category_and_back():
+        # A top-level category (the largest subtrees) under another one and back
+        cat, target = rnd.randint(1, max(1, categories // 20)), categories + 1
+        while target > categories or target == cat:
+            target = cid()
+        try:
+            db.move_category(cat, target)
+        except ValueError:  # target is inside the subtree
+            return
+        db.move_category(cat, None)
+
+    return [
+        ("list_categories", db.list_categories),
+        ("list_child_categories", lambda: db.list_child_categories(None)),
+        ("get_category", lambda: db.get_category(cid())),
+        ("list_products_by_category", lambda: db.list_products_by_category(cid())),
+        ("load_category_screen", lambda: db.load_category_screen(cid())),
+        ("get_product", lambda: db.get_product(pid())),
+        ("load_product_screen", lambda: db.load_product_screen(pid())),
+        ("get_product_with_category", lambda: db.get_product_with_category(pid())),
+        ("list_reorder_items", db.list_reorder_items),
+        ("iter_reorder_items", lambda: sum(1 for _ in db.iter_reorder_items())),
+        ("list_reorder_items(subtree)", lambda: db.list_reorder_items(rnd.randint(1, max(1, categories // 20)))),
+        ("subtree_stock_totals", lambda: db.subtree_stock_totals(rnd.randint(1, max(1, categories // 20)))),
+        ("stock_valuation", db.stock_valuation),
+        ("list_reorder_inputs", lambda: db.list_reorder_inputs(*consumption_window(time.time()))),
+        ("find_products", lambda: db.find_products(f"{pid()}")),
+        ("load_stock_history(raw)", lambda: db.load_stock_history(pid(), "raw", 0)),
+        ("load_stock_history(hour)", lambda: db.load_stock_history(pid(), "hour", 0)),
+        ("prune_stock_history", lambda: db.prune_stock_history(0, 0)),
+        ("list_all_tasks_by_category", lambda: db.list_all_tasks_by_category(rnd.randint(1, 3))),
+        ("list_all_tasks_by_category(include_done)",
+         lambda: db.list_all_tasks_by_category(rnd.randint(1, 3), include_done=True)),
+        ("get_task", lambda: db.get_task(tid())),
+        ("list_subscribers", db.list_subscribers),
+        ("is_subscriber", lambda: db.is_subscriber(rnd.randint(1, 200))),
+        ("add_subscriber", lambda: db.add_subscriber(rnd.randint(1, 100))),
+        ("set_stock_qty(main)",
+         lambda: db.set_stock_qty(pid(), db.MAIN_LOCATION_ID, round(rnd.uniform(20, 100), 1))),
+        ("set_stock_qty", lambda: db.set_stock_qty(pid(), 2, round(rnd.uniform(0, 10), 1))),
+        ("add_stock_qty", lambda: db.add_stock_qty(pid(), 2, rnd.choice((-0.5, 0.5)))),
+        ("update_product_limit", lambda: db.update_product_limit(pid(), rnd.choice((5.0, 10.0)))),
+        ("update_product_price", lambda: db.update_product_price(pid(), round(rnd.uniform(1, 500), 2))),
+        ("update_product_name", lambda: db.update_product_name(pid(), f"renamed {next(counter)}")),
+        ("add_product+delete_product", add_and_delete_product),
+        ("add_category+delete_category", add_and_delete_category),
+        ("move_category+back", move_category_and_back),
+        ("add_task", lambda: db.add_task(1, "bench task", rnd.randint(1, 3))),
+        ("add_tasks(25)", lambda: db.add_tasks(1, [f"bench task {n}" for n in range(25)], rnd.randint(1, 3))),
+        ("update_task", lambda: db.update_task(tid(), f"Завдання {next(counter)}")),
+        ("set_task_done", lambda: db.set_task_done(tid(), rnd.random() < 0.5)),
+    ]
+
+
+def time_call(fn: Callable[[], object]) -> Dict[str, float]:
+    samples: List[float] = []
+    budget_end = time.perf_counter() + MIN_SECONDS
+    while len(samples) < MAX_RUNS and (len(samples) < MIN_RUNS or time.perf_counter() < budget_end):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "runs": len(samples),
+    }
+
+
+def run(sizes: List[str], data_dir: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for size in sizes:
+        products, categories, tasks = DATASETS[size]
+        path = os.path.join(data_dir, f"storage_{size}.db")
+        if os.path.exists(path):
+            os.remove(path)
+
+        start = time.perf_counter()
+        build_dataset(path, products, categories, tasks)
+        print(f"\n[{size}] built in {time.perf_counter() - start:.1f} s "
+              f"({products} products, {categories} categories, {tasks} tasks)")
+
+        db.DB_PATH = path
+        results[size] = {}
+        for name, fn in cases(products, categories, tasks):
+            results[size][name] = stats = time_call(fn)
+            print(f"  {name:42s} median {stats['median_ms']:10.3f} ms  p95 {stats['p95_ms']:10.3f} ms  "
+                  f"({stats['runs']} runs)")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Functions whose median grew more than `threshold` times (and more than ABS_FLOOR_MS).
+    """
+    regressions = []
+    for size, functions in results.items():
+        for name, stats in functions.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if old is None:
+                continue
+            new_ms, old_ms = stats["median_ms"], old["median_ms"]
+            if new_ms > old_ms * threshold and new_ms - old_ms > ABS_FLOOR_MS:
+                regressions.append(f"[{size}] {name}: {old_ms:.3f} -> {new_ms:.3f} ms (x{new_ms / old_ms:.2f})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,100k,1m", help="comma separated: " + ",".join(DATASETS))
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare with an earlier results JSON file")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown factor vs baseline")
+    parser.add_argument("--data-dir", default=_TMP, help="where the synthetic databases are built")
+    args = parser.parse_args()
+
+    sizes = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in DATASETS]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    results = run(sizes, args.data_dir)
+    document = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(document, fh, ensure_ascii=False, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over x{args.threshold}:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nno regressions over x{args.threshold} vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Load test of update processing: 50 simulated chats send updates to the
+ChatOrderedUpdateProcessor, handlers are mostly fast with occasional slow ones
+(like a notification fan-out). Reports p50/p99 latency (arrival -> handled)
+for sequential processing (limit 1) and for concurrent limits, and checks
+that every chat's updates were handled in the order they arrived.
+
+Run:
+    python -m benchmarks.bench_update_processor
+"""
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from app.services.update_processor import ChatOrderedUpdateProcessor
+
+CHATS = 50
+UPDATES_PER_CHAT = 20
+ARRIVAL_INTERVAL = 0.002        # seconds between two incoming updates (all chats)
+FAST_HANDLER = 0.003
+SLOW_HANDLER = 0.25
+SLOW_SHARE = 0.02
+LIMITS = (1, 4, 16, 64)
+
+
+def make_workload(seed: int = 1) -> List[Tuple[int, int, float]]:
+    """
+    (chat_id, sequence number within the chat, handler duration), in arrival order.
+    """
+    rnd = random.Random(seed)
+    counters = {chat_id: 0 for chat_id in range(1, CHATS + 1)}
+    workload = []
+    for _ in range(CHATS * UPDATES_PER_CHAT):
+        chat_id = rnd.randint(1, CHATS)
+        duration = SLOW_HANDLER if rnd.random() < SLOW_SHARE else FAST_HANDLER
+        workload.append((chat_id, counters[chat_id], duration))
+        counters[chat_id] += 1
+    return workload
+
+
+async def run(limit: int, workload: List[Tuple[int, int, float]]) -> Tuple[List[float], bool]:
+    processor = ChatOrderedUpdateProcessor(limit)
+    latencies: List[float] = []
+    handled: Dict[int, List[int]] = {}
+
+    async def handler(chat_id: int, seq: int, duration: float, arrived: float) -> None:
+        handled.setdefault(chat_id, []).append(seq)
+        await asyncio.sleep(duration)
+        latencies.append(time.perf_counter() - arrived)
+
+    tasks = []
+    for chat_id, seq, duration in workload:
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), effective_user=None)
+        arrived = time.perf_counter()
+        # Same as Application: one task per update, created in arrival order
+        tasks.append(asyncio.create_task(
+            processor.process_update(update, handler(chat_id, seq, duration, arrived))
+        ))
+        await asyncio.sleep(ARRIVAL_INTERVAL)
+    await asyncio.gather(*tasks)
+
+    in_order = all(seqs == sorted(seqs) for seqs in handled.values())
+    return latencies, in_order
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return statistics.quantiles(values, n=100)[int(pct) - 1]
+
+
+async def main() -> None:
+    workload = make_workload()
+    print(f"{CHATS} chats, {len(workload)} updates, {SLOW_SHARE:.0%} slow handlers ({SLOW_HANDLER * 1000:.0f} ms)")
+    for limit in LIMITS:
+        start = time.perf_counter()
+        latencies, in_order = await run(limit, workload)
+        total = time.perf_counter() - start
+        print(
+            f"limit {limit:3d}: p50 {percentile(latencies, 50) * 1000:8.1f} ms  "
+            f"p99 {percentile(latencies, 99) * 1000:8.1f} ms  "
+            f"total {total:6.2f} s  per-chat order {'OK' if in_order else 'BROKEN'}"
+        )
+        assert in_order
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
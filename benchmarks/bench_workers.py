@@ -0,0 +1,164 @@
+"""
+Throughput of the multi-process mode (app.workers) against the number of workers.
+
+The supervisor polls the local fake Bot API (benchmarks.fake_bot_api) and routes
+updates to N worker processes sharing one WAL-mode SQLite database. Every chat
+sends one session of updates, reads and writes mixed:
+
+    /start                  add_subscriber
+    🏠 Категорії            categories list
+    cat:open                category screen (callback)
+    task:done               set_task_done of the chat's own task: version bump broadcast to the other workers
+    🔕 Відписатися          remove_subscriber; its reply marks the session as done
+
+Updates of one chat are handled in order, so a chat is done when the reply to its
+last update is sent. Reports updates/s and session latency per worker count.
+
+Supervisor and fake API share the benchmark process; with fewer CPU cores than
+workers + 1 the numbers show the overhead of the mode rather than its scaling.
+
+Run:
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1,2,4,8 --chats 1000 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import warnings
+from typing import Dict, List
+
+from benchmarks.fake_bot_api import FakeBotApi, make_callback_update, make_message_update
+from benchmarks.replay_updates import TOKEN, seed_catalog
+
+DONE_TEXT = "🔕"
+READY_TIMEOUT = 60
+
+
+def session_updates(chat_id: int, task_id: int, cat_id: int) -> List[dict]:
+    from app.utils.callback_codec import encode_callback
+
+    return [
+        make_message_update(chat_id, "/start"),
+        make_message_update(chat_id, "🏠 Категорії"),
+        make_callback_update(chat_id, encode_callback("cat:open", cat_id), query_no=1),
+        make_callback_update(chat_id, encode_callback("task:done", task_id), query_no=2),
+        make_message_update(chat_id, "🔕 Відписатися"),
+    ]
+
+
+def seed(db_path: str, chats: int, categories: int, products: int) -> Dict[int, int]:
+    """
+    Fresh database for one run; returns chat id -> id of the task it closes.
+    """
+    from app.storage import db
+
+    db.DB_PATH = db_path
+    seed_catalog(categories, products)
+    tasks = {}
+    with db.connect() as con:
+        for chat_id in range(1, chats + 1):
+            cur = con.execute(
+                "INSERT INTO tasks(user_id, text, task_cat_id) VALUES (?, ?, ?)",
+                (chat_id, f"Завдання {chat_id}", chat_id % 3 + 1),
+            )
+            tasks[chat_id] = cur.lastrowid
+        con.commit()
+    return tasks
+
+
+async def run_once(api: FakeBotApi, workers: int, args, data_dir: str) -> Dict[str, float]:
+    from app.workers import serve_workers
+
+    db_path = os.path.join(data_dir, f"workers_{workers}.db")
+    os.environ["DB_PATH"] = db_path     # read by the worker processes at import
+    tasks = seed(db_path, args.chats, args.categories, args.products)
+
+    api.reset_stats()
+    started: Dict[int, float] = {}
+    finished: Dict[int, float] = {}
+    all_done = asyncio.Event()
+
+    def on_call(method, chat_id, params) -> None:
+        if method == "sendMessage" and str(params.get("text", "")).startswith(DONE_TEXT):
+            finished[chat_id] = time.perf_counter()
+            if len(finished) >= args.chats:
+                all_done.set()
+
+    api.on_call = on_call
+    stop = asyncio.Event()
+    supervisor = asyncio.create_task(serve_workers(TOKEN, workers, "polling", "", "", "", "", 0, stop_event=stop))
+
+    # getMe: once by the supervisor, once per worker while it initializes
+    deadline = time.perf_counter() + READY_TIMEOUT
+    while api.counts["getMe"] < workers + 1:
+        if time.perf_counter() > deadline:
+            raise RuntimeError("workers did not start")
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(1.0)    # getMe -> app.start()
+    api.reset_stats()
+
+    start = time.perf_counter()
+    for chat_id in range(1, args.chats + 1):
+        started[chat_id] = time.perf_counter()
+        cat_id = (chat_id - 1) % args.categories + 1
+        for update in session_updates(chat_id, tasks[chat_id], cat_id):
+            api.push_update(update)
+    try:
+        await asyncio.wait_for(all_done.wait(), args.timeout)
+    finally:
+        stop.set()
+        await supervisor
+        api.on_call = None
+    elapsed = time.perf_counter() - start
+
+    updates = args.chats * 5
+    sessions = sorted(finished[c] - started[c] for c in finished)
+    q = statistics.quantiles(sessions, n=100)
+    return {
+        "updates_per_s": updates / elapsed,
+        "elapsed": elapsed,
+        "p50_ms": q[49] * 1000,
+        "p95_ms": q[94] * 1000,
+        "api_calls": sum(count for method, count in api.counts.items() if method != "getUpdates"),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    warnings.filterwarnings("ignore", message=".*per_message.*")
+    api = FakeBotApi(TOKEN, latency=args.latency, jitter=args.jitter)
+    await api.start()
+
+    # Must be set before app.* is imported: config is read at import time (here and in the workers)
+    data_dir = tempfile.mkdtemp(prefix="bench-workers-")
+    os.environ["DB_PATH"] = os.path.join(data_dir, "unused.db")
+    os.environ["BOT_API_BASE_URL"] = api.base_url
+    os.environ["BOT_TOKEN"] = TOKEN
+    os.environ.pop("METRICS_PORT", None)
+    os.environ["PYTHONWARNINGS"] = "ignore:If 'per_message=False'"     # PTB per_message warnings in the workers
+
+    print(f"{args.chats} chats x 5 updates, fake API latency {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms, "
+          f"{os.cpu_count()} CPU(s)")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        result = await run_once(api, workers, args, data_dir)
+        baseline = baseline or result["updates_per_s"]
+        print(f"  workers {workers:2d}: {result['updates_per_s']:7.0f} updates/s (x{result['updates_per_s'] / baseline:.2f})  "
+              f"session p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+              f"API calls {result['api_calls']}")
+
+    await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=30, help="products per category")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake API latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="fake API random extra latency, seconds")
+    parser.add_argument("--timeout", type=float, default=300)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,279 @@
+"""
+Local stand-in for the Telegram Bot API, for load tests and replays without Telegram.
+
+Serves POST/GET /bot<token>/<method> for the methods the bot uses and records
+every call. Point the bot at it with BOT_API_BASE_URL=http://127.0.0.1:<port>/bot.
+
+Faults for load tests: every call except getUpdates can be delayed
+(`latency` + random `jitter` seconds) and sending methods can answer
+429 Too Many Requests (RetryAfter in PTB) with probability `retry_after_rate`.
+
+Run standalone:
+    python -m benchmarks.fake_bot_api --port 8081 --latency 0.05 --retry-after-rate 0.01
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake bot", "username": "fake_bot"}
+
+# Methods that hit Telegram's flood limits and may get a RetryAfter
+SENDING_METHODS = frozenset({"sendMessage", "editMessageText", "sendDocument"})
+
+
+def _chat(chat_id: int) -> Dict[str, Any]:
+    return {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"}
+
+
+def call_chat_id(params: Dict[str, Any]) -> Optional[int]:
+    """
+    Chat a Bot API call belongs to: chat_id, or the chat encoded in
+    callback query ids generated by make_callback_update() ("<chat>-<n>").
+    """
+    if "chat_id" in params:
+        try:
+            return int(params["chat_id"])
+        except (TypeError, ValueError):
+            return None
+    query_id = str(params.get("callback_query_id", ""))
+    head = query_id.split("-", 1)[0]
+    return int(head) if head.isdigit() else None
+
+
+class FakeBotApi:
+    """
+    In-memory Bot API: getUpdates serves updates pushed with push_update(),
+    sendMessage / editMessageText / sendDocument return plausible Message objects,
+    everything else answers `true`.
+    """
+
+    def __init__(
+        self,
+        token: str = "1:fake",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        retry_after_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 1,
+    ):
+        self.token = token
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+
+        self.calls: List[Tuple[float, str, Optional[int]]] = []
+        self.counts: Counter = Counter()
+        self.retry_afters: Counter = Counter()
+        self.on_call: Optional[Callable[[str, Optional[int], Dict[str, Any]], None]] = None
+        # chat id -> callback_data of the inline buttons the bot showed last
+        self.keyboards: Dict[int, List[str]] = {}
+
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+
+        self.web_app = web.Application()
+        self.web_app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    # ---------- Updates ----------
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        """
+        Queue an update for getUpdates; returns the update_id it was given.
+        """
+        update = dict(update, update_id=next(self._update_ids))
+        self._updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+
+        # Confirmed updates are dropped, like on the real server
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    def reset_stats(self) -> None:
+        self.calls.clear()
+        self.counts.clear()
+        self.retry_afters.clear()
+
+    # ---------- Methods ----------
+
+    def _message(self, params: Dict[str, Any], message_id: Optional[int] = None) -> Dict[str, Any]:
+        chat_id = call_chat_id(params) or 0
+        message = {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": _chat(chat_id),
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        markup = params.get("reply_markup")
+        if isinstance(markup, dict) and "inline_keyboard" in markup:
+            # Only inline keyboards are part of a Message
+            message["reply_markup"] = markup
+            self.keyboards[chat_id] = [
+                button["callback_data"]
+                for row in markup["inline_keyboard"] for button in row
+                if "callback_data" in button
+            ]
+        return message
+
+    async def call(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "sendMessage":
+            return self._message(params)
+        if method == "editMessageText":
+            return self._message(params, message_id=int(params.get("message_id") or 0) or None)
+        if method == "sendDocument":
+            message = self._message(params)
+            message["document"] = {"file_id": "fake", "file_unique_id": "fake"}
+            return message
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.match_info["token"] != self.token:
+            return web.json_response({"ok": False, "error_code": 401, "description": "Unauthorized"}, status=401)
+
+        method = request.match_info["method"]
+        params = await _read_params(request)
+
+        chat_id = call_chat_id(params)
+        self.calls.append((time.perf_counter(), method, chat_id))
+        self.counts[method] += 1
+        if self.on_call is not None:
+            self.on_call(method, chat_id, params)
+
+        if method != "getUpdates" and (self.latency or self.jitter):
+            await asyncio.sleep(self.latency + self._random.random() * self.jitter)
+
+        if method in SENDING_METHODS and self._random.random() < self.retry_after_rate:
+            self.retry_afters[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        result = await self.call(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    # ---------- Server ----------
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._runner = web.AppRunner(self.web_app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _read_params(request: web.Request) -> Dict[str, Any]:
+    """
+    PTB sends parameters form-encoded (JSON values for nested objects)
+    or as multipart for uploads; plain JSON bodies are accepted too.
+    """
+    if request.content_type == "application/json":
+        return await request.json()
+
+    params: Dict[str, Any] = dict(request.query)
+    if request.can_read_body:
+        form = await request.post()
+        for key, value in form.items():
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+                params[key] = value
+    return params
+
+
+# ---------- Recorded / synthetic updates ----------
+
+def make_message_update(chat_id: int, text: str, message_id: int = 1) -> Dict[str, Any]:
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": _chat(chat_id),
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"message": message}
+
+
+def make_callback_update(chat_id: int, data: str, message_id: int = 1, query_no: int = 0) -> Dict[str, Any]:
+    return {
+        "callback_query": {
+            "id": f"{chat_id}-{query_no}",
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"},
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": _chat(chat_id),
+                "from": BOT_USER,
+                "text": "…",
+            },
+        }
+    }
+
+
+async def _serve(port: int, token: str, **faults) -> None:
+    api = FakeBotApi(token, **faults)
+    await api.start(port=port)
+    print(f"Fake Bot API on {api.base_url} (token {token})")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--token", default="1:fake")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds, 0..jitter")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="share of sending calls answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after seconds in 429 answers")
+    args = parser.parse_args()
+    asyncio.run(_serve(
+        args.port, args.token,
+        latency=args.latency, jitter=args.jitter,
+        retry_after_rate=args.retry_after_rate, retry_after=args.retry_after,
+    ))
@@ -0,0 +1,179 @@
+"""
+Load generator: many simulated users click through categories, products and tasks
+of the real bot, which talks to the local fake Bot API (benchmarks.fake_bot_api).
+
+Every user opens a screen from the bottom menu and then clicks random buttons
+of the inline keyboard the bot showed them last (read-only routes only), waiting
+for each click to be handled before the next one.
+
+Per scenario it reports throughput, latency percentiles (update sent -> handled),
+Bot API call counts, injected RetryAfter answers and handler errors.
+
+Generator, fake API and bot share one process and one CPU core, so absolute
+throughput is a lower bound; compare runs against each other.
+
+Run:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 200 --latency 0.05 --jitter 0.05 --retry-after-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import warnings
+from collections import Counter
+from typing import Dict, FrozenSet, List, Tuple
+
+from benchmarks.fake_bot_api import FakeBotApi, make_callback_update, make_message_update
+from benchmarks.replay_updates import TOKEN, Timings, build_app, seed_catalog
+
+# Scenario -> list of (bottom menu button, routes a user may click afterwards)
+SCENARIOS: Dict[str, List[Tuple[str, FrozenSet[str]]]] = {
+    "categories": [
+        ("🏠 Категорії", frozenset({"nav:cats", "cat:open", "prod:open"})),
+    ],
+    "tasks": [
+        ("📝 Список завдань", frozenset({"nav:task_proc", "task_proc:open", "task:open"})),
+    ],
+}
+SCENARIOS["mixed"] = SCENARIOS["categories"] + SCENARIOS["tasks"]
+
+CHAT_ID_STEP = 1_000_000    # every scenario gets its own chats (fresh conversation state)
+
+
+def seed_tasks(tasks_per_process: int) -> None:
+    from app.config import TASK_PROCESSES
+    from app.storage import db
+
+    for tc_id in TASK_PROCESSES:
+        for n in range(1, tasks_per_process + 1):
+            db.add_task(1, f"Завдання {tc_id}.{n}", tc_id)
+
+
+class LoadRun:
+    def __init__(self, api: FakeBotApi, timings: Timings, clicks: int, sessions: int, seed: int):
+        self.api = api
+        self.timings = timings
+        self.clicks = clicks
+        self.sessions = sessions
+        self.random = random.Random(seed)
+        self.latencies: List[float] = []
+
+    async def send(self, update: dict) -> None:
+        update_id = self.api.push_update(update)
+        sent = time.perf_counter()
+        self.timings.sent[update_id] = sent
+        await self.timings.wait_update(update_id)
+        self.latencies.append(self.timings.done[update_id] - sent)
+
+    def pick_button(self, chat_id: int, routes: FrozenSet[str]):
+        from app.handlers.routing import parse_callback
+
+        buttons = []
+        for data in self.api.keyboards.get(chat_id, ()):
+            cb = parse_callback(data)
+            if cb is not None and f"{cb.scope}:{cb.action}" in routes:
+                buttons.append(data)
+        return self.random.choice(buttons) if buttons else None
+
+    async def user(self, chat_id: int, flows: List[Tuple[str, FrozenSet[str]]]) -> None:
+        query_no = 0
+        for _ in range(self.sessions):
+            menu_button, routes = self.random.choice(flows)
+            await self.send(make_message_update(chat_id, menu_button))
+            for _ in range(self.clicks):
+                data = self.pick_button(chat_id, routes)
+                if data is None:
+                    break
+                query_no += 1
+                await self.send(make_callback_update(chat_id, data, query_no=query_no))
+
+
+async def run_scenario(name: str, no: int, api: FakeBotApi, timings: Timings, errors: Counter, args) -> None:
+    flows = SCENARIOS[name]
+    api.reset_stats()
+    errors.clear()
+    run = LoadRun(api, timings, args.clicks, args.sessions, seed=no)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run.user(no * CHAT_ID_STEP + user_no, flows) for user_no in range(1, args.users + 1)
+    ))
+    elapsed = time.perf_counter() - start
+
+    lat = sorted(run.latencies)
+    q = statistics.quantiles(lat, n=100)
+    calls = ", ".join(f"{method} {count}" for method, count in api.counts.most_common() if method != "getUpdates")
+    print(f"\n[{name}] {args.users} users, {len(lat)} updates in {elapsed:.2f} s "
+          f"-> {len(lat) / elapsed:.0f} updates/s")
+    print(f"  latency p50 {q[49] * 1000:.1f} ms  p95 {q[94] * 1000:.1f} ms  "
+          f"p99 {q[98] * 1000:.1f} ms  max {lat[-1] * 1000:.1f} ms")
+    print(f"  API calls: {calls} (getUpdates {api.counts['getUpdates']})")
+    print(f"  RetryAfter injected: {sum(api.retry_afters.values())}, "
+          f"handler errors: {dict(errors) or 0}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    warnings.filterwarnings("ignore", message=".*per_message.*")
+    api = FakeBotApi(
+        TOKEN,
+        latency=args.latency,
+        jitter=args.jitter,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+    )
+    await api.start()
+
+    # Must be set before app.* is imported: config is read at import time
+    tmp = tempfile.mkdtemp(prefix="load-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bot.db")
+    os.environ["BOT_API_BASE_URL"] = api.base_url
+
+    seed_catalog(args.categories, args.products)
+    seed_tasks(args.tasks)
+
+    from app.main import post_init
+
+    timings = Timings()
+    app = build_app(timings)
+    errors: Counter = Counter()
+
+    async def count_error(update, context) -> None:
+        errors[type(context.error).__name__] += 1
+
+    app.add_error_handler(count_error)
+
+    await app.initialize()
+    await post_init(app)
+    await app.start()
+    await app.updater.start_polling(poll_interval=0.0, timeout=10)
+
+    print(f"fake API latency {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms, "
+          f"RetryAfter rate {args.retry_after_rate:.1%}")
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    for no, name in enumerate(names, start=1):
+        await run_scenario(name, no, api, timings, errors, args)
+
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("all", *SCENARIOS), default="all")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=2, help="menu visits per user")
+    parser.add_argument("--clicks", type=int, default=6, help="inline button clicks per visit")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=30)
+    parser.add_argument("--tasks", type=int, default=30, help="open tasks per process")
+    parser.add_argument("--latency", type=float, default=0.03, help="fake API latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="fake API random extra latency, seconds")
+    parser.add_argument("--retry-after-rate", type=float, default=0.005)
+    parser.add_argument("--retry-after", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
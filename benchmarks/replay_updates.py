@@ -0,0 +1,230 @@
+"""
+Replay recorded updates against the real bot, in webhook mode and in polling mode,
+and compare latency (update sent -> bot finished handling it).
+
+The bot talks to the local fake Bot API (benchmarks.fake_bot_api) and uses a
+temporary database seeded with a small catalog. Webhook mode posts every update
+to the embedded webhook server with the secret token header, polling mode serves
+them through the fake getUpdates.
+
+Run:
+    python -m benchmarks.replay_updates
+    python -m benchmarks.replay_updates --updates recorded.jsonl --rate 100
+
+--updates: JSON lines, one Telegram Update object per line (update_id is reassigned).
+Without it a synthetic session (/start, categories, category, product) per chat is used.
+
+Locally both modes see no network delay; against real Telegram polling also pays
+the getUpdates round trip, which this replay does not model.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import tempfile
+import time
+import warnings
+from typing import Any, Dict, List
+
+import aiohttp
+
+from benchmarks.fake_bot_api import FakeBotApi, make_callback_update, make_message_update
+
+TOKEN = "1:replay"
+SECRET = "replay-secret"
+WEBHOOK_PATH = "/telegram"
+
+
+def synthetic_updates(chats: int, categories: int, products_per_category: int) -> List[Dict[str, Any]]:
+    from app.utils.callback_codec import encode_callback
+
+    updates = []
+    for chat_id in range(1, chats + 1):
+        cat_id = (chat_id - 1) % categories + 1
+        prod_id = (cat_id - 1) * products_per_category + 1
+        updates += [
+            make_message_update(chat_id, "/start"),
+            make_message_update(chat_id, "🏠 Категорії"),
+            make_callback_update(chat_id, encode_callback("nav:cats"), query_no=1),
+            make_callback_update(chat_id, encode_callback("cat:open", cat_id), query_no=2),
+            make_callback_update(chat_id, encode_callback("prod:open", prod_id), query_no=3),
+        ]
+    return updates
+
+
+def seed_catalog(categories: int, products_per_category: int) -> None:
+    from app.storage import db
+
+    db.init_db()
+    for c in range(1, categories + 1):
+        db.add_category(f"Категорія {c}")
+        for p in range(1, products_per_category + 1):
+            db.add_product(c, f"Продукт {c}.{p}", qty=p, limit_qty=5)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Timings:
+    """
+    sent/done timestamps per update_id; done is recorded by a handler in
+    the last handler group, i.e. after all other handlers finished.
+    """
+
+    def __init__(self):
+        self.sent: Dict[int, float] = {}
+        self.done: Dict[int, float] = {}
+        self._all_done = asyncio.Event()
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self.expected = 0
+
+    async def mark_done(self, update, context) -> None:
+        self.done[update.update_id] = time.perf_counter()
+        waiter = self._waiters.pop(update.update_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+        if self.expected and len(self.done) >= self.expected:
+            self._all_done.set()
+
+    async def wait_update(self, update_id: int, timeout: float = 60) -> None:
+        """
+        Wait until one update is handled.
+        """
+        if update_id in self.done:
+            return
+        waiter = self._waiters.setdefault(update_id, asyncio.get_running_loop().create_future())
+        await asyncio.wait_for(waiter, timeout)
+
+    async def wait(self, timeout: float = 60) -> None:
+        await asyncio.wait_for(self._all_done.wait(), timeout)
+
+    def latencies(self) -> List[float]:
+        return [self.done[uid] - sent for uid, sent in self.sent.items() if uid in self.done]
+
+
+def build_app(timings: Timings):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    from app.main import build_application
+
+    app = build_application(TOKEN)
+    app.add_handler(TypeHandler(Update, timings.mark_done), group=100)
+    return app
+
+
+async def replay_webhook(updates: List[Dict[str, Any]], rate: float) -> Timings:
+    from app.webhook import serve_webhook
+
+    timings = Timings()
+    timings.expected = len(updates)
+    app = build_app(timings)
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    stop = asyncio.Event()
+    server = asyncio.create_task(serve_webhook(app, base, WEBHOOK_PATH, SECRET, "127.0.0.1", port, stop_event=stop))
+
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(base + "/healthz") as resp:
+                    if resp.status == 200:
+                        break
+            except aiohttp.ClientConnectionError:
+                pass
+            await asyncio.sleep(0.05)
+
+        async with session.post(base + WEBHOOK_PATH, json={"update_id": 0},
+                                headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+            assert resp.status == 403, f"wrong secret must be rejected, got {resp.status}"
+
+        async def post(update_id: int, update: Dict[str, Any]) -> None:
+            timings.sent[update_id] = time.perf_counter()
+            async with session.post(base + WEBHOOK_PATH, json=dict(update, update_id=update_id),
+                                    headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as resp:
+                assert resp.status == 200, resp.status
+
+        posts = []
+        for update_id, update in enumerate(updates, start=1):
+            posts.append(asyncio.create_task(post(update_id, update)))
+            await asyncio.sleep(1 / rate)
+        await asyncio.gather(*posts)
+        await timings.wait()
+
+    stop.set()
+    await server
+    return timings
+
+
+async def replay_polling(api: FakeBotApi, updates: List[Dict[str, Any]], rate: float) -> Timings:
+    from app.main import post_init
+
+    timings = Timings()
+    timings.expected = len(updates)
+    app = build_app(timings)
+
+    await app.initialize()
+    await post_init(app)
+    await app.start()
+    await app.updater.start_polling(poll_interval=0.0, timeout=10)
+
+    for update in updates:
+        update_id = api.push_update(update)
+        timings.sent[update_id] = time.perf_counter()
+        await asyncio.sleep(1 / rate)
+    await timings.wait()
+
+    await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    return timings
+
+
+def report(mode: str, timings: Timings) -> None:
+    lat = sorted(timings.latencies())
+    q = statistics.quantiles(lat, n=100)
+    print(f"{mode:8s}: {len(lat):5d} updates  p50 {q[49] * 1000:7.2f} ms  "
+          f"p99 {q[98] * 1000:7.2f} ms  max {lat[-1] * 1000:7.2f} ms")
+
+
+async def main(args: argparse.Namespace) -> None:
+    warnings.filterwarnings("ignore", message=".*per_message.*")
+    api = FakeBotApi(TOKEN)
+    await api.start()
+
+    # Must be set before app.* is imported: config is read at import time
+    tmp = tempfile.mkdtemp(prefix="replay-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bot.db")
+    os.environ["BOT_API_BASE_URL"] = api.base_url
+
+    seed_catalog(args.categories, args.products)
+    if args.updates:
+        with open(args.updates, encoding="utf-8") as fh:
+            updates = [json.loads(line) for line in fh if line.strip()]
+    else:
+        updates = synthetic_updates(args.chats, args.categories, args.products)
+
+    print(f"{len(updates)} updates at {args.rate:.0f}/s")
+    if args.mode in ("webhook", "both"):
+        report("webhook", await replay_webhook(updates, args.rate))
+    if args.mode in ("polling", "both"):
+        report("polling", await replay_polling(api, updates, args.rate))
+
+    await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("webhook", "polling", "both"), default="both")
+    parser.add_argument("--updates", help="JSON lines file with recorded updates")
+    parser.add_argument("--rate", type=float, default=200, help="updates per second")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--products", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,18 @@
+import pytest
+
+from app.bot_ui.render_cache import screen_cache
+from app.storage import db, versions
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    Fresh schema in a temporary file, with empty data versions and caches.
+    """
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "bot.db"))
+    monkeypatch.setattr(versions, "_versions", {})
+    monkeypatch.setattr(db, "_open_tasks", None)
+    screen_cache.clear()
+    db.init_db()
+    yield db.DB_PATH
+    screen_cache.clear()
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from app.handlers.routing import Callback, parse_callback
+from app.utils.callback_codec import (
+    MAX_CALLBACK_BYTES,
+    PREFIX,
+    ROUTES,
+    decode_callback,
+    encode_callback,
+)
+
+FUZZ_ROUNDS = 20_000
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/-_"
+
+
+def _random_values(rnd: random.Random, fields: str):
+    limits = {"I": 2 ** 32 - 1, "H": 2 ** 16 - 1, "B": 2 ** 8 - 1}
+    return tuple(rnd.choice((rnd.randint(0, 300), rnd.randint(0, limits[f]), limits[f])) for f in fields)
+
+
+def _assert_canonical(data: str) -> None:
+    """
+    Whatever decodes must be exactly what encode_callback() produces for the decoded fields.
+    """
+    decoded = decode_callback(data)
+    if decoded is not None:
+        scope, action, values = decoded
+        assert data == encode_callback(f"{scope}:{action}", *values), (data, decoded)
+
+
+def test_round_trip():
+    rnd = random.Random(1)
+    routes = list(ROUTES.values())
+    for _ in range(FUZZ_ROUNDS):
+        route, fields = rnd.choice(routes)
+        values = _random_values(rnd, fields)
+        data = encode_callback(route, *values)
+        scope, action = route.split(":")
+
+        assert len(data.encode()) <= MAX_CALLBACK_BYTES
+        assert decode_callback(data) == (scope, action, values)
+        assert parse_callback(data) == Callback(scope, action, values)
+
+
+def test_mutations_are_rejected_or_canonical():
+    rnd = random.Random(3)
+    routes = list(ROUTES.values())
+    junk = ALPHABET + "=~: \n!é"
+    for _ in range(FUZZ_ROUNDS):
+        route, fields = rnd.choice(routes)
+        data = encode_callback(route, *_random_values(rnd, fields))
+        i = rnd.randrange(len(data))
+        for mutated in (
+            data[:i] + rnd.choice(junk) + data[i + 1:],     # replaced character
+            data[:i] + rnd.choice(junk) + data[i:],         # inserted character
+            data[:i] + data[i + 1:],                        # dropped character
+            data[1:] + PREFIX,                              # moved prefix
+        ):
+            _assert_canonical(mutated)
+
+
+@pytest.mark.parametrize("data", [
+    "",
+    PREFIX,
+    PREFIX + "=",
+    PREFIX + "AQ",                              # header only, no route
+    PREFIX + "AQ4AADA5!",                       # valid data + junk
+    PREFIX + "AQ4A!ADA5",                       # junk inside
+    PREFIX + "AQ4AADA5==",                      # explicit padding
+    PREFIX + "AQ4AADA5".replace("A", "é", 1),   # non-ASCII
+    PREFIX + "AcgAADA5",                        # unknown route id
+    PREFIX + "Aw4AADA5",                        # unknown version
+])
+def test_malformed_data_is_rejected(data):
+    assert decode_callback(data) is None
+
+
+def test_unused_bits_must_be_zero():
+    data = encode_callback("nav:cats")           # 2 bytes: 2 unused bits in the last character
+    last = ALPHABET.index(data[-1])
+    assert decode_callback(data[:-1] + ALPHABET[last + 1]) is None
+
+
+def test_garbage_never_raises():
+    rnd = random.Random(4)
+    for _ in range(FUZZ_ROUNDS):
+        garbage = PREFIX + "".join(rnd.choice(ALPHABET + "=~:é") for _ in range(rnd.randint(0, 20)))
+        _assert_canonical(garbage)
+        parse_callback(garbage)
+
+
+def test_legacy_format():
+    assert parse_callback("nav:cats") == Callback("nav", "cats")
+    assert parse_callback("prod:del_yes:12345") == Callback("prod", "del_yes", (12345,))
+    assert parse_callback("prod:del_yes:12345").entity_id == 12345
+    assert parse_callback("prod:del_yes:x") is None
+    assert parse_callback("") is None
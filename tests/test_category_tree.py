@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.handlers import commands
+from app.storage import db
+
+
+def _tree() -> set:
+    with db.connect() as con:
+        return set(con.execute("SELECT ancestor_id, descendant_id, depth FROM category_tree"))
+
+
+def _ancestors(cat_id: int) -> dict:
+    return {ancestor: depth for ancestor, descendant, depth in _tree() if descendant == cat_id and depth}
+
+
+def _descendants(cat_id: int) -> dict:
+    return {descendant: depth for ancestor, descendant, depth in _tree() if ancestor == cat_id and depth}
+
+
+def _parent(cat_id: int):
+    with db.connect() as con:
+        return con.execute("SELECT parent_id FROM categories WHERE id=?", (cat_id,)).fetchone()[0]
+
+
+@pytest.fixture
+def tree(database):
+    a = db.add_category("A")
+    b = db.add_category("B", a)
+    c = db.add_category("C", b)
+    d = db.add_category("D")
+    return a, b, c, d
+
+
+def test_moved_subtree_gets_new_ancestors(tree):
+    a, b, c, d = tree
+    assert _ancestors(c) == {b: 1, a: 2}
+
+    assert db.move_category(b, d)
+    assert _parent(b) == d
+    assert _ancestors(b) == {d: 1}
+    assert _ancestors(c) == {b: 1, d: 2}
+    assert _descendants(d) == {b: 1, c: 2}
+    assert _descendants(a) == {}
+    assert _descendants(b) == {c: 1}
+
+
+def test_move_into_own_descendant_is_rejected(tree):
+    a, b, c, d = tree
+    before = _tree()
+
+    with pytest.raises(ValueError):
+        db.move_category(a, c)
+    with pytest.raises(ValueError):
+        db.move_category(b, b)
+
+    assert _tree() == before
+    assert _parent(a) is None and _parent(b) == a
+
+
+def test_move_to_missing_parent(tree):
+    a, b, c, d = tree
+    assert not db.move_category(b, 999)
+    assert not db.move_category(999, a)
+    assert _parent(b) == a
+
+
+class FakeMessage:
+    def __init__(self):
+        self.texts = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.texts.append(text)
+        return SimpleNamespace(chat=SimpleNamespace(id=1), message_id=len(self.texts))
+
+
+def test_move_category_command_to_top_level(tree):
+    a, b, c, d = tree
+    message = FakeMessage()
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1), message=message)
+    context = SimpleNamespace(args=[f"#{b}", "0"])
+
+    asyncio.run(commands.move_category_cmd(update, context))
+
+    assert message.texts[0] == "✅ Категорію переміщено."
+    assert message.texts[1] == "Категорії:"
+    assert _parent(b) is None
+    assert _ancestors(b) == {}
+    assert _ancestors(c) == {b: 1}
+    assert {row[0] for row in db.list_child_categories(None)} == {a, b, d}
@@ -0,0 +1,40 @@
+import asyncio
+
+from telegram.error import NetworkError
+
+from app.services.live_screens import LiveScreens
+
+SCREEN = ("prod", 1)
+
+
+class FlakyBot:
+    def __init__(self, failing):
+        self.failing = failing
+        self.edited = []
+
+    async def edit_message_text(self, text, chat_id, message_id, reply_markup=None):
+        if (chat_id, message_id) in self.failing:
+            raise NetworkError("timed out")
+        self.edited.append((chat_id, message_id))
+
+
+def test_failed_edit_keeps_the_screen_dirty():
+    async def scenario():
+        live = LiveScreens()
+        bot = FlakyBot({(901, 1)})
+        live.bind(bot, lambda scope, entity_id: ("text", None))
+        live.track(SCREEN, (901, 1))
+        live.track(SCREEN, (902, 1))
+        live.on_version_bump(*SCREEN)
+
+        await live.flush()
+        assert bot.edited == [(902, 1)]
+        assert live._dirty == {SCREEN}
+
+        bot.failing.clear()
+        await live.flush()
+        assert bot.edited == [(902, 1), (901, 1)]      # the pushed one is skipped by fingerprint
+        assert not live._dirty
+        await live.stop()
+
+    asyncio.run(scenario())
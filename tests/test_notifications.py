@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.notifications import maybe_notify_limit_crossed
+from app.storage import db
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+def test_new_limit_notifies_once_when_crossed(database):
+    cat_id = db.add_category("Овочі")
+    db.add_product(cat_id, "Морква", 5)
+    prod_id = db.list_products_by_category(cat_id)[0][0]
+    db.add_subscriber(77)
+    bot = FakeBot()
+    context = SimpleNamespace(application=SimpleNamespace(bot=bot))
+
+    def set_limit(limit):
+        change = db.update_product_limit(prod_id, limit)
+        asyncio.run(maybe_notify_limit_crossed(context, prod_id, change))
+        return change
+
+    assert set_limit(10) == (5.0, 10.0, False, True)
+    assert len(bot.sent) == 1 and bot.sent[0][0] == 77
+    assert set_limit(8) == (5.0, 8.0, True, True)             # still below: no repeat
+    assert set_limit(2) == (5.0, 2.0, True, False)
+    assert set_limit(None) == (5.0, None, False, False)
+    assert set_limit(5) == (5.0, 5.0, False, True)
+    assert len(bot.sent) == 2
+    assert db.get_product(prod_id)[5] == 1                    # below_limit kept by the same UPDATE
+
+    assert db.update_product_limit(prod_id + 1, 3) is None
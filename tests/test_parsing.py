@@ -0,0 +1,23 @@
+import pytest
+
+from app.utils.parsing import parse_qty_change
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("10", ("=", 10.0)),
+    ("=10", ("=", 10.0)),
+    (" = 2,5 ", ("=", 2.5)),
+    ("+5", ("+", 5.0)),
+    ("+ 0.25", ("+", 0.25)),
+    ("-2,5", ("+", -2.5)),
+    ("−3", ("+", -3.0)),        # minus sign from a phone keyboard
+    ("0", ("=", 0.0)),
+])
+def test_qty_change(text, expected):
+    assert parse_qty_change(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "abc", "+-5", "--5", "5-", "1,2,3", "1.", ".5", "=+5", "1e3", None])
+def test_qty_change_rejects(text):
+    with pytest.raises(ValueError):
+        parse_qty_change(text)
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+from app.storage import db, persistence
+from app.storage.persistence import SQLitePersistence
+
+
+class SpyConnection:
+    """
+    db.connect() result that records executemany() calls.
+    """
+
+    def __init__(self, con, calls):
+        self._con = con
+        self._calls = calls
+
+    def __enter__(self):
+        self._con.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._con.__exit__(*exc)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        self._calls.append((sql, rows))
+        return self._con.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
+async def _written():
+    await asyncio.sleep(0)      # end of PTB's persistence run: the batch goes to a writer thread
+    await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+
+
+def test_state_survives_a_kill_without_flush(database):
+    async def handle_updates():
+        store = SQLitePersistence()
+        await store.update_user_data(1, {"active_cat_id": 5})
+        await store.update_conversation("add_product", (10, 1), 2)
+        await store.update_conversation("add_product", (11, 1), 3)
+        await store.update_conversation("add_product", (11, 1), None)
+        await _written()            # the process is killed here
+
+    async def restart():
+        store = SQLitePersistence()
+        user_data = {}
+        await store.refresh_user_data(1, user_data)
+        return user_data, await store.get_conversations("add_product")
+
+    asyncio.run(handle_updates())
+    user_data, conversations = asyncio.run(restart())
+    assert user_data == {"active_cat_id": 5}
+    assert conversations == {(10, 1): 2}
+
+
+def test_only_dirty_entries_are_written_in_one_batch(database, monkeypatch):
+    calls = []
+    connect = db.connect
+    monkeypatch.setattr(db, "connect", lambda: SpyConnection(connect(), calls))
+
+    async def run():
+        store = SQLitePersistence()
+        for user_id in (1, 2, 3):
+            await store.update_user_data(user_id, {"n": user_id})
+        await _written()
+        calls.clear()
+
+        await store.update_user_data(2, {"n": 20})
+        await store.update_user_data(3, {"n": 30})
+        await store.update_user_data(3, {"n": 31})
+        await store.drop_user_data(1)
+        await _written()
+
+    asyncio.run(run())
+    assert calls == [
+        (persistence.UPSERT_USER_SQL, [(2, '{"n": 20}'), (3, '{"n": 31}')]),
+        (persistence.DELETE_USER_SQL, [(1,)]),
+    ]
+
+
+def test_workers_sharing_a_user_keep_each_others_keys(database):
+    # Alice talks to the bot in a group (worker A) and in her private chat (worker B)
+    async def run():
+        group_worker, private_worker = SQLitePersistence(), SQLitePersistence()
+        in_group, in_private = {}, {}
+        await group_worker.refresh_user_data(1, in_group)
+        await private_worker.refresh_user_data(1, in_private)
+
+        in_group.update(active_cat_id=5, prod_limit_id=9)
+        await group_worker.update_user_data(1, in_group)
+        await _written()
+
+        in_private["task_cat"] = 2
+        await private_worker.update_user_data(1, in_private)
+        await _written()
+
+        del in_group["prod_limit_id"]
+        await group_worker.update_user_data(1, in_group)
+        await _written()
+
+        restarted = {}
+        await SQLitePersistence().refresh_user_data(1, restarted)
+        return restarted
+
+    assert asyncio.run(run()) == {"active_cat_id": 5, "task_cat": 2}
+
+
+def test_writes_run_off_the_event_loop(database, monkeypatch):
+    threads = []
+    write_batch = SQLitePersistence._write_batch
+
+    def recording(*batch):
+        threads.append(threading.get_ident())
+        write_batch(*batch)
+
+    monkeypatch.setattr(SQLitePersistence, "_write_batch", staticmethod(recording))
+
+    async def run():
+        store = SQLitePersistence()
+        await store.update_user_data(1, {"n": 1})
+        await store.update_user_data(2, {"n": 2})
+        await asyncio.sleep(0)
+        await store.update_user_data(1, {"n": 3})
+        await store.flush()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 2 and loop_thread not in threads
+
+    restarted = {}
+    asyncio.run(SQLitePersistence().refresh_user_data(1, restarted))
+    assert restarted == {"n": 3}
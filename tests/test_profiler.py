@@ -0,0 +1,96 @@
+import asyncio
+import marshal
+from types import SimpleNamespace
+
+from app.handlers import commands
+from app.services.profiler import UpdateProfiler
+
+
+class FakeBot:
+    def __init__(self):
+        self.messages = []
+        self.documents = []
+
+    async def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+    async def send_document(self, chat_id, document, filename):
+        self.documents.append((chat_id, filename, document))
+
+
+def test_stops_after_n_updates_not_counting_the_trigger():
+    async def scenario():
+        profiler, bot = UpdateProfiler(), FakeBot()
+        assert profiler.start(bot, 42, updates=2, seconds=60, trigger_update_id=100)
+        assert not profiler.start(bot, 42, updates=2, seconds=60)
+
+        profiler.on_update_done(100)      # the /profile command itself
+        profiler.on_update_done(101)
+        assert profiler.running
+        profiler.on_update_done(102)
+        assert not profiler.running and profiler._timeout is None
+
+        await profiler._report_task
+        profiler.on_update_done(103)      # no-op once stopped
+        return bot
+
+    bot = asyncio.run(scenario())
+    [(chat_id, summary)] = bot.messages
+    assert chat_id == 42 and summary.startswith("🔬 Профіль: 2 оновлень")
+    [(chat_id, filename, dump)] = bot.documents
+    assert filename.endswith(".pstats") and isinstance(marshal.loads(dump), dict)
+
+
+def test_stops_on_timeout():
+    async def scenario():
+        profiler, bot = UpdateProfiler(), FakeBot()
+        profiler.start(bot, 42, updates=10, seconds=0)      # clamped to 1 s
+        profiler.on_update_done(1)
+        await asyncio.sleep(1.1)
+        assert not profiler.running
+        await profiler._report_task
+        return bot
+
+    bot = asyncio.run(scenario())
+    [(_, summary)] = bot.messages
+    assert summary.startswith("🔬 Профіль: 1 оновлень")
+    assert len(bot.documents) == 1
+
+
+class FakeMessage:
+    def __init__(self):
+        self.texts = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.texts.append(text)
+
+
+def test_profile_stop_command_replies(monkeypatch):
+    profiler = UpdateProfiler()
+    monkeypatch.setattr(commands, "update_profiler", profiler)
+    monkeypatch.setattr(commands, "ADMIN_IDS", {5})
+
+    async def scenario():
+        bot, message = FakeBot(), FakeMessage()
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=5), effective_chat=SimpleNamespace(id=42),
+            message=message, update_id=100,
+        )
+        context = SimpleNamespace(bot=bot, args=["stop"])
+        await commands.profile_cmd(update, context)
+
+        context.args = ["5", "30"]
+        await commands.profile_cmd(update, context)
+        assert profiler.running
+
+        context.args = ["stop"]
+        await commands.profile_cmd(update, context)
+        assert not profiler.running
+        await profiler._report_task
+        return bot, message
+
+    bot, message = asyncio.run(scenario())
+    assert message.texts[0] == "Профілювання не запущено."
+    assert message.texts[1].startswith("🔬 Профілювання увімкнено: наступні 5 оновлень")
+    assert message.texts[2] == "⏹ Профілювання зупинено. Звіт прийде сюди."
+    assert len(bot.messages) == 1 and len(bot.documents) == 1
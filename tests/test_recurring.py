@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.recurring import RecurringTasks, format_time, parse_schedule
+from app.storage import db
+
+START = datetime(2026, 1, 5, 0, 0)     # a Monday
+WEEK = {
+    "daily 07:30": 7,
+    "щотижня пн,чт 07:00": 2,
+    "cron 0 */6 * * *": 28,
+    "cron 30 8 * * 1-5": 5,
+}
+
+
+def _add_template(schedule_text: str, start: datetime = START) -> int:
+    next_run = format_time(parse_schedule(schedule_text).next_after(start))
+    return db.add_task_template(1, 1, f"Завдання: {schedule_text}", schedule_text, next_run)
+
+
+def _tasks():
+    with db.connect() as con:
+        return con.execute(
+            "SELECT template_id, due FROM tasks WHERE template_id IS NOT NULL ORDER BY template_id, due"
+        ).fetchall()
+
+
+def _next_runs():
+    return {template_id: next_run for template_id, _, _, _, next_run in db.list_task_templates()}
+
+
+def test_schedules():
+    assert parse_schedule("daily 07:30").next_after(START) == datetime(2026, 1, 5, 7, 30)
+    assert parse_schedule("weekly sun 10:00").next_after(START) == datetime(2026, 1, 11, 10, 0)
+    assert parse_schedule("cron 0 0 29 2 *").next_after(START) == datetime(2028, 2, 29, 0, 0)
+    assert parse_schedule("cron 0 0 30 2 *").next_after(START) is None
+    for bad in ("", "daily 25:00", "weekly xx 07:00", "cron * * *", "cron 60 * * * *"):
+        with pytest.raises(ValueError):
+            parse_schedule(bad)
+
+
+def test_every_occurrence_of_a_week_creates_one_task(database):
+    ids = {_add_template(schedule_text): count for schedule_text, count in WEEK.items()}
+    scheduler = RecurringTasks()
+
+    created, now = 0, START
+    while now < START + timedelta(days=7):
+        now += timedelta(hours=1)
+        created += scheduler.run_due(now)
+
+    tasks = _tasks()
+    assert created == len(tasks) == sum(WEEK.values())
+    assert {template_id: sum(1 for t, _ in tasks if t == template_id) for template_id in ids} == ids
+
+
+def test_replayed_batch_and_stale_scheduler_create_nothing(database):
+    for schedule_text in WEEK:
+        _add_template(schedule_text)
+    stale = RecurringTasks()
+    stale.load()                    # another worker process, loaded before the first one ran
+    scheduler = RecurringTasks()
+
+    end = START + timedelta(days=1)
+    created = scheduler.run_due(end)
+    tasks = _tasks()
+    assert created == len(tasks) > 0
+
+    assert stale.run_due(end) == 0
+    replay = [(template_id, 1, due, None) for template_id, due in tasks]
+    assert db.materialize_task_templates(replay) == 0
+    assert _tasks() == tasks
+
+
+def test_downtime_creates_the_latest_missed_occurrence_once(database):
+    template_id = _add_template("daily 07:30")
+    scheduler = RecurringTasks()
+
+    assert scheduler.run_due(START + timedelta(days=3, hours=8)) == 1      # four occurrences missed
+    assert _tasks() == [(template_id, "2026-01-08 07:30")]
+    assert _next_runs()[template_id] == "2026-01-09 07:30"
+    assert scheduler.next_fire() == datetime(2026, 1, 9, 7, 30)
+
+    # A restarted process picks up from the stored next_run
+    assert RecurringTasks().run_due(datetime(2026, 1, 9, 7, 30)) == 1
+    assert _tasks()[-1] == (template_id, "2026-01-09 07:30")
+
+
+def test_deleted_and_invalid_templates_are_skipped(database):
+    deleted = _add_template("daily 07:30")
+    invalid = db.add_task_template(1, 1, "Зламаний", "daily 99:99", "2026-01-05 07:30")
+    scheduler = RecurringTasks()
+    scheduler.load()
+    db.delete_task_template(deleted)
+    scheduler.load()
+
+    assert scheduler.run_due(START + timedelta(days=1)) == 0
+    assert _tasks() == []
+    assert _next_runs() == {invalid: "2026-01-05 07:30"}
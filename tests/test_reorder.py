@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from app.config import REORDER_CONSUMPTION_DAYS
+from app.services import reorder
+from app.services.reorder import DAY, consumption_window, suggest_order_quantities
+from app.storage import db
+
+ROWS = [
+    # prod_id, qty, limit_qty, pack, consumed, days
+    (1, 0.0, 5.0, 0.0, 0.0, 28),
+    (2, 10.0, 5.0, 6.0, 56.0, 28),
+    (3, 10.0, 0.0, 0.0, 56.0, 4),
+    (4, 100.0, 5.0, 0.0, 28.0, 28),
+    (5, 1.0, 0.0, 12.0, 3.0, 1),
+]
+
+
+def _add_product(cat_id: int, name: str, qty: float) -> int:
+    db.add_product(cat_id, name, qty, limit_qty=1)
+    return next(pid for pid, product, _, _ in db.list_products_by_category(cat_id) if product == name)
+
+
+def _add_rollups(prod_id: int, days_ago_out_qty) -> None:
+    _, today = consumption_window(time.time())
+    with db.connect() as con:
+        con.executemany(
+            "INSERT OR REPLACE INTO stock_history_day(product_id, bucket, min_qty, max_qty, last_qty, out_qty) "
+            "VALUES (?, ?, 0, 0, 0, ?)",
+            [(prod_id, today - days_ago * DAY, out_qty) for days_ago, out_qty in days_ago_out_qty],
+        )
+        con.commit()
+
+
+def test_window_is_aligned_to_day_buckets():
+    since, today = consumption_window(10 * DAY + 3600)
+    assert today == 10 * DAY
+    assert since == today - (REORDER_CONSUMPTION_DAYS - 1) * DAY
+
+
+def test_suggestions():
+    suggestions = suggest_order_quantities(ROWS, target_days=14, safety_days=3, vectorized=False)
+    # 1: tops up to the limit; 2: 2/day -> 6 safety + 28 - 10 = 24 = 4 packs;
+    # 3: 14/day over the 4 days it has history; 4: enough stock; 5: 3/day -> 9 + 42 - 1 = 50 -> 5 packs
+    assert suggestions == {1: 5.0, 2: 24.0, 3: 228.0, 5: 60.0}
+
+
+@pytest.mark.skipif(not reorder.numpy_available(), reason="needs numpy")
+def test_numpy_matches_row_by_row():
+    assert suggest_order_quantities(ROWS, vectorized=True) == suggest_order_quantities(ROWS, vectorized=False)
+
+
+def test_consumption_is_averaged_over_the_days_of_history(database):
+    cat_id = db.add_category("Овочі")
+    old = _add_product(cat_id, "Морква", 10)
+    new = _add_product(cat_id, "Цибуля", 10)
+    _add_rollups(old, [(REORDER_CONSUMPTION_DAYS + 5, 100.0), (REORDER_CONSUMPTION_DAYS, 50.0), (3, 7.0)])
+    _add_rollups(new, [(2, 9.0)])
+
+    rows = {row[0]: row[4:] for row in db.list_reorder_inputs(*consumption_window(time.time()))}
+    assert rows[old] == (7.0, REORDER_CONSUMPTION_DAYS)    # days before the window are left out
+    assert rows[new] == (9.0, 3)                           # history started two days ago
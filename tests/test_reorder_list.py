@@ -0,0 +1,46 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.handlers import bottom_menu
+from app.storage import db
+
+
+class FakeMessage:
+    def __init__(self):
+        self.texts = []
+        self.documents = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.texts.append(text)
+
+    async def reply_document(self, document, filename, caption=None):
+        self.documents.append((filename, document.read()))
+
+
+def _send() -> FakeMessage:
+    message = FakeMessage()
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1), message=message)
+    asyncio.run(bottom_menu.send_reorder_list(update, None))
+    return message
+
+
+def test_long_list_is_cut_and_sent_as_a_document(database, monkeypatch):
+    cat_id = db.add_category("Овочі")
+    for i in range(300):
+        db.add_product(cat_id, f"Продукт з досить довгою назвою №{i}", 0, limit_qty=5)
+
+    monkeypatch.setattr(bottom_menu, "MAX_REORDER_MESSAGES", 10)
+    message = _send()
+    assert len(message.texts) > 1 and not message.documents
+
+    monkeypatch.setattr(bottom_menu, "MAX_REORDER_MESSAGES", 1)
+    monkeypatch.setattr(bottom_menu, "xlsx_available", lambda: False)
+    message = _send()
+    assert len(message.texts) == 1
+    assert message.texts[0].startswith(bottom_menu.REORDER_TITLE)
+    [(filename, content)] = message.documents
+    assert filename.endswith(".csv") and "№299" in content.decode("utf-8-sig")
+
+
+def test_empty_list(database):
+    assert _send().texts == ["✅ Немає позицій для дозамовлення."]
@@ -0,0 +1,65 @@
+import pytest
+from telegram import CallbackQuery, Update, User
+
+from app.handlers import routing
+from app.handlers.routing import CallbackRouter
+from app.utils.callback_codec import encode_callback
+
+
+def _update(data: str, update_id: int = 1) -> Update:
+    user = User(id=1, first_name="u", is_bot=False)
+    return Update(update_id, callback_query=CallbackQuery("1", user, "chat", data=data))
+
+
+async def _noop(*args):
+    return None
+
+
+@pytest.fixture
+def counted_parses(monkeypatch):
+    calls = []
+    parse = routing.parse_callback
+
+    def counting(data):
+        calls.append(data)
+        return parse(data)
+
+    monkeypatch.setattr(routing, "parse_callback", counting)
+    return calls
+
+
+def test_entry_points_and_dispatch_share_one_parse(counted_parses):
+    router = CallbackRouter()
+    router.route("prod:open")(_noop)
+    entry_points = [router.entry_point(route, _noop, with_id=True) for route in ("prod:qty", "prod:limit", "prod:price")]
+
+    update = _update(encode_callback("prod:limit", 7))
+    assert [bool(h.check_update(update)) for h in entry_points] == [False, True, False]
+    assert router.resolve(update.callback_query.data) is None      # conversation route: not dispatched
+    assert router.parse(update.callback_query.data).entity_id == 7
+    assert len(counted_parses) == 1
+
+    update = _update(encode_callback("prod:open", 7), update_id=2)
+    assert not any(h.check_update(update) for h in entry_points)
+    cb, handler = router.resolve(update.callback_query.data)
+    assert handler is _noop and cb.entity_id == 7
+    assert len(counted_parses) == 2
+
+
+def test_routes_table_and_duplicates():
+    router = CallbackRouter()
+    router.route("nav:cats", with_id=False)(_noop)
+    router.entry_point("cat:add", _noop)
+
+    assert router.routes() == {("nav", "cats"): "router", ("cat", "add"): "conversation"}
+    with pytest.raises(ValueError):
+        router.route("cat:add")(_noop)
+    with pytest.raises(ValueError):
+        router.entry_point("nav:cats", _noop)
+
+
+def test_entity_id_required():
+    router = CallbackRouter()
+    router.route("prod:open")(_noop)
+    assert router.resolve("prod:open") is None
+    assert router.resolve("prod:open:5")[0].entity_id == 5
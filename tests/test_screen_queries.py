@@ -0,0 +1,37 @@
+import pytest
+
+from app.bot_ui import screens
+from app.storage import db, tracing
+
+
+@pytest.fixture
+def catalog(database):
+    cat_id = db.add_category("Овочі")
+    db.add_category("Коренеплоди", parent_id=cat_id)
+    db.add_product(cat_id, "Морква", 5, limit_qty=2)
+    db.add_product(cat_id, "Цибуля", 1, limit_qty=3)
+    prod_id = db.list_products_by_category(cat_id)[0][0]
+    task_id = db.add_task(1, "Почистити моркву", 1)
+    return cat_id, prod_id, task_id
+
+
+SCREENS = {
+    "categories": lambda ids: screens.categories_screen(),
+    "category": lambda ids: screens.category_screen(ids[0]),
+    "product": lambda ids: screens.product_screen(ids[1]),
+    "task_procs": lambda ids: screens.task_procs_screen(),
+    "tasks": lambda ids: screens.tasks_screen(1),
+    "task": lambda ids: screens.task_screen(ids[2]),
+}
+
+
+@pytest.mark.parametrize("name", SCREENS)
+def test_screen_renders_with_one_statement(catalog, name):
+    render = SCREENS[name]
+    with tracing.count_queries() as log:
+        assert render(catalog) is not None
+    assert log.count == 1, log.statements
+
+    with tracing.count_queries() as log:
+        render(catalog)
+    assert log.count == 0, log.statements      # served from the screen cache
@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+from app.services.stock_history import chart_levels
+from app.storage import db
+
+DAY0 = 1_700_006_400      # UTC midnight
+HOUR = 3600
+
+
+class Clock:
+    """
+    The history triggers read the time from this table instead of the wall clock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def set(self, ts: int) -> None:
+        with sqlite3.connect(self.path) as con:
+            con.execute("UPDATE test_clock SET now=?", (ts,))
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch, request):
+    path = tmp_path / "bot.db"
+    with sqlite3.connect(path) as con:
+        con.execute("CREATE TABLE test_clock(now INTEGER NOT NULL)")
+        con.execute("INSERT INTO test_clock VALUES (0)")
+    monkeypatch.setattr(db, "_NOW", "(SELECT now FROM test_clock)")
+    request.getfixturevalue("database")
+    return Clock(path)
+
+
+def _rollups(resolution: str) -> list:
+    with db.connect() as con:
+        return con.execute(
+            f"SELECT bucket, min_qty, max_qty, last_qty, out_qty FROM stock_history_{resolution} ORDER BY bucket"
+        ).fetchall()
+
+
+def _raw() -> list:
+    with db.connect() as con:
+        return con.execute("SELECT ts, qty FROM stock_history ORDER BY id").fetchall()
+
+
+@pytest.fixture
+def product(clock):
+    cat_id = db.add_category("Молочка")
+    clock.set(DAY0 + 23 * HOUR + 30 * 60)
+    db.add_product(cat_id, "Молоко", 10)
+    prod_id = db.list_products_by_category(cat_id)[0][0]
+
+    for minute, qty in ((23 * 60 + 40, 4), (23 * 60 + 50, 7), (24 * 60 + 10, 2), (25 * 60 + 5, 2), (25 * 60 + 6, 9)):
+        clock.set(DAY0 + minute * 60)
+        db.set_stock_qty(prod_id, db.MAIN_LOCATION_ID, qty)
+    return prod_id
+
+
+def test_rollups_across_hour_and_day_boundaries(product):
+    assert _raw() == [
+        (DAY0 + 23 * HOUR + 30 * 60, 10),
+        (DAY0 + 23 * HOUR + 40 * 60, 4),
+        (DAY0 + 23 * HOUR + 50 * 60, 7),
+        (DAY0 + 24 * HOUR + 10 * 60, 2),
+        (DAY0 + 25 * HOUR + 6 * 60, 9),      # setting the same level writes nothing
+    ]
+    assert _rollups("hour") == [
+        (DAY0 + 23 * HOUR, 4, 10, 7, 6),
+        (DAY0 + 24 * HOUR, 2, 7, 2, 5),      # starts from the level the hour opened at
+        (DAY0 + 25 * HOUR, 2, 9, 9, 0),
+    ]
+    assert _rollups("day") == [
+        (DAY0, 4, 10, 7, 6),
+        (DAY0 + 24 * HOUR, 2, 9, 9, 5),
+    ]
+
+
+def test_load_starts_with_the_level_before_the_range(product):
+    since = DAY0 + 23 * HOUR + 45 * 60
+    assert db.load_stock_history(product, "raw", since) == [
+        (DAY0 + 23 * HOUR + 40 * 60, 4, 4, 4),
+        (DAY0 + 23 * HOUR + 50 * 60, 7, 7, 7),
+        (DAY0 + 24 * HOUR + 10 * 60, 2, 2, 2),
+        (DAY0 + 25 * HOUR + 6 * 60, 9, 9, 9),
+    ]
+    assert db.load_stock_history(product, "hour", DAY0 + 25 * HOUR) == [
+        (DAY0 + 24 * HOUR, 2, 7, 2),
+        (DAY0 + 25 * HOUR, 2, 9, 9),
+    ]
+    assert db.load_stock_history(product, "day", DAY0) == [
+        (DAY0, 4, 10, 7),
+        (DAY0 + 24 * HOUR, 2, 9, 9),
+    ]
+    with pytest.raises(ValueError):
+        db.load_stock_history(product, "week", DAY0)
+
+
+def test_prune_by_retention(product):
+    assert db.prune_stock_history(DAY0 + 24 * HOUR, DAY0 + 24 * HOUR) == (3, 1)
+    assert [ts for ts, _ in _raw()] == [DAY0 + 24 * HOUR + 10 * 60, DAY0 + 25 * HOUR + 6 * 60]
+    assert [row[0] for row in _rollups("hour")] == [DAY0 + 24 * HOUR, DAY0 + 25 * HOUR]
+    assert len(_rollups("day")) == 2
+
+    assert db.prune_stock_history(DAY0 + 30 * HOUR, DAY0) == (2, 0)
+    assert _raw() == []
+    assert len(_rollups("hour")) == 2
+
+
+def test_chart_levels():
+    points = [(-5, 1, 9, 3), (12, 2, 8, 6), (35, 5, 5, 5)]
+    # The point before the range counts only with its closing level, not its min / max
+    assert chart_levels(points, 0, 40, width=4) == ([3, 6, 6, 5], 2, 8)
+    assert chart_levels(points[1:], 0, 40, width=4) == ([None, 6, 6, 5], 2, 8)
+    assert chart_levels([], 0, 40, width=4) == ([None] * 4, None, None)
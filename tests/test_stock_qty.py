@@ -0,0 +1,66 @@
+import threading
+
+from app.storage import db
+
+WORKERS = 2
+DEDUCTIONS = 40
+
+
+def _product(qty: float, limit_qty: float | None = None) -> int:
+    cat_id = db.add_category("Овочі")
+    db.add_product(cat_id, "Морква", qty, limit_qty=limit_qty)
+    return db.list_products_by_category(cat_id)[0][0]
+
+
+def _total(prod_id: int) -> float:
+    return db.get_product(prod_id)[3]
+
+
+def test_interleaved_deductions_are_not_lost(database):
+    prod_id = _product(WORKERS * DEDUCTIONS + 1, limit_qty=10)
+    start = threading.Barrier(WORKERS)
+    changes = []
+
+    def deduct():
+        start.wait()
+        for _ in range(DEDUCTIONS):
+            changes.append(db.add_stock_qty(prod_id, db.MAIN_LOCATION_ID, -1))
+
+    threads = [threading.Thread(target=deduct) for _ in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert None not in changes
+    assert _total(prod_id) == 1.0
+    # Every change saw its own old value: the totals form one unbroken chain
+    assert sorted((old, new) for _, _, _, old, new, _ in changes) == [
+        (float(q + 1), float(q)) for q in range(1, WORKERS * DEDUCTIONS + 1)
+    ]
+    crossed = [change for change in changes if change[3] > 10 >= change[4]]
+    assert len(crossed) == 1
+
+
+def test_deduction_below_zero_changes_nothing(database):
+    prod_id = _product(2)
+    assert db.add_stock_qty(prod_id, db.MAIN_LOCATION_ID, -2.5) is None
+    assert db.add_stock_qty(prod_id, db.MAIN_LOCATION_ID, -0.1) == (2.0, 1.9, None, 2.0, 1.9, None)
+    assert _total(prod_id) == 1.9
+
+
+def test_product_total_follows_stock(database):
+    prod_id = _product(5, limit_qty=6)
+    shelf = db.add_location("Полиця")
+
+    assert db.set_stock_qty(prod_id, shelf, 3) == (0.0, 3.0, None, 5.0, 8.0, 6.0)
+    assert db.add_stock_qty(prod_id, db.MAIN_LOCATION_ID, -4.5) == (5.0, 0.5, None, 8.0, 3.5, 6.0)
+    assert db.add_stock_qty(prod_id, shelf, 0.1)[3:] == (3.5, 3.6, 6.0)
+    product = db.get_product(prod_id)
+    assert product[3] == 3.6 and product[5] == 1          # qty and below_limit
+
+    assert db.delete_location(shelf)
+    product = db.get_product(prod_id)
+    assert product[3] == 0.5 and product[5] == 1
+    assert db.set_stock_qty(prod_id, db.MAIN_LOCATION_ID, 7)[3:] == (0.5, 7.0, 6.0)
+    assert db.get_product(prod_id)[5] == 0
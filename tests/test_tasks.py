@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.ext import ConversationHandler
+
+from app.handlers.conversations import tasks
+from app.storage import db, tracing, versions
+
+
+def _count():
+    with tracing.count_queries() as log:
+        counts = db.count_open_tasks()
+    return counts, log.count
+
+
+def test_open_task_counts_are_updated_in_place(database):
+    assert _count() == ({}, 1)
+    assert _count() == ({}, 0)
+
+    task_id = db.add_task(7, "Перевірити холодильник", 1)
+    assert _count() == ({1: 1}, 0)
+
+    assert db.add_tasks(7, ["Помити підлогу", "", "Винести сміття"], 2) == 2
+    assert _count() == ({1: 1, 2: 2}, 0)
+
+    db.set_task_done(task_id, True)
+    counts, queries = _count()
+    assert counts.get(1, 0) == 0 and counts[2] == 2 and queries == 0
+
+    db.set_task_done(task_id, False)
+    assert _count() == ({1: 1, 2: 2}, 0)
+
+
+def test_open_task_counts_are_reloaded_after_a_remote_write(database):
+    db.add_task(7, "Перевірити холодильник", 1)
+    assert _count() == ({1: 1}, 1)
+
+    # Another worker process adds a task and broadcasts the bump
+    with db.connect() as con:
+        con.execute("INSERT INTO tasks(user_id, text, task_cat_id) VALUES (8, 'Замовити хліб', 3)")
+        con.commit()
+    versions.bump("task_procs", remote=True)
+    assert _count() == ({1: 1, 3: 1}, 1)
+    assert _count() == ({1: 1, 3: 1}, 0)
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append(text)
+        return SimpleNamespace(chat=SimpleNamespace(id=7), message_id=len(self.replies))
+
+
+def test_one_message_adds_a_task_per_line(database, monkeypatch):
+    bumps = []
+    monkeypatch.setattr(versions, "_listeners", [lambda scope, entity_id: bumps.append((scope, entity_id))])
+    message = FakeMessage("Помити підлогу\n\n  Винести сміття  \n \nЗамовити хліб\n")
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=7), message=message)
+    context = SimpleNamespace(user_data={"active_tc_id": 2})
+
+    assert asyncio.run(tasks.task_add_text(update, context)) == ConversationHandler.END
+
+    assert [text for _, text, _ in db.list_all_tasks_by_category(2)] == [
+        "Замовити хліб", "Винести сміття", "Помити підлогу",
+    ]
+    assert bumps.count(("task_proc", 2)) == 1
+    assert message.replies[0] == "✅ Додано завдань: 3"
+    assert len(message.replies) == 2      # the acknowledgement and one list re-render
+    assert "active_tc_id" not in context.user_data
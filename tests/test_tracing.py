@@ -0,0 +1,23 @@
+from app.storage import db, tracing
+
+
+def test_trigger_statements_are_not_counted_again(database):
+    cat_id = db.add_category("Овочі")
+
+    with tracing.count_queries() as log:
+        db.add_product(cat_id, "Морква", 5, limit_qty=2)    # fires the stock and history triggers
+    assert log.count == 1, log.statements
+
+    prod_id = db.list_products_by_category(cat_id)[0][0]
+    with tracing.count_queries() as log:
+        db.set_stock_qty(prod_id, db.MAIN_LOCATION_ID, 7)
+    assert log.count == 3, log.statements
+
+
+def test_repeated_reads_are_counted():
+    log = tracing.QueryLog()
+    for _ in range(3):
+        log.add("SELECT name FROM products WHERE id=1")
+    log.add("UPDATE products SET qty=1 WHERE id=1")
+    log.add("UPDATE products SET qty=1 WHERE id=1")
+    assert log.count == 4
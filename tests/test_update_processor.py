@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.ext import CommandHandler, MessageHandler, filters
+
+from app.handlers.conversations.common import MeteredConversationHandler
+from app.services.metrics import handler_seconds
+from app.services.update_processor import ChatOrderedUpdateProcessor, handler_label
+from app.utils.callback_codec import encode_callback
+
+USER = User(1, "u", False)
+CHAT = Chat(5, "private")
+STATE = 7
+
+
+async def _end(update, context):
+    return MeteredConversationHandler.END
+
+
+def _message(text: str) -> Update:
+    return Update(1, message=Message(1, datetime.datetime.now(), CHAT, from_user=USER, text=text))
+
+
+def _conversation() -> MeteredConversationHandler:
+    return MeteredConversationHandler(
+        entry_points=[CommandHandler("start", _end)],
+        states={STATE: [MessageHandler(filters.TEXT, _end)]},
+        fallbacks=[],
+        name="test_conv",
+    )
+
+
+def test_labels_from_the_update():
+    data = encode_callback("prod:open", 3)
+    assert handler_label(Update(1, callback_query=CallbackQuery("1", USER, "c", data=data))) == "callback:prod:open"
+    assert handler_label(Update(1, callback_query=CallbackQuery("1", USER, "c", data="junk"))) == "callback:unknown"
+    assert handler_label(_message("/history@bot 30d")) == "command:history"
+    assert handler_label(_message("hi")) == "message"
+    assert handler_label(object()) == "other"
+
+
+def test_conversation_that_handles_the_message_sets_the_label():
+    conversation = _conversation()
+    update = _message("42")
+    conversation._conversations[(CHAT.id, USER.id)] = STATE
+    check = conversation.check_update(update)
+    before = handler_seconds.count(f"conversation:test_conv:{STATE}")
+
+    processor = ChatOrderedUpdateProcessor(2)
+    coroutine = conversation.handle_update(update, SimpleNamespace(bot=None), check, None)
+    asyncio.run(processor.do_process_update(update, coroutine))
+
+    assert handler_seconds.count(f"conversation:test_conv:{STATE}") == before + 1
@@ -0,0 +1,74 @@
+import pytest
+
+from app.bot_ui.screens import valuation_report
+from app.storage import db, tracing
+
+
+def _product_id(cat_id: int, name: str) -> int:
+    return next(row[0] for row in db.list_products_by_category(cat_id) if row[1] == name)
+
+
+@pytest.fixture
+def stock(database):
+    drinks = db.add_category("Напої")
+    juices = db.add_category("Соки", drinks)
+    apple = db.add_category("Яблучні", juices)
+    veg = db.add_category("Овочі")
+    empty = db.add_category("Порожня")
+    bar = db.add_location("Бар")
+
+    db.add_product(drinks, "Вода", 10)
+    db.add_product(apple, "Сік", 4)
+    db.add_product(juices, "Кола", 3)
+    db.add_product(veg, "Морква", 20)
+    ids = {
+        "Вода": _product_id(drinks, "Вода"),
+        "Сік": _product_id(apple, "Сік"),
+        "Кола": _product_id(juices, "Кола"),
+        "Морква": _product_id(veg, "Морква"),
+    }
+    db.set_stock_qty(ids["Сік"], bar, 6)
+    db.update_product_price(ids["Вода"], 2)
+    db.update_product_price(ids["Сік"], 5)
+    db.update_product_price(ids["Морква"], 1.5)       # "Кола" has no price
+    return {"cats": (drinks, veg, empty), "bar": bar, "ids": ids}
+
+
+def test_totals_by_top_level_category_and_location(stock):
+    drinks, veg, empty = stock["cats"]
+    categories, locations = db.stock_valuation()
+
+    # Nested categories roll up into their top-level one; unpriced products count as 0
+    assert categories == [
+        (drinks, "Напої", 3, 2, 70.0, 70.0, 70.0),
+        (veg, "Овочі", 1, 1, 30.0, 30.0, 100.0),
+        (empty, "Порожня", 0, 0, 0.0, 0.0, 100.0),
+    ]
+    assert locations == [
+        (db.MAIN_LOCATION_ID, db.MAIN_LOCATION_NAME, 4, 3, 70.0, 70.0, None),
+        (stock["bar"], "Бар", 1, 1, 30.0, 30.0, None),
+    ]
+
+
+def test_report_lines(stock):
+    [text] = valuation_report()
+    assert "Всього: 100.00" in text
+    assert "Продуктів з ціною: 3 з 4" in text
+    assert "1. Напої — 70.00 (70.0%, Σ 70.0%), без ціни: 1" in text
+    assert "📍 Бар — 30.00 (30.0%)" in text
+
+
+def test_report_is_rebuilt_on_price_and_stock_changes(stock):
+    ids = stock["ids"]
+    report = valuation_report()
+    with tracing.count_queries() as log:
+        assert valuation_report() is report
+    assert log.count == 0, log.statements
+
+    db.update_product_price(ids["Кола"], 10)
+    report = valuation_report()
+    assert "Всього: 130.00" in report[0]
+    assert valuation_report() is report
+
+    db.set_stock_qty(ids["Морква"], db.MAIN_LOCATION_ID, 0)
+    assert "Всього: 100.00" in valuation_report()[0]
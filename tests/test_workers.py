@@ -0,0 +1,24 @@
+import datetime
+
+from telegram import CallbackQuery, Chat, Message, Update, User
+
+from app.workers import partition
+
+WORKERS = 4
+GROUP = Chat(-1001, "supergroup")
+
+
+def _message(chat: Chat, user: User | None, update_id: int = 1) -> Update:
+    return Update(update_id, message=Message(1, datetime.datetime.now(), chat, from_user=user, text="hi"))
+
+
+def test_updates_of_one_chat_go_to_one_worker():
+    alice, bob = User(6, "a", False), User(7, "b", False)
+    shown = Message(42, datetime.datetime.now(), GROUP)    # one inline screen in the group
+    taps = [Update(n, callback_query=CallbackQuery(str(n), user, "c", data="nav:cats", message=shown))
+            for n, user in enumerate((alice, bob))]
+
+    workers = {partition(update, WORKERS) for update in taps + [_message(GROUP, alice), _message(GROUP, bob)]}
+    assert workers == {-1001 % WORKERS}
+    assert partition(_message(Chat(6, "private"), alice), WORKERS) == 6 % WORKERS
+    assert partition(Update(3), WORKERS) == 0